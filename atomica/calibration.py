@@ -6,14 +6,19 @@ automatic calibration
 
 """
 
+import os
+import pickle
+from functools import partial
 import numpy as np
+import pandas as pd
 import sciris as sc
-from .model import BadInitialization
+from .model import BadInitialization, Model
 from .system import logger
 from .parameters import ParameterSet
+from .utils import parallel_progress
 import logging
 
-__all__ = ["calibrate"]
+__all__ = ["calibrate", "fit_report", "sample_posterior", "screen_parameters"]
 
 # TODO: Determine whether this is necessary.
 calibration_settings = dict()
@@ -46,19 +51,106 @@ def _update_parset(parset, y_factors, pars_to_adjust):
             raise NotImplementedError
 
 
-def _calculate_objective(y_factors, pars_to_adjust, output_quantities, parset, project):
-    # y-factors, array of y-factors to apply to specified output_quantities
-    # pars_to_adjust - list of tuples (par_name,pop_name,...) recognized by parset.update()
-    # output_quantities - a tuple like (pop,var,weight,metric) understood by model.get_pop[pop].getVar
+def _build_template(project, parset, pars_to_adjust) -> dict:
+    """
+    Build a model template for calibration
 
-    _update_parset(parset, y_factors, pars_to_adjust)
+    The model is built once using the initial parset. During calibration, this template is
+    unpickled for each evaluation, and only the scale factors for the parameters being
+    adjusted are updated via :meth:`Model.update_scale_factors`. This avoids rebuilding the
+    model and interpolating all of the databook values for every evaluation.
+
+    :param project: A :class:`Project` instance providing the framework and settings
+    :param parset: The :class:`ParameterSet` being calibrated
+    :param pars_to_adjust: List of tuples (par_name,pop_name,...) being calibrated
+    :return: A dict with the pickled model, the names of the adjusted quantities, and cached unscaled interpolated values.
+             If the model cannot be built with the initial parset, ``None`` is returned
+
+    """
 
     try:
-        result = project.run_sim(parset=parset, store_results=False)
-    except BadInitialization:  # If the proposed parameters lead to invalid initial compartment sizes
-        return np.inf
+        model = Model(project.settings, project.framework, parset)
+    except BadInitialization:
+        logger.debug("Could not build calibration template with initial parameter values, the model will be rebuilt for every evaluation")
+        return None
 
-    objective = 0.0
+    par_names = sorted({x[0] for x in pars_to_adjust})
+    interpolated = dict()
+    for par_name in par_names:
+        if par_name not in model._exec_order["all_pars"]:
+            continue  # Compartments and characteristics only affect the initial conditions
+        for par in model._vars_by_pop[par_name]:
+            if not (par.fcn_str and par._precompute) and parset.pars[par_name].has_values(par.pop.name):
+                interpolated[(par_name, par.pop.name)] = parset.pars[par_name].interpolate(tvec=model.t, pop_name=par.pop.name)
+
+    return {"model": pickle.dumps(model), "par_names": par_names, "interpolated": interpolated}
+
+
+def _expand_pars_to_adjust(parset, pars_to_adjust) -> list:
+    # Expand out pop=None in pars_to_adjust
+    p2 = []
+    for par_tuple in pars_to_adjust:
+        if par_tuple[1] is None:  # If the pop name is None
+            par = parset.pars[par_tuple[0]]
+            for pop_name in par.pops:
+                p2.append((par_tuple[0], pop_name, par_tuple[2], par_tuple[3]))
+        else:
+            p2.append(par_tuple)
+    return p2
+
+
+def _get_initial_values(parset, pars_to_adjust) -> tuple:
+    # Return the current scale factors, and the lower and upper limits, for expanded pars_to_adjust
+    x0 = []
+    xmin = []
+    xmax = []
+    for i, x in enumerate(pars_to_adjust):
+        par_name, pop_name, scale_min, scale_max = x
+        if par_name in parset.pars:
+            par = parset.pars[par_name]
+            if pop_name == "all":
+                x0.append(par.meta_y_factor)
+            else:
+                x0.append(par.y_factor[pop_name])
+        else:
+            tokens = par_name.split("_from_")
+            par = parset.transfers[tokens[0]][tokens[1]]
+            x0.append(par.y_factor[pop_name])
+        xmin.append(scale_min)
+        xmax.append(scale_max)
+    return x0, xmin, xmax
+
+
+def _expand_output_quantities(project, output_quantities) -> list:
+    # Expand out pop=None in output_quantities
+    o2 = []
+    for output_tuple in output_quantities:
+        if output_tuple[1] is None:  # If the pop name is None
+            pops = project.data.pops.keys()
+            for pop_name in pops:
+                o2.append((output_tuple[0], pop_name, output_tuple[2], output_tuple[3]))
+        else:
+            o2.append(output_tuple)
+    return o2
+
+
+def _build_target_index(project, output_quantities, tvec) -> list:
+    """
+    Precompute calibration targets
+
+    The data values, and the interpolation needed to compare the model outputs to the data, do not change
+    during calibration. This function looks up the data for each output quantity once, and computes
+    the time indices and weights required to linearly interpolate the model outputs onto the data times.
+    Data points outside the simulation time range are excluded, so that model outputs are not extrapolated.
+
+    :param project: A :class:`Project` instance containing the data
+    :param output_quantities: List of tuples (var_label,pop_name,weight,metric) with the pop names already expanded
+    :param tvec: Array of simulation time values
+    :return: A list of dicts, one for each output quantity that has time-specific data
+
+    """
+
+    targets = []
 
     for var_label, pop_name, weight, metric in output_quantities:
         target = project.data.get_ts(var_label, pop_name)  # This is the TimeSeries with the data for the requested quantity
@@ -66,21 +158,116 @@ def _calculate_objective(y_factors, pars_to_adjust, output_quantities, parset, p
             continue
         if not target.has_time_data:  # Only use this output quantity if the user entered time-specific data
             continue
-        var = result.model.get_pop(pop_name).get_variable(var_label)
+
+        fcn = _get_fitscore_func(metric)
+        if fcn is None:
+            raise NotImplementedError("No method associated with _calc_%s (calibration.py)" % metric)
+
         data_t, data_v = target.get_arrays()
+        data_v = data_v.astype(float)
+        idx = ~np.isnan(data_v) & (data_t >= tvec[0]) & (data_t <= tvec[-1])
+        data_t = data_t[idx]
+
+        # Compute the interpolation indices and weights, such that the model value at the data times
+        # is given by `(1-w)*vals[t_idx] + w*vals[t_idx+1]`
+        t_idx = np.clip(np.searchsorted(tvec, data_t, side="right") - 1, 0, max(0, len(tvec) - 2))
+        t_idx1 = np.minimum(t_idx + 1, len(tvec) - 1)
+        w = np.zeros(data_t.shape)
+        step = tvec[t_idx1] - tvec[t_idx]
+        np.divide(data_t - tvec[t_idx], step, out=w, where=step > 0)
+
+        targets.append(
+            {
+                "var_label": var_label,
+                "pop_name": pop_name,
+                "weight": weight,
+                "metric": metric,
+                "fcn": fcn,
+                "t": data_t,
+                "y": data_v[idx],
+                "t_idx": t_idx,
+                "t_idx1": t_idx1,
+                "w": w,
+            }
+        )
+
+    return targets
+
+
+def _get_target_vals(model, target) -> np.array:
+    # Return the model outputs interpolated onto the data times for a target from `_build_target_index()`
+    vals = model.get_pop(target["pop_name"]).get_variable(target["var_label"])[0].vals
+    return (1 - target["w"]) * vals[target["t_idx"]] + target["w"] * vals[target["t_idx1"]]
+
+
+def _calculate_objective(y_factors, pars_to_adjust, targets, parset, project, template=None):
+    # y-factors, array of y-factors to apply to specified output_quantities
+    # pars_to_adjust - list of tuples (par_name,pop_name,...) recognized by parset.update()
+    # targets - list of targets from `_build_target_index()`
+    # template - optionally, a dict from `_build_template()` in which case the model is not rebuilt
 
-        # Interpolate the model outputs onto the data times
-        # If there is data outside the range when the model was simulated, don't
-        # extrapolate the model outputs
-        y = data_v
-        y2 = np.interp(data_t, var[0].t, var[0].vals, left=np.nan, right=np.nan)
+    _update_parset(parset, y_factors, pars_to_adjust)
+
+    try:
+        if template is None:
+            model = project.run_sim(parset=parset, store_results=False).model
+        else:
+            model = pickle.loads(template["model"])
+            model.update_scale_factors(parset, template["par_names"], template["interpolated"])
+            model.process()
+    except BadInitialization:  # If the proposed parameters lead to invalid initial compartment sizes
+        return np.inf
+
+    objective = 0.0
 
-        idx = ~np.isnan(y) & ~np.isnan(y2)
-        objective += weight * sum(_calculate_fitscore(y[idx], y2[idx], metric))
+    for target in targets:
+        y2 = _get_target_vals(model, target)
+        idx = ~np.isnan(y2)
+        objective += target["weight"] * np.sum(target["fcn"](target["y"][idx], y2[idx]))
 
     return objective
 
 
+def fit_report(project, result, output_quantities=None) -> pd.DataFrame:
+    """
+    Report goodness of fit
+
+    This function compares the outputs of a simulation to the data in the project, using the same
+    fitting metrics as :func:`calibrate`. It can be used to check the quality of a calibration, and
+    to identify which quantities contribute the most to the calibration objective.
+
+    :param project: A :class:`Project` instance containing the data
+    :param result: A :class:`Result` instance to compare to the data
+    :param output_quantities: list of tuples, (var_label,pop_name,weight,metric), as used in :func:`calibrate`. pop_name=None
+                              will expand to all pops. If not provided, all compartments and characteristics will be used, with
+                              a weight of 1 and the 'fractional' metric
+    :return: A DataFrame indexed by quantity and population, with the number of data points used, the unweighted and weighted scores,
+             and the fraction of the total objective attributable to each quantity. The sum of the weighted scores is the value
+             of the calibration objective
+
+    """
+
+    if output_quantities is None:
+        output_quantities = [(x, None, 1.0, "fractional") for x in list(project.framework.comps.index) + list(project.framework.characs.index)]
+    output_quantities = _expand_output_quantities(project, output_quantities)
+
+    model = result.model
+    targets = _build_target_index(project, output_quantities, model.t)
+
+    records = []
+    for target in targets:
+        y2 = _get_target_vals(model, target)
+        idx = ~np.isnan(y2)
+        score = np.sum(target["fcn"](target["y"][idx], y2[idx]))
+        records.append((target["var_label"], target["pop_name"], target["weight"], target["metric"], np.sum(idx), score, target["weight"] * score))
+
+    df = pd.DataFrame.from_records(records, columns=["quantity", "population", "weight", "metric", "n", "score", "weighted score"])
+    df.set_index(["quantity", "population"], inplace=True)
+    total = df["weighted score"].sum()
+    df["contribution"] = df["weighted score"] / total if total > 0 else 0.0
+    return df
+
+
 def _get_fitscore_func(metric):
     """"""
     availfns = globals().copy()
@@ -116,7 +303,227 @@ def _calc_wape(y_obs, y_fit):
     return abs(y_fit - y_obs) / (y_obs.mean() + calibration_settings["tolerance"])
 
 
-def calibrate(project, parset: ParameterSet, pars_to_adjust, output_quantities, max_time=60, method="asd") -> ParameterSet:
+def _get_population_groups(framework, parset) -> list:
+    """
+    Identify independent groups of populations
+
+    Populations are connected if there is a transfer or a nonzero interaction between them, or if a parameter
+    aggregates over all populations of a given type without using an interaction. Populations in different
+    groups do not affect each other, so population-specific scale factors in one group have no effect on
+    the outputs of populations in another group.
+
+    :param framework: A :class:`ProjectFramework` instance
+    :param parset: A :class:`ParameterSet` instance
+    :return: A list of lists of population names, one for each group
+
+    """
+
+    import networkx as nx
+
+    G = nx.Graph()
+    G.add_nodes_from(parset.pop_names)
+
+    for connections in list(parset.transfers.values()) + list(parset.interactions.values()):
+        for from_pop, par in connections.items():
+            for to_pop, ts in par.ts.items():
+                if ts.has_data and np.any(np.nan_to_num(ts.get_arrays()[1].astype(float)) != 0):
+                    G.add_edge(from_pop, to_pop)
+
+    for par_name, fcn_str in framework.pars["function"].items():
+        if fcn_str and fcn_str.startswith(("SRC_POP_", "TGT_POP_")) and len(fcn_str.split("(")[1].rstrip(")").split(",")) < 2:
+            # An aggregation without an interaction term (i.e., with only one argument, as in `Parameter.set_fcn`) includes all populations of the same type
+            pops = [pop_name for pop_name, pop_type in zip(parset.pop_names, parset.pop_types) if pop_type == framework.pars.at[par_name, "population type"]]
+            G.add_edges_from(zip(pops[:-1], pops[1:]))
+
+    return [[x for x in parset.pop_names if x in group] for group in sorted(nx.connected_components(G), key=lambda group: min(parset.pop_names.index(x) for x in group))]
+
+
+def _get_start_points(x0, xmin, xmax, n_starts, rng=None) -> list:
+    # Return a list of initial values for multi-start calibration. The first start is always the current value, while the remaining
+    # starts are sampled uniformly within the bounds using the generator `rng`. If a bound is not finite, the initial value is instead
+    # perturbed by up to a factor of 2
+    rng = np.random.default_rng(rng)
+    x0 = np.array(x0, dtype=float)
+    xmin = np.array(xmin, dtype=float)
+    xmax = np.array(xmax, dtype=float)
+    starts = [x0]
+    finite = np.isfinite(xmin) & np.isfinite(xmax)
+    for _ in range(n_starts - 1):
+        x = x0 * np.exp(rng.uniform(-np.log(2), np.log(2), x0.shape))
+        x[finite] = rng.uniform(xmin[finite], xmax[finite])
+        starts.append(np.clip(x, xmin, xmax))
+    return starts
+
+
+def _run_calibration(job) -> tuple:
+    """
+    Run a single calibration
+
+    This function performs a single optimization, and is used to run multiple optimizations in parallel
+    when using multi-start or population-decomposed calibration.
+
+    :param job: A tuple containing ``(args, x0, xmin, xmax, method, max_time, seed)`` where ``args`` are the
+                arguments for :func:`_calculate_objective` and ``seed`` is an optional random seed
+    :return: A tuple with the optimal values and the objective function value
+
+    """
+
+    args, x0, xmin, xmax, method, max_time, seed = job
+
+    if seed is not None:
+        np.random.seed(seed)
+
+    if method == "asd":
+        optim_args = {
+            "stepsize": 0.1,
+            "maxiters": 2000,
+            "sinc": 1.5,
+            "sdec": 2.0,
+            "fulloutput": False,
+            "reltol": 1e-3,
+            "abstol": 1e-6,
+            "xmin": xmin,
+            "xmax": xmax,
+        }
+
+        if max_time is not None:
+            optim_args["maxtime"] = max_time
+
+        log_level = logger.getEffectiveLevel()
+        if log_level < logging.WARNING:
+            optim_args["verbose"] = 2
+        else:
+            optim_args["verbose"] = 0
+
+        opt_result = sc.asd(_calculate_objective, x0, args, **optim_args)
+        return opt_result["x"], opt_result["fval"]
+    elif method == "pso":
+        import pyswarm
+
+        optim_args = {"maxiter": 3, "lb": xmin, "ub": xmax, "minstep": 1e-3, "debug": True}
+        if np.any(~np.isfinite(xmin)) or np.any(~np.isfinite(xmax)):
+            errormsg = "PSO optimization requires finite upper and lower bounds to specify the search domain (i.e. every parameter being adjusted needs to have finite bounds)"
+            raise Exception(errormsg)
+
+        x1, fval = pyswarm.pso(_calculate_objective, kwargs=args, **optim_args)
+        return x1, fval
+    else:
+        raise Exception("Unrecognized method")
+
+
+def _evaluate_objective(x, args) -> float:
+    # Evaluate the calibration objective - this is a module-level function so that it can be run on parallel workers
+    return _calculate_objective(x, **args)
+
+
+def screen_parameters(project, parset: ParameterSet, pars_to_adjust, output_quantities, method: str = "oat", step: float = 0.1, n_trajectories: int = 10, threshold: float = 0.01, parallel: bool = False, num_workers: int = None, build_once: bool = True, seed: int = None) -> pd.DataFrame:
+    """
+    Screen calibration parameters
+
+    This function estimates the influence of each quantity being calibrated on the calibration objective. It is much cheaper
+    than calibration, so it can be used prior to calibration to identify quantities that have a negligible effect on the objective.
+    Removing those quantities from ``pars_to_adjust`` reduces the time taken by :func:`calibrate`. Two methods are available
+
+    - 'oat' perturbs each quantity one at a time from the current values by ``step`` times its range, requiring ``n+1`` simulations
+    - 'morris' computes Morris elementary effects from ``n_trajectories`` random trajectories through a 4-level grid spanning the
+      range of each quantity, requiring ``n_trajectories*(n+1)`` simulations. This accounts for nonlinearity and interactions between
+      quantities, reported as the standard deviation of the elementary effects
+
+    The range of each quantity is given by its limits in ``pars_to_adjust``. If a limit is not finite, the range extends to half (or double)
+    the current value instead.
+
+    :param project: A project instance to provide data and sim settings
+    :param parset: A :class:`ParameterSet` instance
+    :param pars_to_adjust: list of tuples, (par_name,pop_name,lower_limit,upper_limit) as for :func:`calibrate`
+    :param output_quantities: list of tuples, (var_label,pop_name,weight,metric) as for :func:`calibrate`
+    :param method: 'oat' or 'morris'
+    :param step: For the 'oat' method, the size of the perturbation as a fraction of the range of each quantity
+    :param n_trajectories: For the 'morris' method, the number of trajectories
+    :param threshold: Quantities with an effect smaller than this fraction of the largest effect will be marked as not being kept
+    :param parallel: If True, run the simulations in parallel
+    :param num_workers: If ``parallel`` is True, the number of workers to use (defaults to the number of CPUs)
+    :param build_once: If True, the model will be built once and only the scale factors will be updated for each evaluation
+    :param seed: For the 'morris' method, optionally specify a random seed for generating the trajectories
+    :return: A DataFrame indexed by parameter and population, with the effect of each quantity on the objective, the effect
+             relative to the largest effect, and whether the quantity should be kept. For the Morris method, the standard deviation of the
+             elementary effects is also reported
+
+    """
+
+    pars_to_adjust = _expand_pars_to_adjust(parset, pars_to_adjust)
+    output_quantities = _expand_output_quantities(project, output_quantities)
+    x0, xmin, xmax = _get_initial_values(parset, pars_to_adjust)
+    x0 = np.array(x0, dtype=float)
+    lower = np.where(np.isfinite(xmin), xmin, 0.5 * x0)
+    upper = np.where(np.isfinite(xmax), xmax, 2 * x0)
+    upper = np.where(upper > lower, upper, lower + 1)
+    n = len(x0)
+
+    # Assemble all of the points that need to be evaluated
+    if method == "oat":
+        h = step * (upper - lower)
+        h = np.where(x0 + h <= upper, h, -h)  # Step downwards if stepping upwards would exceed the limit
+        points = [x0] + [x0 + h[i] * np.eye(n)[i] for i in range(n)]
+    elif method == "morris":
+        levels = 4
+        delta = levels / (2 * (levels - 1))
+        rng = np.random.default_rng(seed)
+        trajectories = []
+        for _ in range(n_trajectories):
+            u = rng.integers(0, levels // 2, n) / (levels - 1)  # Start on the lower half of the grid so that steps of +delta remain in range
+            order = rng.permutation(n)
+            trajectory = [u.copy()]
+            for i in order:
+                u = u.copy()
+                u[i] += delta
+                trajectory.append(u)
+            trajectories.append((order, trajectory))
+        points = [lower + u * (upper - lower) for _, trajectory in trajectories for u in trajectory]
+    else:
+        raise Exception('Unknown screening method "%s" - must be "oat" or "morris"' % (method))
+
+    original_sim_end = project.settings.sim_end
+    project.settings.sim_end = min(project.data.tvec[-1], original_sim_end)
+
+    try:
+        args = {
+            "project": project,
+            "parset": parset.copy(),
+            "pars_to_adjust": pars_to_adjust,
+            "targets": _build_target_index(project, output_quantities, project.settings.tvec),
+        }
+        if build_once and all(x[0] in parset.pars for x in pars_to_adjust):
+            args["template"] = _build_template(project, args["parset"], pars_to_adjust)
+
+        if parallel:
+            objectives = parallel_progress(partial(_evaluate_objective, args=args), points, num_workers=num_workers)
+        else:
+            objectives = [_evaluate_objective(x, args) for x in points]
+    finally:
+        project.settings.sim_end = original_sim_end  # Restore the simulation end year
+
+    objectives = np.array([np.nan if x is None else x for x in objectives], dtype=float)
+    objectives[~np.isfinite(objectives)] = np.nan  # Points that could not be initialized do not contribute to the effects
+
+    df = pd.DataFrame(index=pd.MultiIndex.from_tuples([x[:2] for x in pars_to_adjust], names=["parameter", "population"]))
+    if method == "oat":
+        df["effect"] = np.abs(objectives[1:] - objectives[0])
+    else:
+        effects = np.full((n_trajectories, n), np.nan)
+        for k, (order, _) in enumerate(trajectories):
+            f = objectives[k * (n + 1) : (k + 1) * (n + 1)]
+            effects[k, order] = np.diff(f) / delta  # The elementary effect of each quantity, in units of its range
+        with np.errstate(invalid="ignore"):
+            df["effect"] = np.nanmean(np.abs(effects), axis=0)
+            df["sigma"] = np.nanstd(effects, axis=0)
+
+    largest = np.nanmax(df["effect"].values) if np.any(np.isfinite(df["effect"].values)) else 0.0
+    df["relative"] = df["effect"] / largest if largest > 0 else 0.0
+    df["keep"] = ~(df["relative"] < threshold)  # Quantities whose effect could not be computed are kept
+    return df
+
+
+def calibrate(project, parset: ParameterSet, pars_to_adjust, output_quantities, max_time=60, method="asd", build_once: bool = True, n_starts: int = 1, decompose: bool = False, max_cycles: int = 3, parallel: bool = False, num_workers: int = None, screen: float = None, seed: int = None) -> ParameterSet:
     """
     Run automated calibration
 
@@ -130,98 +537,116 @@ def calibrate(project, parset: ParameterSet, pars_to_adjust, output_quantities,
                               function. pop_name=None will expand to all pops. pop_name='all' is not supported
     :param max_time: If using ASD, the maximum run time
     :param method: 'asd' or 'pso'. If using 'pso' all upper and lower limits must be finite
+    :param build_once: If True, the model will be built once and only the scale factors will be updated for each
+                       evaluation. If False, a new model will be built from scratch for every evaluation
+    :param n_starts: Number of times to run the calibration. The first run starts from the current parset values, and the
+                     remaining runs start from values sampled within the limits. The best fit is retained
+    :param decompose: If True, populations are divided into groups that do not interact (no transfers or interactions between
+                      them). The population-specific quantities in each group are calibrated separately against the outputs
+                      for that group, and quantities with pop_name='all' are calibrated in a separate step against all outputs
+    :param max_cycles: If using ``decompose`` and some quantities have pop_name='all', the maximum number of times to cycle between
+                       calibrating the population groups and calibrating the quantities affecting all populations
+    :param parallel: If True, multiple starts and independent population groups will be calibrated in parallel. Note that ``max_time``
+                     applies to each individual calibration
+    :param num_workers: If ``parallel`` is True, the number of workers to use (defaults to the number of CPUs)
+    :param screen: Optionally run :func:`screen_parameters` using the 'oat' method prior to calibration, with this value as the threshold.
+                   Quantities with a negligible effect on the objective will not be calibrated
+    :param seed: Optionally specify a random seed. The start points for ``n_starts`` and the random seed for each individual
+                 calibration are all drawn from a single generator initialized with this seed, so the calibration is reproducible
+                 regardless of whether it is run in parallel
     :return: A calibrated :class:`ParameterSet`
 
     """
 
-    # Expand out pop=None in pars_to_adjust
-    p2 = []
-    for par_tuple in pars_to_adjust:
-        if par_tuple[1] is None:  # If the pop name is None
-            par = parset.pars[par_tuple[0]]
-            for pop_name in par.pops:
-                p2.append((par_tuple[0], pop_name, par_tuple[2], par_tuple[3]))
-        else:
-            p2.append(par_tuple)
-    pars_to_adjust = p2
+    pars_to_adjust = _expand_pars_to_adjust(parset, pars_to_adjust)
 
-    # Expand out pop=None in output_quantities
-    o2 = []
-    for output_tuple in output_quantities:
-        if output_tuple[1] is None:  # If the pop name is None
-            pops = project.data.pops.keys()
-            for pop_name in pops:
-                o2.append((output_tuple[0], pop_name, output_tuple[2], output_tuple[3]))
-        else:
-            o2.append(output_tuple)
-    output_quantities = o2
+    output_quantities = _expand_output_quantities(project, output_quantities)
+
+    rng = np.random.default_rng(seed)
+
+    if screen is not None:
+        screening = screen_parameters(project, parset, pars_to_adjust, output_quantities, threshold=screen, parallel=parallel, num_workers=num_workers, build_once=build_once)
+        for x, keep in zip(pars_to_adjust, screening["keep"]):
+            if not keep:
+                logger.info("Screening: '%s' in '%s' has a negligible effect on the objective and will not be calibrated", x[0], x[1])
+        pars_to_adjust = [x for x, keep in zip(pars_to_adjust, screening["keep"]) if keep]
 
     args = {
         "project": project,
         "parset": parset.copy(),
         "pars_to_adjust": pars_to_adjust,
-        "output_quantities": output_quantities,
     }
 
-    x0 = []
-    xmin = []
-    xmax = []
-    for i, x in enumerate(pars_to_adjust):
-        par_name, pop_name, scale_min, scale_max = x
-        if par_name in parset.pars:
-            par = parset.pars[par_name]
-            if pop_name == "all":
-                x0.append(par.meta_y_factor)
-            else:
-                x0.append(par.y_factor[pop_name])
-        else:
-            tokens = par_name.split("_from_")
-            par = parset.transfers[tokens[0]][tokens[1]]
-            x0.append(par.y_factor[pop_name])
-        xmin.append(scale_min)
-        xmax.append(scale_max)
+    x0, xmin, xmax = _get_initial_values(parset, pars_to_adjust)
 
     original_sim_end = project.settings.sim_end
     project.settings.sim_end = min(project.data.tvec[-1], original_sim_end)
 
     try:
-        if method == "asd":
-            optim_args = {
-                "stepsize": 0.1,
-                "maxiters": 2000,
-                "sinc": 1.5,
-                "sdec": 2.0,
-                "fulloutput": False,
-                "reltol": 1e-3,
-                "abstol": 1e-6,
-                "xmin": xmin,
-                "xmax": xmax,
-            }
-
-            if max_time is not None:
-                optim_args["maxtime"] = max_time
-
-            log_level = logger.getEffectiveLevel()
-            if log_level < logging.WARNING:
-                optim_args["verbose"] = 2
-            else:
-                optim_args["verbose"] = 0
-
-            opt_result = sc.asd(_calculate_objective, x0, args, **optim_args)
-            x1 = opt_result["x"]
-        elif method == "pso":
-            import pyswarm
-
-            optim_args = {"maxiter": 3, "lb": xmin, "ub": xmax, "minstep": 1e-3, "debug": True}
-            if np.any(~np.isfinite(xmin)) or np.any(~np.isfinite(xmax)):
-                errormsg = "PSO optimization requires finite upper and lower bounds to specify the search domain (i.e. every parameter being adjusted needs to have finite bounds)"
-                raise Exception(errormsg)
-
-            x1, _ = pyswarm.pso(_calculate_objective, kwargs=args, **optim_args)
+        targets = _build_target_index(project, output_quantities, project.settings.tvec)
+
+        # Set up the blocks of quantities to calibrate. Each block is a tuple with the indices of the quantities in `pars_to_adjust`
+        # and the targets contributing to the objective for that block. Blocks in the same stage are calibrated concurrently
+        if decompose:
+            groups = _get_population_groups(project.framework, parset)
+            logger.info("Calibrating %d independent population groups: %s", len(groups), "; ".join(", ".join(group) for group in groups))
+            stages = [[], []]  # The first stage calibrates population-specific quantities in each group, the second calibrates quantities affecting all populations
+            for group in groups:
+                par_idx = [i for i, x in enumerate(pars_to_adjust) if x[1] in group]
+                if par_idx:
+                    stages[0].append((par_idx, [target for target in targets if target["pop_name"] in group]))
+            par_idx = [i for i, x in enumerate(pars_to_adjust) if x[1] == "all"]
+            if par_idx:
+                stages[1].append((par_idx, targets))
+            stages = [stage for stage in stages if stage]
         else:
-            raise Exception("Unrecognized method")
-    except Exception as e:
-        raise e
+            stages = [[(list(range(len(pars_to_adjust))), targets)]]
+
+        # If the population groups are calibrated in a single stage, they are completely independent, so a single cycle is sufficient
+        n_cycles = max_cycles if len(stages) > 1 else 1
+
+        x1 = np.array(x0, dtype=float)
+        xmin = np.array(xmin, dtype=float)
+        xmax = np.array(xmax, dtype=float)
+        objective = np.inf
+
+        for cycle in range(n_cycles):
+            for stage in stages:
+                _update_parset(args["parset"], x1, pars_to_adjust)
+                jobs = []
+                for par_idx, block_targets in stage:
+                    block_pars = [pars_to_adjust[i] for i in par_idx]
+                    block_args = {
+                        "project": project,
+                        "parset": args["parset"].copy(),
+                        "pars_to_adjust": block_pars,
+                        "targets": block_targets,
+                    }
+                    if build_once and all(x[0] in parset.pars for x in block_pars):
+                        block_args["template"] = _build_template(project, block_args["parset"], block_pars)
+                    for x_start in _get_start_points(x1[par_idx], xmin[par_idx], xmax[par_idx], n_starts, rng):
+                        job_seed = int(rng.integers(2**31 - 1)) if (parallel or seed is not None) else None  # Parallel workers always need distinct seeds
+                        jobs.append((block_args, x_start, xmin[par_idx], xmax[par_idx], method, max_time, job_seed))
+
+                if parallel and len(jobs) > 1:
+                    results = parallel_progress(_run_calibration, jobs, num_workers=num_workers)
+                else:
+                    results = [_run_calibration(job) for job in jobs]
+
+                # Select the best start for each block
+                for par_idx, _ in stage:
+                    block_results = [x for x in (results.pop(0) for _ in range(n_starts)) if x is not None]  # Failed parallel runs return None
+                    if not block_results:
+                        raise Exception("Calibration failed - check the log output from the parallel workers for details")
+                    best = min(block_results, key=lambda x: x[1])
+                    x1[par_idx] = best[0]
+
+            if n_cycles > 1:
+                previous = objective
+                objective = _calculate_objective(x1, pars_to_adjust, targets, args["parset"], project)
+                logger.info("Calibration cycle %d: objective = %g", cycle + 1, objective)
+                if np.isfinite(previous) and (previous - objective) <= 1e-3 * abs(previous):
+                    break
     finally:
         project.settings.sim_end = original_sim_end  # Restore the simulation end year
 
@@ -249,3 +674,170 @@ def calibrate(project, parset: ParameterSet, pars_to_adjust, output_quantities,
     args["parset"].name = "calibrated_" + args["parset"].name
 
     return args["parset"]
+
+
+def _run_chain(job) -> tuple:
+    """
+    Run a single adaptive Metropolis chain
+
+    The proposal distribution is a multivariate normal centred on the current point. After ``adapt_start`` iterations, the
+    proposal covariance is set to the scaled empirical covariance of the chain so far (Haario et al., 2001). The chain state
+    is periodically written to ``checkpoint_file`` if provided, and if this file already exists, the chain resumes from the
+    saved state.
+
+    :param job: A tuple containing ``(args, x0, xmin, xmax, n_iter, adapt_start, temperature, seed, checkpoint_file, checkpoint_interval)``
+                where ``args`` are the arguments for :func:`_calculate_objective`
+    :return: A tuple with an array of samples (``n_iter x n_pars``), an array of log posterior values, and the number of accepted proposals
+
+    """
+
+    args, x0, xmin, xmax, n_iter, adapt_start, temperature, seed, checkpoint_file, checkpoint_interval = job
+
+    d = len(x0)
+    initial_cov = np.diag((0.02 * (xmax - xmin)) ** 2)  # Initial proposal width of 2% of the range
+
+    if checkpoint_file and os.path.isfile(checkpoint_file):
+        state = sc.loadobj(checkpoint_file)
+        logger.info("Resuming chain from %d iterations in %s", len(state["samples"]), checkpoint_file)
+        rng = np.random.default_rng()
+        rng.bit_generator.state = state["rng"]
+    else:
+        x = np.array(x0, dtype=float)
+        state = {"samples": [], "logp": [], "x": x, "lp": -_calculate_objective(x, **args) / temperature, "n_accept": 0, "mean": np.zeros(d), "m2": np.zeros((d, d))}
+        rng = np.random.default_rng(seed)
+
+    x = state["x"]
+    lp = state["lp"]
+
+    while len(state["samples"]) < n_iter:
+        i = len(state["samples"])
+
+        if i >= adapt_start and i > d:
+            cov = (2.38**2 / d) * (state["m2"] / (i - 1) + 1e-10 * np.eye(d))
+        else:
+            cov = initial_cov
+
+        proposal = x + np.linalg.cholesky(cov) @ rng.standard_normal(d)
+        if np.all(proposal >= xmin) and np.all(proposal <= xmax):  # The prior is uniform within the limits
+            lp_proposal = -_calculate_objective(proposal, **args) / temperature
+            if np.log(rng.uniform()) < lp_proposal - lp:
+                x = proposal
+                lp = lp_proposal
+                state["n_accept"] += 1
+
+        # Update the running mean and covariance using Welford's algorithm
+        delta = x - state["mean"]
+        state["mean"] = state["mean"] + delta / (i + 1)
+        state["m2"] = state["m2"] + np.outer(delta, x - state["mean"])
+
+        state["samples"].append(x)
+        state["logp"].append(lp)
+        state["x"] = x
+        state["lp"] = lp
+
+        if checkpoint_file and (len(state["samples"]) % checkpoint_interval == 0 or len(state["samples"]) == n_iter):
+            state["rng"] = rng.bit_generator.state
+            sc.saveobj(checkpoint_file, state)
+
+    return np.array(state["samples"]), np.array(state["logp"]), state["n_accept"]
+
+
+def sample_posterior(project, parset: ParameterSet, pars_to_adjust, output_quantities, n_samples: int = 100, n_chains: int = 4, burn_in: int = 500, thin: int = 10, temperature: float = 1.0, parallel: bool = False, num_workers: int = None, checkpoint: str = None, checkpoint_interval: int = 100, seed: int = None, build_once: bool = True) -> list:
+    """
+    Sample parameter sets from the calibration posterior
+
+    This function uses adaptive Metropolis MCMC to draw samples of the scale factors being calibrated. The calibration
+    objective (as used in :func:`calibrate`) is treated as a negative log-likelihood, scaled by ``1/temperature``, and the prior
+    is uniform within the limits in ``pars_to_adjust``. Each chain is run independently, optionally in parallel, with the model
+    being built once and only the scale factors updated for each evaluation. The resulting ``ParameterSet`` instances can be
+    used to run an ensemble of simulations representing calibration uncertainty.
+
+    :param project: A project instance to provide data and sim settings
+    :param parset: A :class:`ParameterSet` instance to sample from. The first chain starts from the values in this parset, so
+                   normally this would already be calibrated
+    :param pars_to_adjust: list of tuples, (par_name,pop_name,lower_limit,upper_limit) as for :func:`calibrate`. The limits must be finite
+    :param output_quantities: list of tuples, (var_label,pop_name,weight,metric) as for :func:`calibrate`
+    :param n_samples: Total number of parameter sets to return, drawn evenly from all chains
+    :param n_chains: Number of independent chains
+    :param burn_in: Number of initial iterations to discard from each chain. Adaptation of the proposal distribution starts halfway through the burn-in
+    :param thin: Retain every ``thin`` iterations after the burn-in
+    :param temperature: Scale factor for the objective. Larger values broaden the posterior
+    :param parallel: If True, run the chains in parallel
+    :param num_workers: If ``parallel`` is True, the number of workers to use (defaults to the number of CPUs)
+    :param checkpoint: Optionally specify a file name prefix for checkpoint files. Chain ``i`` will be saved to ``<checkpoint>_chain<i>.chk``
+                       every ``checkpoint_interval`` iterations. If the checkpoint files already exist, sampling resumes from the saved chains
+    :param checkpoint_interval: Number of iterations between checkpoints
+    :param seed: Optionally specify a random seed
+    :param build_once: If True, the model will be built once and only the scale factors will be updated for each evaluation
+    :return: A list of :class:`ParameterSet` instances
+
+    """
+
+    pars_to_adjust = _expand_pars_to_adjust(parset, pars_to_adjust)
+    output_quantities = _expand_output_quantities(project, output_quantities)
+    x0, xmin, xmax = _get_initial_values(parset, pars_to_adjust)
+    xmin = np.array(xmin, dtype=float)
+    xmax = np.array(xmax, dtype=float)
+
+    if np.any(~np.isfinite(xmin)) or np.any(~np.isfinite(xmax)):
+        raise Exception("Posterior sampling requires finite upper and lower bounds (i.e. every parameter being adjusted needs to have finite bounds)")
+
+    n_per_chain = int(np.ceil(n_samples / n_chains))
+    n_iter = burn_in + n_per_chain * thin
+
+    # Chains other than the first start from a dispersed point near the initial values
+    seeds = np.random.SeedSequence(seed).spawn(n_chains + 1)
+    rng = np.random.default_rng(seeds[-1])
+    starts = [np.clip(np.array(x0, dtype=float), xmin, xmax)]
+    for _ in range(n_chains - 1):
+        starts.append(np.clip(starts[0] * np.exp(rng.normal(0, 0.05, len(x0))), xmin, xmax))
+
+    original_sim_end = project.settings.sim_end
+    project.settings.sim_end = min(project.data.tvec[-1], original_sim_end)
+
+    try:
+        args = {
+            "project": project,
+            "parset": parset.copy(),
+            "pars_to_adjust": pars_to_adjust,
+            "targets": _build_target_index(project, output_quantities, project.settings.tvec),
+        }
+        if build_once and all(x[0] in parset.pars for x in pars_to_adjust):
+            args["template"] = _build_template(project, args["parset"], pars_to_adjust)
+
+        jobs = []
+        for i in range(n_chains):
+            checkpoint_file = f"{checkpoint}_chain{i}.chk" if checkpoint else None
+            jobs.append((args, starts[i], xmin, xmax, n_iter, burn_in // 2, temperature, seeds[i], checkpoint_file, checkpoint_interval))
+
+        if parallel and n_chains > 1:
+            chains = parallel_progress(_run_chain, jobs, num_workers=num_workers)
+            if any(x is None for x in chains):
+                raise Exception("Posterior sampling failed - check the log output from the parallel workers for details")
+        else:
+            chains = [_run_chain(job) for job in jobs]
+    finally:
+        project.settings.sim_end = original_sim_end  # Restore the simulation end year
+
+    for i, (_, logp, n_accept) in enumerate(chains):
+        logger.info("Chain %d: acceptance rate = %.2f, final log posterior = %g", i, n_accept / n_iter, logp[-1])
+
+    # Gelman-Rubin convergence diagnostic, computed over the retained samples
+    retained = np.array([samples[burn_in:] for samples, _, _ in chains])  # Chains x iterations x parameters
+    if n_chains > 1 and retained.shape[1] > 1:
+        within = retained.var(axis=1, ddof=1).mean(axis=0)
+        between = retained.shape[1] * retained.mean(axis=1).var(axis=0, ddof=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rhat = np.sqrt(((retained.shape[1] - 1) / retained.shape[1] * within + between / retained.shape[1]) / within)
+        logger.info("Maximum Gelman-Rubin R-hat = %g", np.nanmax(rhat) if np.any(np.isfinite(rhat)) else np.nan)
+
+    parsets = []
+    for i in range(n_per_chain):
+        for samples, _, _ in chains:
+            if len(parsets) < n_samples:
+                new_parset = parset.copy()
+                _update_parset(new_parset, samples[burn_in + (i + 1) * thin - 1], pars_to_adjust)
+                new_parset.name = "%s (posterior %d)" % (parset.name, len(parsets) + 1)
+                parsets.append(new_parset)
+
+    return parsets
@@ -859,7 +859,6 @@ class CascadeEnsemble(Ensemble):
 
         vals = sc.odict()
         uncertainty = sc.odict()
-        series_lookup = self._get_series()
 
         for result in self.results:
 
@@ -868,8 +867,8 @@ class CascadeEnsemble(Ensemble):
 
             for stage in self.outputs:
 
-                stage_vals = [x.vals[years_idx] for x in series_lookup[result, pop, stage]]
-                uncertainty[result][stage] = np.vstack(stage_vals).std(axis=0)
+                stage_vals = self._get_values(result, pop, stage)[:, years_idx]
+                uncertainty[result][stage] = stage_vals.std(axis=0)
 
                 # Populate the baseline values
                 if self.baseline:
@@ -923,7 +922,6 @@ class CascadeEnsemble(Ensemble):
         # A bar group is for a single year-result combination but contains multiple outputs
         n_colors = len(years) * len(self.results)  # Offset to apply to each bar
         n_stages = len(self.outputs)  # Number of stages being plotted
-        series_lookup = self._get_series()
 
         w = 1  # bar width
         g1 = 0.1  # gap between bars
@@ -940,10 +938,7 @@ class CascadeEnsemble(Ensemble):
                 # Assemble the results for the bar group to render
                 # This is an array with an entry for every bar
                 # The outputs are ordered as the dict is ordered so can use them directly
-                stage_vals = []
-                for output in self.outputs:
-                    stage_vals.append(np.array([x.vals[year_idx] for x in series_lookup[result, pop, output]]))
-                stage_vals = np.vstack(stage_vals).T
+                stage_vals = np.vstack([self._get_values(result, pop, output)[:, year_idx] for output in self.outputs]).T
 
                 if self.baseline:
                     baseline_vals = np.array([self.baseline[result, pop, x].vals[year_idx] for x in self.outputs])
@@ -11,7 +11,7 @@ import ast
 import numpy as np
 from functools import reduce
 
-__all__ = ["parse_function"]
+__all__ = ["parse_function", "Dual"]
 
 
 def sdiv(numerator, denominator):
@@ -75,6 +75,161 @@ def vector_max(*args):
     return reduce(np.maximum, args)
 
 
+def _expand_dual_dims(x) -> np.array:
+    # Add a trailing dimension to a value so that it broadcasts against the derivatives of a :class:`Dual`
+    return np.expand_dims(np.asarray(x, dtype=float), -1)
+
+
+class Dual:
+    """
+    Forward-mode derivative of a parameter function
+
+    A ``Dual`` stores a value together with its derivatives with respect to a set of
+    independent variables (e.g., scale factors). Passing ``Dual`` instances into a function
+    returned by :func:`parse_function` propagates the derivatives through each operation
+    in the parsed expression via the chain rule. The supported functions in the expression
+    are implemented as numpy ufuncs, which dispatch to ``Dual.__array_ufunc__``.
+
+    The value can be a scalar or an array. The derivatives have one extra trailing dimension,
+    so if the value has shape ``(n,)`` and there are ``m`` independent variables, then the
+    derivatives have shape ``(n,m)``.
+
+    Example:
+
+        >>> fcn, deps = parse_function('exp(x)*y')
+        >>> z = fcn(x=Dual(0,np.array([1,0])),y=Dual(2,np.array([0,1])))
+        >>> z.val, z.grad
+        (2.0, array([2., 1.]))
+
+    :param val: The value of the quantity
+    :param grad: The derivatives of the quantity
+
+    """
+
+    def __init__(self, val, grad):
+        self.val = val
+        self.grad = grad
+
+    def __repr__(self):
+        return "Dual(%s, %s)" % (self.val, self.grad)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__":
+            return NotImplemented
+
+        vals = [x.val if isinstance(x, Dual) else x for x in inputs]
+        grads = [x.grad if isinstance(x, Dual) else 0.0 for x in inputs]
+        e = _expand_dual_dims
+        name = ufunc.__name__
+
+        if name in {"greater", "greater_equal", "less", "less_equal", "equal", "not_equal"}:
+            return ufunc(*vals)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if name == "add":
+                return Dual(vals[0] + vals[1], grads[0] + grads[1])
+            elif name == "subtract":
+                return Dual(vals[0] - vals[1], grads[0] - grads[1])
+            elif name == "multiply":
+                return Dual(vals[0] * vals[1], e(vals[1]) * grads[0] + e(vals[0]) * grads[1])
+            elif name in {"divide", "true_divide"}:
+                # Division by zero returns a zero derivative. If a `where` argument is provided (as in `sdiv`), the value is
+                # zero where the condition is not met, consistent with `np.divide(...,out=np.zeros(...),where=...)`
+                u, v = np.asarray(vals[0], dtype=float), np.asarray(vals[1], dtype=float)
+                nonzero = v != 0
+                q = np.where(nonzero, u / np.where(nonzero, v, 1.0), 0.0)
+                grad = np.where(e(nonzero), (grads[0] - e(q) * grads[1]) / e(np.where(nonzero, v, 1.0)), 0.0)
+                if "where" in kwargs:
+                    q = np.where(kwargs["where"], q, 0.0)
+                return Dual(q, grad)
+            elif name == "negative":
+                return Dual(-vals[0], -grads[0])
+            elif name == "positive":
+                return Dual(vals[0], grads[0])
+            elif name == "power":
+                u, v = vals
+                val = u**v
+                grad = e(v * u ** (v - 1)) * grads[0]
+                if isinstance(inputs[1], Dual):
+                    grad = grad + e(np.where(u > 0, val * np.log(np.where(u > 0, u, 1.0)), 0.0)) * grads[1]
+                return Dual(val, grad)
+            elif name == "exp":
+                val = np.exp(vals[0])
+                return Dual(val, e(val) * grads[0])
+            elif name == "log":
+                return Dual(np.log(vals[0]), grads[0] / e(vals[0]))
+            elif name == "sqrt":
+                val = np.sqrt(vals[0])
+                return Dual(val, grads[0] / e(2 * val))
+            elif name == "sin":
+                return Dual(np.sin(vals[0]), e(np.cos(vals[0])) * grads[0])
+            elif name == "cos":
+                return Dual(np.cos(vals[0]), -e(np.sin(vals[0])) * grads[0])
+            elif name == "floor":
+                return Dual(np.floor(vals[0]), 0.0 * np.asarray(grads[0]))
+            elif name in {"maximum", "minimum"}:
+                select = vals[0] >= vals[1] if name == "maximum" else vals[0] <= vals[1]
+                return Dual(ufunc(*vals), np.where(e(select), grads[0], grads[1]))
+
+        raise NotImplementedError("Derivatives of '%s' are not supported" % (name))
+
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.divide(other, self)
+
+    def __pow__(self, other):
+        return np.power(self, other)
+
+    def __rpow__(self, other):
+        return np.power(other, self)
+
+    def __neg__(self):
+        return np.negative(self)
+
+    def __pos__(self):
+        return self
+
+    def __lt__(self, other):
+        return np.less(self, other)
+
+    def __le__(self, other):
+        return np.less_equal(self, other)
+
+    def __gt__(self, other):
+        return np.greater(self, other)
+
+    def __ge__(self, other):
+        return np.greater_equal(self, other)
+
+    def __eq__(self, other):
+        return np.equal(self, other)
+
+    def __ne__(self, other):
+        return np.not_equal(self, other)
+
+    __hash__ = None
+
+
 # Only calls to functions in the dict below will be permitted
 supported_functions = {"max": vector_max, "min": vector_min, "exp": np.exp, "floor": np.floor, "SRC_POP_AVG": None, "TGT_POP_AVG": None, "SRC_POP_SUM": None, "TGT_POP_SUM": None, "pi": np.pi, "cos": np.cos, "sin": np.sin, "sqrt": np.sqrt, "ln": np.log, "rand": np.random.rand, "randn": np.random.randn, "sdiv": sdiv}
 
@@ -13,9 +13,12 @@ from .system import NotFoundError
 from .system import logger
 from .system import FrameworkSettings as FS
 from .results import Result
-from .function_parser import parse_function
+from .function_parser import parse_function, Dual
 from .version import version, gitinfo
 from collections import defaultdict
+import hashlib
+import pickle
+import weakref
 import sciris as sc
 import numpy as np
 import matplotlib.pyplot as plt
@@ -27,6 +30,8 @@ import math
 model_settings = dict()
 model_settings["tolerance"] = 1e-6
 
+_interned = weakref.WeakValueDictionary()  # Copies of frameworks and program sets shared between models - see `_intern()`
+
 __all__ = [
     "BadInitialization",
     "ModelError",
@@ -44,6 +49,8 @@ __all__ = [
     "Population",
     "Model",
     "run_model",
+    "get_initialization_systems",
+    "check_initialization",
 ]
 
 
@@ -1100,6 +1107,18 @@ class Parameter(Variable):
         #: one wanted to use 1/365.25 instead of 1/365)
         self.timescale = 1.0
 
+    def __getattr__(self, name):
+        # Postcompute parameters (those with functions that are not needed for integration) are evaluated when their values are
+        # first accessed, rather than at the end of `Model.process()`. Until then, their values are stored in `_postcompute_vals`
+        # instead of `vals`, so this method is only called the first time `vals` is accessed. Any postcompute parameters that
+        # this parameter depends on are evaluated first in the same way when `update()` accesses their values
+        if name == "vals" and "_postcompute_vals" in self.__dict__:
+            self.vals = self.__dict__.pop("_postcompute_vals")
+            self.update()
+            self.constrain()
+            return self.vals
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
     def set_fcn(self, fcn_str) -> None:
         """
         Add a function to this parameter
@@ -1866,9 +1885,7 @@ class Population:
                 A[i, comp_indices[obj.name]] = 1.0
 
         # Solve the linear system (nb. lstsq returns the minimum norm solution
-        x = np.linalg.lstsq(A, b.ravel(), rcond=None)[0].reshape(-1, 1)
-        proposed = np.matmul(A, x)
-        residual = np.sum((proposed.ravel() - b.ravel()) ** 2)
+        x, proposed, residual = _solve_initialization(A, b)
 
         # Accumulate any errors here. The errors could occur either at the system level or at the level
         # of individual comps/characs. To avoid
@@ -1944,6 +1961,119 @@ class Population:
             c[0] = max(0.0, x[i])
 
 
+def _solve_initialization(A: np.ndarray, b: np.ndarray) -> tuple:
+    """
+    Solve for initial compartment sizes
+
+    :param A: The includes matrix mapping compartments to characteristics
+    :param b: A column vector of characteristic values
+    :return: A tuple with the compartment sizes ``x`` and the proposed characteristic values ``A*x`` (both column vectors), and the residual
+
+    """
+
+    x = np.linalg.lstsq(A, b.ravel(), rcond=None)[0].reshape(-1, 1)
+    proposed = np.matmul(A, x)
+    residual = np.sum((proposed.ravel() - b.ravel()) ** 2)
+    return x, proposed, residual
+
+
+def get_initialization_systems(framework, parset: ParameterSet) -> dict:
+    """
+    Construct initialization systems for each population
+
+    This function assembles the linear system used by :meth:`Population.initialize_compartments` directly from the framework,
+    without constructing a :class:`Model`. The systems only depend on the framework and the population types, so they can
+    be computed once and reused by :func:`check_initialization` for any number of sampled parameter sets.
+
+    :param framework: A :class:`ProjectFramework` instance
+    :param parset: A :class:`ParameterSet` instance, used to get the populations and their types
+    :return: A dict keyed by population name, containing a tuple with a list of the setup quantity names, a list of
+             denominator names (or ``None``) and the includes matrix ``A``
+
+    """
+
+    by_type = {}
+    systems = {}
+    for pop_name, pop_type in zip(parset.pop_names, parset.pop_types):
+        if pop_type not in by_type:
+            characs = framework.characs.loc[~framework.characs["databook page"].isnull() & framework.characs["setup weight"] & (framework.characs["population type"] == pop_type)]
+            comps = framework.comps.loc[~framework.comps["databook page"].isnull() & framework.comps["setup weight"] & (framework.comps["population type"] == pop_type)]
+            all_comps = framework.comps.index[(framework.comps["population type"] == pop_type) & (framework.comps["is source"] != "y") & (framework.comps["is sink"] != "y")]
+            comp_indices = {c: i for i, c in enumerate(all_comps)}
+
+            names = list(characs.index) + list(comps.index)
+            denominators = [x if sc.isstring(x) else None for x in characs["denominator"]] + [None] * len(comps)
+            A = np.zeros((len(names), len(all_comps)))
+            for i, name in enumerate(names):
+                for inc in framework.get_charac_includes(name):
+                    A[i, comp_indices[inc]] = 1.0
+            by_type[pop_type] = (names, denominators, A)
+        systems[pop_name] = by_type[pop_type]
+    return systems
+
+
+def check_initialization(parset: ParameterSet, systems: dict, t_init: float) -> None:
+    """
+    Check that a parameter set produces a valid initialization
+
+    This function solves the initialization system for each population in the same way as
+    :meth:`Population.initialize_compartments`, and raises the same :class:`BadInitialization` error if the
+    initial compartment sizes would be invalid. Because this does not require building a :class:`Model`, it can be
+    used to cheaply reject sampled parameter sets before running a simulation. If this check passes, the model
+    initialization will also succeed.
+
+    :param parset: A :class:`ParameterSet` instance
+    :param systems: Initialization systems returned by :func:`get_initialization_systems`
+    :param t_init: The year to use for initialization. This should generally be set to the sim start year
+    :raises: :class:`BadInitialization` if the initialization is invalid
+
+    """
+
+    for pop_name, (names, denominators, A) in systems.items():
+        b = np.zeros((len(names), 1))
+        for i, (name, denominator) in enumerate(zip(names, denominators)):
+            par = parset.pars[name]
+            b[i] = par.interpolate(t_init, pop_name=pop_name)[0] * par.y_factor[pop_name] * par.meta_y_factor
+            if denominator is not None:
+                denom_par = parset.pars[denominator]
+                b[i] *= denom_par.interpolate(t_init, pop_name=pop_name)[0] * denom_par.y_factor[pop_name] * denom_par.meta_y_factor
+
+        x, proposed, residual = _solve_initialization(A, b)
+        if residual > model_settings["tolerance"] or np.any(np.abs(proposed - b) > model_settings["tolerance"]) or np.any(x < -model_settings["tolerance"]):
+            raise BadInitialization(f"Initialization of population '{pop_name}' failed - use `run_sim()` with this parameter set for details")
+
+
+def _intern(obj):
+    """
+    Return a shared copy of an object
+
+    Models store copies of the framework and program set they were built with. These are normally
+    identical across many models (e.g., for scenarios or sampled runs) so a single copy is shared by
+    all models built from objects with the same contents. Copies are identified by a hash of the pickled
+    object, so modifying the original object results in a new copy for subsequent models. Because the copies
+    are shared, they must not be modified. A copy is kept only as long as a model refers to it.
+
+    :param obj: The object to copy
+    :return: A copy of the object, which may be shared with other models
+
+    """
+
+    if obj is None:
+        return None
+
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    key = (type(obj), hashlib.sha256(data).digest())
+    shared = _interned.get(key)
+    if shared is None:
+        shared = pickle.loads(data)
+        _interned[key] = shared
+        # Pickling the copy does not always give exactly the same bytes as the original (e.g., if the
+        # original contained equal objects that were not identical) so also store the copy using its own
+        # hash, so that unpickled copies of the shared object are also identified
+        _interned[(type(obj), hashlib.sha256(pickle.dumps(shared, protocol=pickle.HIGHEST_PROTOCOL)).digest())] = shared
+    return shared
+
+
 class Model:
     """ A class to wrap up multiple populations within model and handle cross-population transitions. """
 
@@ -1963,7 +2093,7 @@ class Model:
         self.pops = list()  # List of population groups that this model subdivides into.
         self.interactions = sc.odict()
         self.programs_active = None  # True or False depending on whether Programs will be used or not
-        self.progset = sc.dcp(progset)
+        self.progset = _intern(progset)  # Store a copy of the ProgramSet, shared with other models using the same ProgramSet
         self.program_instructions = sc.dcp(program_instructions)  # program instructions
         self.t = settings.tvec  #: Simulation time vector (this is a brand new instance from the `settings.tvec` property method)
         self.dt = settings.sim_dt  #: Simulation time step
@@ -1973,9 +2103,17 @@ class Model:
         self._pop_ids = sc.odict()  # Maps name of a population to its position index within populations list.
         self._program_cache = None  #: Cache program capacities and coverage for coverage scenarios
         self._exec_order = None  #: Cache the dependency order of various quantities
+        self._scale_factors = dict()  #: Map parameter IDs to the ``(meta_y_factor, y_factor)`` used to compute their scale factor
+        self._tangent = None  #: Internal storage for derivatives during integration with sensitivities
+
+        self.sensitivity_factors = None  #: List of ``(par_name, pop_name)`` scale factors that sensitivities were computed for
+        self.sensitivities = None  #: Dict mapping compartment IDs to arrays of derivatives with respect to ``sensitivity_factors``
 
-        self.framework = sc.dcp(framework)  # Store a copy of the Framework used to generate this model
-        self.framework.spreadsheet = None  # No need to keep the spreadsheet
+        # Store a copy of the Framework used to generate this model, shared with other models using the same Framework. There
+        # is no need to keep the spreadsheet, so it is removed from a shallow copy before the Framework is copied
+        framework_copy = framework.__class__.__new__(framework.__class__)
+        framework_copy.__dict__ = {**framework.__dict__, "spreadsheet": None}
+        self.framework = _intern(framework_copy)
 
         self.build(parset)
 
@@ -2083,24 +2221,30 @@ class Model:
                 self._vars_by_pop[var.name].append(var)
         self._vars_by_pop = dict(self._vars_by_pop)  # Stop new entries from appearing in here by accident
 
-    def __getstate__(self):
+    def _copy_state(self) -> dict:
+        # Return a copy of the unlinked state. The shared framework and progset are not copied,
+        # so that they are only stored once when several models are pickled together
         self.unlink()
-        d = sc.dcp(self.__dict__)  # Pickling to string results in a copy
+        d = sc.dcp({k: v for k, v in self.__dict__.items() if k not in {"framework", "progset"}})
         self.relink()  # Relink, otherwise the original object gets unlinked
+        d["framework"] = self.framework
+        d["progset"] = self.progset
         return d
 
+    def __getstate__(self):
+        return self._copy_state()  # Pickling to string results in a copy
+
     def __setstate__(self, d):
         self.__dict__ = d
+        self.framework = _intern(self.framework)  # Share the framework and progset with other models that have been loaded
+        self.progset = _intern(self.progset)
         self.relink()
 
     def __deepcopy__(self, memodict={}):
         # Using dcp(self.__dict__) is faster than pickle getstate/setstate
         # when this is called via copy.deepcopy()
-        self.unlink()
-        d = sc.dcp(self.__dict__)
-        self.relink()
         new = Model.__new__(Model)
-        new.__dict__.update(d)
+        new.__dict__.update(self._copy_state())
         new.relink()
         return new
 
@@ -2214,6 +2358,9 @@ class Model:
 
                 if par.pop.name in cascade_par.y_factor:
                     par.scale_factor *= cascade_par.y_factor[par.pop.name]  # Add in population-specific scale factor
+                    self._scale_factors[par.id] = (cascade_par.meta_y_factor, cascade_par.y_factor[par.pop.name])
+                else:
+                    self._scale_factors[par.id] = (cascade_par.meta_y_factor, None)
 
                 if par.pop.name in cascade_par.skip_function:
                     par.skip_function = cascade_par.skip_function[par.pop.name]  # Copy in any skipped evaluations
@@ -2238,6 +2385,87 @@ class Model:
                 obj.preallocate(self.t, self.dt)
             pop.initialize_compartments(parset, self.framework, self.t[0])
 
+    def update_scale_factors(self, parset, par_names: list, interpolated: dict = None) -> None:
+        """
+        Apply updated scale factors to a built model
+
+        This method updates a model that has been built but not yet processed, so that it reflects the
+        ``y_factor`` and ``meta_y_factor`` values in ``parset`` for the quantities named in ``par_names``.
+        It is intended for calibration, where the same model is run many times with only the scale
+        factors changing. Rather than building a new model from scratch, only the following steps are carried out
+
+            - The scale factors for the named parameters are updated
+            - Databook values for the named parameters are rescaled
+            - Precomputed parameters that depend on the named parameters are re-evaluated
+            - Storage is reallocated in populations where a duration parameter has changed
+            - Initial compartment sizes are recomputed in populations where an initialization
+              quantity or duration has changed
+
+        The model must have been built using a ``ParameterSet`` with the same structure as ``parset``.
+
+        :param parset: A :class:`ParameterSet` instance with the updated scale factors
+        :param par_names: List of code names of quantities in ``parset.pars`` whose scale factors may have changed
+        :param interpolated: Optionally, a dict ``{(par_name,pop_name):vals}`` with *unscaled* interpolated
+                             databook values. If provided, these will be used instead of interpolating the
+                             ``parset`` values again
+        :return: None. The model is modified in-place
+
+        """
+
+        assert self._t_index == 0, "Scale factors can only be updated before the model has been processed"
+
+        if self._exec_order is None:
+            self._set_exec_order()
+
+        par_names = set(par_names)
+        changed = set()  # IDs of parameters whose values have been updated
+        reinitialize = set()  # Names of populations that need initial compartment sizes to be recomputed
+        reallocate = set()  # Names of populations that need storage to be preallocated again
+
+        for pop in self.pops:
+            if any(x in pop.comp_lookup or x in pop.charac_lookup for x in par_names):
+                reinitialize.add(pop.name)
+
+        for par_name in self._exec_order["all_pars"]:
+            if par_name not in parset.pars:
+                continue
+
+            cascade_par = parset.pars[par_name]
+            for par in self._vars_by_pop[par_name]:
+
+                if par_name in par_names:
+                    par.scale_factor = cascade_par.meta_y_factor
+                    if par.pop.name in cascade_par.y_factor:
+                        par.scale_factor *= cascade_par.y_factor[par.pop.name]
+                        self._scale_factors[par.id] = (cascade_par.meta_y_factor, cascade_par.y_factor[par.pop.name])
+                    else:
+                        self._scale_factors[par.id] = (cascade_par.meta_y_factor, None)
+                elif not (par._precompute and any(dep.id in changed for deps in par.deps.values() for dep in deps)):
+                    continue
+
+                if par.fcn_str and par._precompute:
+                    par.update()
+                elif cascade_par.has_values(par.pop.name):
+                    if interpolated is not None and (par_name, par.pop.name) in interpolated:
+                        vals = interpolated[(par_name, par.pop.name)]
+                    else:
+                        vals = cascade_par.interpolate(tvec=self.t, pop_name=par.pop.name)
+                    par.vals = vals * par.scale_factor
+
+                par.constrain()
+                changed.add(par.id)
+
+                if any(getattr(comp, "duration_group", None) == par.name for comp in par.pop.comps):
+                    reallocate.add(par.pop.name)
+                    reinitialize.add(par.pop.name)
+
+        for pop in self.pops:
+            if pop.name in reallocate:
+                for obj in pop.comps + pop.characs + pop.links:
+                    obj.preallocate(self.t, self.dt)
+            if pop.name in reinitialize:
+                pop.initialize_compartments(parset, self.framework, self.t[0])
+
     def _set_exec_order(self) -> None:
         """
         Get the execution order
@@ -2341,13 +2569,38 @@ class Model:
 
         self._exec_order = exec_order
 
-    def process(self) -> None:
-        """ Run the full model. """
+    def process(self, sensitivity: list = None) -> None:
+        """
+        Run the full model
+
+        Optionally, the derivatives of the compartment sizes with respect to parameter scale factors
+        can be computed at the same time. The derivatives are propagated forward alongside the
+        compartment sizes through each compartment, link, and parameter update, with parameter
+        functions being differentiated via the chain rule (see :class:`Dual`). This gives exact
+        derivatives from a single integration, rather than requiring two simulations per scale factor
+        for a finite difference approximation. After integration, the derivatives are stored in
+        ``Model.sensitivities`` and can be retrieved using :meth:`Model.get_sensitivity`.
+
+        If programs are active, the derivatives are also propagated through program capacity, coverage and outcomes,
+        and derivatives with respect to the annual spending on each program can be computed.
+
+        Sensitivities are not supported for models with timed compartments.
+
+        :param sensitivity: Optionally, a list of ``(par_name, pop_name)`` tuples specifying scale factors to compute
+                            derivatives with respect to. If ``pop_name`` is ``None``, the ``meta_y_factor`` will be used,
+                            otherwise the population-specific ``y_factor`` will be used. The list can also contain program
+                            names (strings), in which case the derivatives are with respect to the annual spending on
+                            that program (i.e., a change in spending applied in every year).
+
+        """
 
         assert self._t_index == 0  # Only makes sense to process a simulation once, starting at ti=0 - this might be relaxed later on
         self._set_exec_order()  # Set the execution order again in case the user has updated the parameters etc. It is critically important that this is correct during integration
         self._update_program_cache()
 
+        if sensitivity is not None:
+            self._initialize_tangent(sensitivity)
+
         # Initial flush of people in junctions
         if self._t_index == 0:
             self.update_pars()  # Update transition parameters in case junction outflows are function parameters
@@ -2362,12 +2615,15 @@ class Model:
             self.update_pars()
             self.update_links()
 
-        # Update postcompute parameters - note that it needs to be done in execution order
+        if self._tangent is not None:
+            self.sensitivities = {comp.id: self._tangent["vals"][comp] for pop in self.pops for comp in pop.comps}
+            self._tangent = None
+
+        # Defer postcompute parameters until their values are accessed - see `Parameter.__getattr__()`
         for par_name in self._exec_order["all_pars"]:
             for par in self._vars_by_pop[par_name]:
                 if par.fcn_str and not (par._is_dynamic or par._precompute):
-                    par.update()
-                    par.constrain()
+                    par._postcompute_vals = par.__dict__.pop("vals")
 
         # Clear characteristic internal storage and switch to dynamic computation to save space
         for pop in self.pops:
@@ -2469,6 +2725,9 @@ class Model:
         for j in self._exec_order["junctions"]:
             j.balance(ti)
 
+        if self._tangent is not None:
+            self._update_tangent_links()
+
     def update_comps(self) -> None:
         """
         Set the compartment values at self._t_index+1 based on the current values at self._t_index
@@ -2484,6 +2743,9 @@ class Model:
             for comp in pop.comps:
                 comp.update(ti)
 
+        if self._tangent is not None:
+            self._update_tangent_comps()
+
     def flush_junctions(self) -> None:
         """
         Flush initialization values from junctions
@@ -2498,6 +2760,8 @@ class Model:
         """
 
         for j in self._exec_order["junctions"]:
+            if self._tangent is not None:
+                self._flush_tangent(j)  # The derivatives must be flushed first, because the junction is emptied by the flush
             j.initial_flush()
 
     def update_pars(self) -> None:
@@ -2542,6 +2806,8 @@ class Model:
                         n += comp[ti]
                     prop_coverage[k] = self.progset.programs[k].get_prop_covered(self.t[ti], self._program_cache["capacities"][k][ti], n)
             prog_vals = self.progset.get_outcomes(prop_coverage)
+            if self._tangent is not None:
+                self._tangent["prop_coverage"] = prop_coverage
 
         for par_name in self._exec_order["dynamic_pars"]:
             # All of the parameters with this name, across populations.
@@ -2562,6 +2828,9 @@ class Model:
                         else:
                             par[ti] = prog_vals[(par.name, par.pop.name)]
 
+                        if self._tangent is not None:
+                            self._tangent["overwrite"][par] = par[ti]  # Store the value prior to unit conversion, which is required for the derivatives
+
                         if par.units == FS.QUANTITY_TYPE_NUMBER:
                             par[ti] *= par.source_popsize(ti) / self.dt  # The outcome in the progbook is per person reached, which is a timestep specific value. Thus, need to annualize here
                         elif par.units == FS.QUANTITY_TYPE_RATE or par.units == FS.QUANTITY_TYPE_PROBABILITY:
@@ -2616,8 +2885,569 @@ class Model:
                 else:
                     par.constrain(ti)
 
+        if self._tangent is not None:
+            self._update_tangent_pars()
+
+    def get_sensitivity(self, name: str, pop_name: str) -> np.array:
+        """
+        Return sensitivities of a compartment or characteristic
+
+        This method retrieves the derivatives computed by calling :meth:`Model.process` with
+        the ``sensitivity`` argument.
+
+        :param name: Code name of a compartment or characteristic
+        :param pop_name: Name of the population
+        :return: An array with one row for each time point and one column for each entry in ``Model.sensitivity_factors``
+
+        """
+
+        if getattr(self, "sensitivities", None) is None:  # Models from older versions do not have the attribute
+            raise ModelError("Sensitivities were not computed - call `Model.process()` with the `sensitivity` argument")
+
+        pop = self.get_pop(pop_name)
+        if name in pop.comp_lookup:
+            return self.sensitivities[pop.comp_lookup[name].id]
+        elif name in pop.charac_lookup:
+            tangent = {comp: self.sensitivities[comp.id] for comp in pop.comps}
+            return self._charac_tangent(pop.charac_lookup[name], np.arange(self.t.size), tangent)[1]
+        else:
+            raise NotFoundError(f'Sensitivities are only available for compartments and characteristics, "{name}" was not found in population "{pop_name}"')
+
+    def _initialize_tangent(self, sensitivity: list) -> None:
+        """
+        Set up derivative storage for sensitivities
+
+        This method checks that sensitivities are supported for this model, and initializes the derivatives
+        of all parameters that are not computed during integration, and of program capacities. Compartment sizes
+        at the start of the simulation do not depend on parameter scale factors or spending, so their derivatives
+        are initially zero.
+
+        :param sensitivity: List of ``(par_name, pop_name)`` tuples and program names, see :meth:`Model.process`
+
+        """
+
+        for pop in self.pops:
+            for comp in pop.comps:
+                if getattr(comp, "duration_group", None):
+                    raise NotImplementedError(f'Sensitivities are not supported for models with timed compartments ("{comp.name}")')
+
+        factors = []
+        for factor in sensitivity:
+            if isinstance(factor, str):
+                if not self.programs_active or factor not in self.progset.programs:
+                    raise NotFoundError(f'Sensitivities with respect to spending require program "{factor}" to be active in the model')
+                factors.append(factor)
+                continue
+            par_name, pop_name = factor
+            if par_name not in self._vars_by_pop or self._vars_by_pop[par_name][0].id not in self._scale_factors:
+                raise NotFoundError(f'Sensitivities can only be computed for parameter scale factors, "{par_name}" is not a parameter in the model')
+            if pop_name is not None and pop_name not in self._pop_ids:
+                raise NotFoundError(f'Population "{pop_name}" was not found')
+            factors.append((par_name, pop_name))
+
+        n = len(factors)
+        self._tangent = {"vals": {}, "dscale": {}, "cache": {}, "outflow": {}, "dx": {}, "capacities": {}, "prop_coverage": None, "overwrite": {}}
+
+        for pop in self.pops:
+            for obj in pop.comps + pop.links:
+                self._tangent["vals"][obj] = np.zeros((self.t.size, n))
+
+            for par in pop.pars:
+                # Derivative of the scale factor with respect to each of the factors
+                meta_y_factor, y_factor = self._scale_factors.get(par.id, (None, None))
+                dscale = np.zeros(n)
+                for i, factor in enumerate(factors):
+                    if isinstance(factor, str):
+                        continue  # Spending does not affect the scale factors
+                    par_name, pop_name = factor
+                    if par.name != par_name:
+                        continue
+                    elif pop_name is None:
+                        dscale[i] = 1.0 if y_factor is None else y_factor
+                    elif pop_name == par.pop.name and y_factor is not None:
+                        dscale[i] = meta_y_factor
+                self._tangent["dscale"][par] = dscale
+                self._tangent["dx"][par] = np.zeros(n)
+
+                # Parameter values from the databook are linear in the scale factor
+                d = np.zeros((self.t.size, n))
+                if dscale.any():
+                    if par.scale_factor:
+                        d = np.outer(par.vals / par.scale_factor, dscale)
+                        if par.limits is not None:
+                            d[(par.vals <= par.limits[0]) | (par.vals >= par.limits[1]), :] = 0.0
+                    elif not par.fcn_str or par.skip_function:
+                        raise ModelError(f'Sensitivities cannot be computed for parameter "{par.name}" in population "{pop.name}" because its scale factor is 0')
+                self._tangent["vals"][par] = d
+
+        # Precomputed parameters are differentiated in vector operations prior to integration
+        for par_name in self._exec_order["all_pars"]:
+            for par in self._vars_by_pop[par_name]:
+                if par.fcn_str and par._precompute:
+                    self._update_tangent_par(par)
+
+        # Program capacity is linear in spending, except where the capacity constraint is active
+        if self.programs_active:
+            alloc = self.progset.get_alloc(self.t, self.program_instructions)
+            for prog in self.progset.programs.values():
+                dcapacity = np.zeros((self.t.size, n))
+                if prog.name in factors and prog.name not in self.program_instructions.capacity:
+                    unit_cost = prog.unit_cost.interpolate(self.t, method="previous")
+                    spend_factor = self.dt if "/year" not in prog.unit_cost.units else 1.0
+                    d = spend_factor / unit_cost
+                    if prog.capacity_constraint.has_data:
+                        capacity_constraint = prog.capacity_constraint.interpolate(self.t, method="previous")
+                        if "/year" in prog.capacity_constraint.units:
+                            capacity_constraint = capacity_constraint * self.dt
+                        d = np.where(alloc[prog.name] * spend_factor / unit_cost >= capacity_constraint, 0.0, d)
+                    dcapacity[:, factors.index(prog.name)] = d
+                self._tangent["capacities"][prog.name] = dcapacity
+
+        self.sensitivity_factors = factors
+
+    def _charac_tangent(self, charac, ti, tangent: dict) -> tuple:
+        """
+        Return value and derivatives of a characteristic
+
+        :param charac: A :class:`Characteristic` instance
+        :param ti: An ``int``, or a numpy array with index values
+        :param tangent: Dict mapping compartments to arrays of derivatives
+        :return: Tuple with the value and derivatives of the characteristic at the requested times
+
+        """
+
+        val = 0.0
+        grad = 0.0
+        for inc in charac.includes:
+            if isinstance(inc, Characteristic):
+                v, g = self._charac_tangent(inc, ti, tangent)
+            else:
+                v, g = inc[ti], tangent[inc][ti]
+            val = val + v
+            grad = grad + g
+
+        if charac.denominator is not None:
+            if isinstance(charac.denominator, Characteristic):
+                denom, ddenom = self._charac_tangent(charac.denominator, ti, tangent)
+            else:
+                denom, ddenom = charac.denominator[ti], tangent[charac.denominator][ti]
+            denom = np.asarray(denom, dtype=float)
+            safe_denom = np.where(denom > 0, denom, 1.0)
+            ratio = val / safe_denom
+            grad = np.where(np.expand_dims(denom > 0, -1), (grad - np.expand_dims(ratio, -1) * ddenom) / np.expand_dims(safe_denom, -1), 0.0)
+            val = np.where(denom > 0, ratio, np.where(val < model_settings["tolerance"], 0.0, np.inf))  # Match the zero/zero and nonzero/zero handling in `Characteristic.update()`
+
+        return val, grad
+
+    def _update_tangent_par(self, par, ti=None) -> None:
+        """
+        Update parameter derivatives
+
+        This is the counterpart to :meth:`Parameter.update`. The parameter function is evaluated
+        with :class:`Dual` inputs to obtain the derivatives of the function with respect to the
+        scale factors. Derivatives are zero where the parameter value is at or beyond its limits.
+
+        :param par: A :class:`Parameter` instance
+        :param ti: An ``int``, or a numpy array with index values. If ``None``, all time values will be used
+
+        """
+
+        if not par._fcn or par.pop_aggregation:
+            return
+
+        if ti is None:
+            ti = np.arange(0, par.vals.size)
+
+        if par.skip_function:
+            if hasattr(ti, "__len__"):
+                ti = ti[np.where((par.t[ti] < par.skip_function[0]) | (par.t[ti] > par.skip_function[1]))]
+                if ti.size == 0:
+                    return
+            elif (par.t[ti] >= par.skip_function[0]) and (par.t[ti] <= par.skip_function[1]):
+                return
+
+        tangent = self._tangent["vals"]
+        dep_vals = dict.fromkeys(par.deps, 0.0)
+        for dep_name, deps in par.deps.items():
+            for dep in deps:
+                if isinstance(dep, Characteristic):
+                    dep_vals[dep_name] += Dual(*self._charac_tangent(dep, ti, tangent))
+                elif isinstance(dep, Parameter):
+                    dep_vals[dep_name] += Dual(dep.vals[ti], tangent[dep][ti])
+                elif isinstance(dep, Compartment):
+                    dep_vals[dep_name] += Dual(dep[ti], tangent[dep][ti])
+                else:
+                    raise ModelError("Unhandled case")  # Links can only be dependencies of parameters computed after integration
+
+        dep_vals["t"] = par.t[ti]
+        dep_vals["dt"] = par.dt
+        f = par._fcn(**dep_vals)
+        val, grad = (f.val, f.grad) if isinstance(f, Dual) else (f, 0.0)
+        d = par.scale_factor * grad + np.multiply.outer(val, self._tangent["dscale"][par])
+
+        if par.derivative:
+            self._tangent["dx"][par] = d
+            return
+
+        if par.limits is not None:
+            v = par.scale_factor * np.asarray(val)
+            d = np.where(np.expand_dims((v <= par.limits[0]) | (v >= par.limits[1]), -1), 0.0, d)
+        tangent[par][ti] = d
+
+    def _update_tangent_pars(self) -> None:
+        """
+        Update derivatives of dynamic parameters
+
+        This is the counterpart to :meth:`Model.update_pars`
+
+        """
+
+        ti = self._t_index
+        tangent = self._tangent["vals"]
+
+        do_program_overwrite = self.programs_active and self.program_instructions.start_year <= self.t[ti] <= self.program_instructions.stop_year
+        if do_program_overwrite:
+            dprop_coverage = self._coverage_tangent(ti)
+
+        for par_name in self._exec_order["dynamic_pars"]:
+            pars = self._vars_by_pop[par_name]
+
+            for par in pars:
+                if par._is_dynamic:
+                    self._update_tangent_par(par, ti)
+
+            if do_program_overwrite:
+                for par in pars:
+                    if par in self._tangent["overwrite"]:
+                        self._overwrite_tangent(par, ti, dprop_coverage)
+
+            if pars[0].pop_aggregation:
+                self._aggregation_tangent(pars, ti)
+
+            for par in pars:
+                if par.derivative and ti < len(self.t) - 1:
+                    # The value at the next timestep has already been constrained, so check whether the Euler step was clipped
+                    v = par[ti] + par._dx * self.dt
+                    if par.limits is not None and (v < par.limits[0] or v > par.limits[1]):
+                        tangent[par][ti + 1] = 0.0
+                    else:
+                        tangent[par][ti + 1] = tangent[par][ti] + self._tangent["dx"][par] * self.dt
+
+        self._tangent["overwrite"].clear()
+
+    def _aggregation_tangent(self, pars: list, ti: int) -> None:
+        """
+        Update derivatives of parameters that aggregate over populations
+
+        This is the counterpart to the population aggregation in :meth:`Model.update_pars`. The interaction
+        weights do not depend on the scale factors, so the aggregation is a weighted sum of the values being
+        aggregated, and of the weighting variable if there is one. For averages, the normalization is differentiated
+        as well. Derivatives are zero where the parameter value is at or beyond its limits.
+
+        :param pars: List of :class:`Parameter` instances with the same name, across populations
+        :param ti: Time index
+
+        """
+
+        tangent = self._tangent["vals"]
+
+        def var_tangent(var):
+            if isinstance(var, Characteristic):
+                return self._charac_tangent(var, ti, tangent)[1]
+            return tangent[var][ti]
+
+        agg = pars[0].pop_aggregation
+        x = np.array([var[ti] for var in self._vars_by_pop[agg[1]]])  # Value of variable being aggregated
+        dx = np.array([var_tangent(var) for var in self._vars_by_pop[agg[1]]])
+
+        if len(agg) < 3:
+            weights = np.ones((len(x), len(pars)))
+        else:
+            weights = self.interactions[agg[2]][:, :, ti].copy()
+
+        if agg[0] in {"SRC_POP_AVG", "SRC_POP_SUM"}:
+            weights = weights.T
+
+        # The weighted values are v*x, so their derivatives are v*dx + x*dv
+        if len(agg) == 4:
+            v = np.array([var[ti] for var in self._vars_by_pop[agg[3]]])  # Value of weighting variable
+            dv = np.array([var_tangent(var) for var in self._vars_by_pop[agg[3]]])
+            dweighted = v[:, None] * dx + x[:, None] * dv
+            weighted = weights * v
+        else:
+            dv = np.zeros(dx.shape)
+            dweighted = dx
+            weighted = weights
+
+        val = weighted @ x
+        d = weights @ dweighted
+
+        if agg[0] in {"SRC_POP_AVG", "TGT_POP_AVG"}:
+            norm = np.sum(weighted, axis=1)
+            norm[norm == 0] = 1
+            val /= norm
+            d = (d - val[:, None] * (weights @ dv)) / norm[:, None]
+
+        for par, v_par, d_par in zip(pars, val, d):
+            if par.skip_function is None or (self.t[ti] < par.skip_function[0]) or (self.t[ti] > par.skip_function[1]):
+                d_par = par.scale_factor * d_par + v_par * self._tangent["dscale"][par]
+                if par.limits is not None and (par.scale_factor * v_par <= par.limits[0] or par.scale_factor * v_par >= par.limits[1]):
+                    d_par = 0.0
+                tangent[par][ti] = d_par
+
+    def _coverage_tangent(self, ti: int) -> dict:
+        """
+        Return derivatives of program coverage
+
+        This is the counterpart to the coverage calculation in :meth:`Model.update_pars` and
+        :meth:`Program.get_prop_covered`. Coverage depends on spending via the program capacity,
+        and on the compartment sizes via the number of people eligible for the program.
+
+        :param ti: Time index
+        :return: Dict with ``{prog_name:derivatives}``
+
+        """
+
+        tangent = self._tangent["vals"]
+        dprop_coverage = {}
+
+        for prog_name, comp_list in self._program_cache["comps"].items():
+            if prog_name in self._program_cache["prop_coverage"]:
+                dprop_coverage[prog_name] = 0.0  # Coverage is fixed in a coverage scenario
+                continue
+
+            prog = self.progset.programs[prog_name]
+            eligible = 0.0
+            deligible = 0.0
+            for comp in comp_list:
+                eligible += comp[ti]
+                deligible += tangent[comp][ti]
+            capacity = self._program_cache["capacities"][prog_name][ti]
+            dcapacity = self._tangent["capacities"][prog_name][ti]
+
+            if prog.saturation.has_data:
+                if eligible == 0:
+                    dprop_coverage[prog_name] = 0.0  # Coverage is equal to the saturation value
+                    continue
+                saturation = prog.saturation.interpolate(self.t[ti], method="previous")[0]
+                x = capacity / eligible
+                e = np.exp(-2 * x / saturation)
+                prop_covered = 2 * saturation / (1 + e) - saturation
+                if prop_covered >= 1:
+                    dprop_coverage[prog_name] = 0.0
+                else:
+                    dprop_coverage[prog_name] = 4 * e / (1 + e) ** 2 * (dcapacity / eligible - capacity * deligible / eligible**2)
+            elif eligible > capacity:
+                dprop_coverage[prog_name] = dcapacity / eligible - capacity * deligible / eligible**2
+            else:
+                dprop_coverage[prog_name] = 0.0  # Full coverage
+
+        return dprop_coverage
+
+    def _overwrite_tangent(self, par, ti: int, dprop_coverage: dict) -> None:
+        """
+        Update derivatives of a parameter overwritten by programs
+
+        This is the counterpart to the program overwrite in :meth:`Model.update_pars`, and must
+        be called after the derivatives of the parameter function have been computed.
+
+        :param par: A :class:`Parameter` instance
+        :param ti: Time index
+        :param dprop_coverage: Dict with the derivatives of program coverage, from :meth:`Model._coverage_tangent`
+
+        """
+
+        tangent = self._tangent["vals"]
+        covout = self.progset.covouts[(par.name, par.pop.name)]
+        doutcome = 0.0
+        for prog_name, grad in covout.get_outcome_gradient(self._tangent["prop_coverage"]).items():
+            doutcome = doutcome + grad * dprop_coverage[prog_name]
+
+        if par.derivative:
+            self._tangent["dx"][par] = doutcome + np.zeros(tangent[par].shape[1])
+            d = tangent[par][ti]
+        else:
+            d = doutcome
+
+        val = self._tangent["overwrite"][par]
+        if par.units == FS.QUANTITY_TYPE_NUMBER:
+            source_popsize = 0.0
+            dsource_popsize = 0.0
+            for link in par.links:
+                source_popsize += link.source[ti]
+                dsource_popsize += tangent[link.source][ti]
+            d = (d * source_popsize + val * dsource_popsize) / self.dt
+        elif par.units == FS.QUANTITY_TYPE_RATE or par.units == FS.QUANTITY_TYPE_PROBABILITY:
+            d = d / self.dt
+
+        if not par.derivative and par.limits is not None and (par[ti] <= par.limits[0] or par[ti] >= par.limits[1]):
+            d = 0.0
+        tangent[par][ti] = d
+
+    def _update_tangent_links(self) -> None:
+        """
+        Update link derivatives
+
+        This is the counterpart to :meth:`Model.update_links`, and covers the unit conversions,
+        the outflow rescaling in :meth:`Compartment.resolve_outflows`, and junction balancing.
+
+        """
+
+        ti = self._t_index
+        tangent = self._tangent["vals"]
+        cache = self._tangent["cache"]
+
+        # Derivatives of the fraction of each source compartment to move
+        for par in self._exec_order["transition_pars"]:
+            transition = par.vals[ti]
+
+            if transition <= 0:
+                for link in par.links:
+                    cache[link] = 0.0
+                continue
+
+            dtransition = tangent[par][ti]
+
+            if par.units == FS.QUANTITY_TYPE_RATE or par.units == FS.QUANTITY_TYPE_PROBABILITY:
+                dfrac = dtransition * (self.dt / par.timescale)
+            elif par.units == FS.QUANTITY_TYPE_NUMBER:
+                damt = dtransition * (self.dt / par.timescale)
+                if isinstance(par.links[0].source, SourceCompartment):
+                    cache[par.links[0]] = damt
+                    continue
+                source_popsize = par.source_popsize(ti)
+                if source_popsize:
+                    dsource_popsize = sum(tangent[link.source][ti] for link in par.links)
+                    dfrac = damt / source_popsize - transition * (self.dt / par.timescale) * dsource_popsize / source_popsize**2
+                else:
+                    dfrac = 0.0
+            else:
+                dfrac = -dtransition * self.dt / (transition**2 * par.timescale)  # Duration units
+
+            for link in par.links:
+                cache[link] = dfrac
+
+        # Derivatives of link values
+        for pop in self.pops:
+            for comp in pop.comps:
+                if isinstance(comp, SourceCompartment):
+                    for link in comp.outlinks:
+                        tangent[link][ti] = cache[link]
+                elif isinstance(comp, SinkCompartment) or isinstance(comp, JunctionCompartment):
+                    continue
+                else:
+                    outflow = 0.0
+                    doutflow = 0.0
+                    for link in comp.outlinks:
+                        outflow += link._cache
+                        doutflow += cache[link]
+
+                    if outflow > 1:
+                        rescale = 1 / outflow
+                        drescale = -doutflow / outflow**2
+                    else:
+                        rescale = 1
+                        drescale = 0.0
+
+                    n = rescale * comp.vals[ti]
+                    dn = drescale * comp.vals[ti] + rescale * tangent[comp][ti]
+                    doutflow = 0.0
+                    for link in comp.outlinks:
+                        tangent[link][ti] = cache[link] * n + link._cache * dn
+                        doutflow += tangent[link][ti]
+                    self._tangent["outflow"][comp] = doutflow
+
+        # Derivatives of junction outflows
+        for j in self._exec_order["junctions"]:
+            net_inflow = 0.0
+            dnet_inflow = 0.0
+            for link in j.inlinks:
+                net_inflow += link.vals[ti]
+                dnet_inflow += tangent[link][ti]
+
+            fracs, dfracs, has_residual = self._junction_fractions(j, ti)
+            for frac, dfrac, link in zip(fracs, dfracs, j.outlinks):
+                if link.parameter is None:
+                    if has_residual:
+                        tangent[link][ti] = dnet_inflow - sum(dnet_inflow * f + net_inflow * df for f, df in zip(fracs, dfracs))
+                    else:
+                        tangent[link][ti] = 0.0
+                else:
+                    tangent[link][ti] = dnet_inflow * frac + net_inflow * dfrac
+
+    def _junction_fractions(self, j, ti: int) -> tuple:
+        """
+        Return junction outflow fractions and their derivatives
+
+        :param j: A :class:`JunctionCompartment` instance
+        :param ti: Time index
+        :return: Tuple containing a list of outflow fractions, a list of derivatives, and whether the residual link receives any people
+
+        """
+
+        tangent = self._tangent["vals"]
+        fracs = [link.parameter.vals[ti] if link.parameter is not None else 0.0 for link in j.outlinks]
+        dfracs = [tangent[link.parameter][ti] if link.parameter is not None else 0.0 for link in j.outlinks]
+        total = sum(fracs)
+        dtotal = sum(dfracs)
+
+        if isinstance(j, ResidualJunctionCompartment) and total < 1:
+            return fracs, dfracs, True
+
+        dfracs = [df / total - f * dtotal / total**2 for f, df in zip(fracs, dfracs)]
+        fracs = [f / total for f in fracs]
+        return fracs, dfracs, False
+
+    def _flush_tangent(self, j) -> None:
+        """
+        Flush junction derivatives
+
+        This is the counterpart to :meth:`JunctionCompartment.initial_flush` and must be called before
+        the junction is flushed.
+
+        :param j: A :class:`JunctionCompartment` instance
+
+        """
+
+        if j.vals[0] > 0:
+            tangent = self._tangent["vals"]
+            fracs, dfracs, has_residual = self._junction_fractions(j, 0)
+            for frac, dfrac, link in zip(fracs, dfracs, j.outlinks):
+                if link.parameter is None:
+                    if has_residual:
+                        tangent[link.dest][0] += tangent[j][0] - sum(tangent[j][0] * f + j.vals[0] * df for f, df in zip(fracs, dfracs))
+                else:
+                    tangent[link.dest][0] += tangent[j][0] * frac + j.vals[0] * dfrac
+            tangent[j][0] = 0.0
+
+    def _update_tangent_comps(self) -> None:
+        """
+        Update compartment derivatives
+
+        This is the counterpart to :meth:`Model.update_comps`
+
+        """
+
+        ti = self._t_index
+        tr = ti - 1
+        tangent = self._tangent["vals"]
+
+        for pop in self.pops:
+            for comp in pop.comps:
+                if isinstance(comp, SourceCompartment) or isinstance(comp, JunctionCompartment):
+                    continue
+
+                d = tangent[comp][tr].copy()
+                for link in comp.inlinks:
+                    d += tangent[link][tr]
+
+                if isinstance(comp, SinkCompartment):
+                    tangent[comp][ti] = d
+                elif comp.vals[ti] > 0:
+                    tangent[comp][ti] = d - self._tangent["outflow"][comp]
+
 
-def run_model(settings, framework, parset: ParameterSet, progset: ProgramSet = None, program_instructions: ProgramInstructions = None, name: str = None):
+def run_model(settings, framework, parset: ParameterSet, progset: ProgramSet = None, program_instructions: ProgramInstructions = None, name: str = None, sensitivity: list = None):
     """
     Build and process model
 
@@ -2641,10 +3471,11 @@ def run_model(settings, framework, parset: ParameterSet, progset: ProgramSet = N
     :param progset: Optionally provide a :class:`ProgramSet` instance to use programs
     :param program_instructions: Optional :class:`ProgramInstructions` instance. If ``progset`` is specified, then instructions must be provided
     :param name: Optionally specify the name to assign to the output result
+    :param sensitivity: Optionally specify a list of ``(par_name, pop_name)`` scale factors and program names to compute sensitivities for (see :meth:`Model.process`)
     :return: A :class:`Result` object containing the processed model
 
     """
 
     m = Model(settings, framework, parset, progset, program_instructions)
-    m.process()
+    m.process(sensitivity=sensitivity)
     return Result(model=m, parset=parset, name=name)
@@ -9,13 +9,15 @@ effectively serves as a mapping from one set of program instructions to another.
 
 import logging
 import pickle
+import time
 from collections import defaultdict
 
 import numpy as np
+import pandas as pd
 import scipy.optimize
 
 import sciris as sc
-from .cascade import get_cascade_vals
+from .cascade import sanitize_cascade, sanitize_pops
 from .model import Model, Link
 from .parameters import ParameterSet
 from .programs import ProgramSet, ProgramInstructions
@@ -23,8 +25,9 @@ from .results import Result
 from .system import logger, NotFoundError
 from .utils import NamedItem
 from .utils import TimeSeries
+from .utils import _worker_init
 
-__all__ = ["InvalidInitialConditions", "UnresolvableConstraint", "FailedConstraint", "Adjustable", "Adjustment", "SpendingAdjustment", "StartTimeAdjustment", "ExponentialSpendingAdjustment", "SpendingPackageAdjustment", "PairedLinearSpendingAdjustment", "Measurable", "MinimizeMeasurable", "MaximizeMeasurable", "AtMostMeasurable", "AtLeastMeasurable", "IncreaseByMeasurable", "DecreaseByMeasurable", "MaximizeCascadeStage", "MaximizeCascadeConversionRate", "Constraint", "TotalSpendConstraint", "Optimization", "optimize"]
+__all__ = ["InvalidInitialConditions", "UnresolvableConstraint", "FailedConstraint", "Adjustable", "Adjustment", "SpendingAdjustment", "StartTimeAdjustment", "ExponentialSpendingAdjustment", "SpendingPackageAdjustment", "PairedLinearSpendingAdjustment", "Measurable", "MinimizeMeasurable", "MaximizeMeasurable", "AtMostMeasurable", "AtLeastMeasurable", "IncreaseByMeasurable", "DecreaseByMeasurable", "MaximizeCascadeStage", "MaximizeCascadeConversionRate", "Constraint", "TotalSpendConstraint", "Optimization", "OptimizationTrace", "optimize"]
 
 
 class InvalidInitialConditions(Exception):
@@ -419,6 +422,7 @@ class Measurable:
         assert len(self.t) <= 2, "Measurable time must either be a year, or the `[low,high)` values defining a period of time"
         self.weight = weight
         self.pop_names = pop_names
+        self._plan = None  #: Cached evaluation plan set by :meth:`Measurable.compile`
 
     def eval(self, model, baseline):
         # This is the main interface with the optimization code - this function gets called
@@ -426,6 +430,92 @@ class Measurable:
         # Only overload this if you want to customize the transformation and weighting
         return self.weight * self.get_objective_val(model, baseline)
 
+    def compile(self, model=None) -> None:
+        """
+        Precompute evaluation plan
+
+        Looking up the quantities in a ``Model`` by name and working out which time points to use
+        only depends on the structure of the model, not on the values of the adjustables. This method
+        performs those lookups once, and caches the result so that subsequent calls to
+        :meth:`get_objective_val` only need to index the arrays in the model. The plan refers to variables
+        by position, so it remains valid for any copy of the model (e.g., the unpickled models used in
+        each optimization iteration) but it must be cleared if the ``Measurable`` is used with a different model.
+
+        :param model: A ``Model`` with the same structure as the ones that will be evaluated. If ``None``, any cached plan will be removed
+
+        """
+
+        if model is None:
+            self._plan = None
+            return
+
+        try:
+            self._plan = self._compile(model)
+        except NotFoundError:
+            # If the quantity cannot be resolved, don't cache a plan, so that the error gets
+            # raised during evaluation if (and only if) the plan is actually required
+            self._plan = None
+
+    def _compile(self, model) -> dict:
+        """
+        Return evaluation plan
+
+        The plan for the base ``Measurable`` contains the indices of the time points to include, and either the
+        program name or the variables to sum over. Derived classes that compute their objective value
+        differently can overload this method to precompute whatever they require.
+
+        :param model: A ``Model`` instance
+        :return: A dict with the evaluation plan
+
+        """
+
+        if len(self.t) == 1:
+            t_filter = model.t == self.t  # boolean vector for whether to use the time point or not. This could be relaxed using interpolation if needed, but safer not to unless essential
+        else:
+            t_filter = (model.t >= self.t[0]) & (model.t < self.t[1])  # Don't include upper bound, so [2018,2019] will include exactly one year
+        t_idx = np.flatnonzero(t_filter)
+
+        plan = {"t_idx": t_idx, "prog_name": None, "refs": None}
+
+        if model.progset is not None and self.measurable_name in model.progset.programs:
+            # Spending only changes if the instructions have an overwrite, so precompute the default spending
+            plan["prog_name"] = self.measurable_name
+            plan["t"] = model.t[t_idx]
+            plan["default_spend"] = np.sum(model.progset.programs[self.measurable_name].get_spend(plan["t"]))
+        else:  # If the measurable is a model output...
+            pop_names = sc.promotetolist(self.pop_names)
+            variables = []
+            matched = False  # Flag whether any variables were found
+            for pop in model.pops:
+                if not pop_names:
+                    # If no pops were provided, then iterate over all pops but skip those where the measureable is not defined
+                    # Use this approach rather than checking the pop type in the framework because user could be optimizating
+                    # flow rates or transitions that don't appear in the framework
+                    try:
+                        variables += pop.get_variable(self.measurable_name)
+                        matched = True
+                    except NotFoundError:
+                        continue
+                elif pop.name not in pop_names:
+                    continue
+                else:
+                    variables += pop.get_variable(self.measurable_name)  # If variable is missing and the pop was explicitly defined, raise the error
+                    matched = True
+
+            if not matched:
+                # Raise an error if the measureable was not found in any populations
+                raise NotFoundError('"%s" not found in any populations' % (self.measurable_name))
+
+            plan["refs"] = _get_variable_refs(model, variables)
+            plan["scale"] = np.array([1 / var.dt if isinstance(var, Link) else 1.0 for var in variables])  # Annualize link values - usually this won't make a difference, but it matters if the user mixes Links with something else in the objective
+
+        return plan
+
+    def _get_plan(self, model) -> dict:
+        # Return the compiled plan if there is one, otherwise compile one for this evaluation only
+        plan = getattr(self, "_plan", None)
+        return plan if plan is not None else self._compile(model)
+
     def get_baseline(self, model):
         """
         Return cached baseline values
@@ -461,44 +551,16 @@ class Measurable:
         # inherit this behaviour for free. So derived classes should overload this method
         #
         # The base class has the default behaviour that the 'measurable name' is a model variable
-        if len(self.t) == 1:
-            t_filter = model.t == self.t  # boolean vector for whether to use the time point or not. This could be relaxed using interpolation if needed, but safer not to unless essential
-        else:
-            t_filter = (model.t >= self.t[0]) & (model.t < self.t[1])  # Don't include upper bound, so [2018,2019] will include exactly one year
+        plan = self._get_plan(model)
 
-        if self.measurable_name in model.progset.programs:
-            alloc = model.progset.get_alloc(model.t, model.program_instructions)
-            val = np.sum(alloc[self.measurable_name][t_filter])
-        else:  # If the measurable is a model output...
-            val = 0.0
-            matched = False  # Flag whether any variables were found
-            for pop in model.pops:
-                if not self.pop_names:
-                    # If no pops were provided, then iterate over all pops but skip those where the measureable is not defined
-                    # Use this approach rather than checking the pop type in the framework because user could be optimizating
-                    # flow rates or transitions that don't appear in the framework
-                    try:
-                        vars = pop.get_variable(self.measurable_name)
-                        matched = True
-                    except NotFoundError:
-                        continue
-                elif pop not in self.pop_names:
-                    continue
-                else:
-                    vars = pop.get_variable(self.measurable_name)  # If variable is missing and the pop was explicitly defined, raise the error
-                    matched = True
-
-                for var in vars:
-                    if isinstance(var, Link):
-                        val += np.sum(var.vals[t_filter] / var.dt)  # Annualize link values - usually this won't make a difference, but it matters if the user mixes Links with something else in the objective
-                    else:
-                        val += np.sum(var.vals[t_filter])
-
-            if not matched:
-                # Raise an error if the measureable was not found in any populations
-                raise Exception('"%s" not found in any populations' % (self.measurable_name))
-
-        return val
+        if plan["prog_name"] is not None:
+            instructions = model.program_instructions
+            if instructions is not None and plan["prog_name"] in instructions.alloc:
+                return np.sum(instructions.alloc[plan["prog_name"]].interpolate(plan["t"], method="previous"))
+            else:
+                return plan["default_spend"]
+        else:
+            return np.dot(plan["scale"], _get_ref_vals(model, plan["refs"], plan["t_idx"]).sum(axis=1))
 
 
 class MinimizeMeasurable(Measurable):
@@ -690,13 +752,14 @@ class MaximizeCascadeStage(Measurable):
         if not isinstance(self.pop_names, list):
             self.pop_names = [self.pop_names]
 
+    def _compile(self, model) -> dict:
+        return _compile_cascade(model, self.measurable_name, self.pop_names, self.t)
+
     def get_objective_val(self, model, baseline):
-        result = Result(model=model)
         val = 0
-        for pop_name in self.pop_names:
-            cascade_vals = get_cascade_vals(result, self.measurable_name, pop_name, self.t)
+        for cascade_vals in _get_cascade_vals(model, self._get_plan(model)):
             for stage in self.cascade_stage:  # Loop over included stages
-                val += np.sum(cascade_vals[0][stage])  # Add the values from the stage, summed over time
+                val += np.sum(cascade_vals[stage])  # Add the values from the stage, summed over time
         return val
 
 
@@ -719,19 +782,155 @@ class MaximizeCascadeConversionRate(Measurable):
         if not isinstance(self.pop_names, list):
             self.pop_names = [self.pop_names]
 
+    def _compile(self, model) -> dict:
+        return _compile_cascade(model, self.measurable_name, self.pop_names, self.t)
+
     def get_objective_val(self, model, baseline):
         if self.t < model.t[0] or self.t > model.t[-1]:
             raise Exception("Measurable year for optimization (%d) is outside the simulation range (%d-%d)" % (self.t, model.t[0], model.t[-1]))
-        result = Result(model=model)
         val = 0
-        for pop_name in self.pop_names:
-            cascade_vals = get_cascade_vals(result, self.measurable_name, pop_name, self.t)[0]
+        for cascade_vals in _get_cascade_vals(model, self._get_plan(model)):
             cascade_array = np.hstack(cascade_vals.values())
             conversion = cascade_array[1:] / cascade_array[0:-1]
             val += np.sum(conversion)
         return val
 
 
+def _get_variable_refs(model, variables: list) -> list:
+    """
+    Return positional references to model variables
+
+    Variables are identified by the index of their population, the name of the list in the population
+    that contains them, and their index within that list. Unlike references to the objects themselves,
+    these remain valid in copies of the model (e.g., after unpickling).
+
+    :param model: A ``Model`` instance
+    :param variables: A list of variables contained in the model
+    :return: A list of ``(pop_index, attribute, var_index)`` tuples
+
+    """
+
+    lookup = dict()
+    for i, pop in enumerate(model.pops):
+        for attr in ["comps", "characs", "pars", "links"]:
+            for j, var in enumerate(getattr(pop, attr)):
+                lookup[id(var)] = (i, attr, j)
+    return [lookup[id(var)] for var in variables]
+
+
+def _get_ref_vals(model, refs: list, t_idx: np.array) -> np.array:
+    """
+    Return variable values from positional references
+
+    :param model: A ``Model`` instance
+    :param refs: A list of references returned by :func:`_get_variable_refs`
+    :param t_idx: Array of time indices to retrieve
+    :return: A 2D array with one row for each reference, and one column for each time index
+
+    """
+
+    vals = np.zeros((len(refs), len(t_idx)))
+    for k, (i, attr, j) in enumerate(refs):
+        vals[k] = getattr(model.pops[i], attr)[j].vals[t_idx]
+    return vals
+
+
+def _get_interpolation_weights(t: np.array, years: np.array) -> tuple:
+    """
+    Return linear interpolation weights
+
+    Linear interpolation onto fixed years can be written as a matrix product involving only the
+    time points adjacent to the years. This function returns the indices of those time points and the
+    weight matrix, such that ``weights @ vals[t_idx]`` is equivalent to ``np.interp(years, t, vals, left=np.nan, right=np.nan)``.
+
+    :param t: Array of model time values
+    :param years: Array of years to interpolate onto
+    :return: Tuple with ``(t_idx, weights)``
+
+    """
+
+    years = sc.promotetoarray(years)
+    t_idx = set()
+    for year in years:
+        if t[0] <= year <= t[-1]:
+            i = np.searchsorted(t, year)
+            t_idx.update([i] if t[i] == year else [i - 1, i])
+        else:
+            t_idx.add(0)  # Out of bounds years are assigned a NaN weight on the first time point
+    t_idx = np.array(sorted(t_idx), dtype=int)
+    col = {x: k for k, x in enumerate(t_idx)}
+
+    weights = np.zeros((len(years), len(t_idx)))
+    for row, year in enumerate(years):
+        if not (t[0] <= year <= t[-1]):
+            weights[row, col[0]] = np.nan  # Don't extrapolate, consistent with ``Series.interpolate()``
+            continue
+        i = np.searchsorted(t, year)
+        if t[i] == year:
+            weights[row, col[i]] = 1.0
+        else:
+            frac = (year - t[i - 1]) / (t[i] - t[i - 1])
+            weights[row, col[i - 1]] = 1 - frac
+            weights[row, col[i]] = frac
+
+    return t_idx, weights
+
+
+def _compile_cascade(model, cascade, pop_names: list, years) -> dict:
+    """
+    Return evaluation plan for cascade Measurables
+
+    This resolves the cascade stages and population aggregations into the underlying variables
+    so that the cascade values can be computed without constructing a ``Result`` and ``PlotData``
+    on every iteration. The values match those returned by :func:`get_cascade_vals`.
+
+    :param model: A ``Model`` instance
+    :param cascade: A cascade representation supported by :func:`sanitize_cascade`
+    :param pop_names: A list of population representations supported by :func:`sanitize_pops`
+    :param years: Years at which to evaluate the cascade
+    :return: A dict with the evaluation plan
+
+    """
+
+    result = Result(model=model)  # Only needed to resolve the population aggregations
+    _, cascade_dict, pop_type = sanitize_cascade(model.framework, cascade)
+
+    stages = []
+    for pop_name in pop_names:
+        pops = list(sanitize_pops(pop_name, result, pop_type).values())[0]
+        stage_refs = sc.odict()
+        for stage, includes in cascade_dict.items():
+            variables = []
+            for pop in pops:
+                for name in includes:
+                    variables += model.get_pop(pop).get_variable(name)
+            stage_refs[stage] = _get_variable_refs(model, variables)
+        stages.append(stage_refs)
+
+    t_idx, weights = _get_interpolation_weights(model.t, years)
+    return {"t_idx": t_idx, "weights": weights, "stages": stages}
+
+
+def _get_cascade_vals(model, plan: dict) -> list:
+    """
+    Return cascade values from a compiled plan
+
+    :param model: A ``Model`` instance
+    :param plan: A plan returned by :func:`_compile_cascade`
+    :return: A list with one dict for each population in the plan, in the same form as the
+             first output of :func:`get_cascade_vals` i.e. ``{stage_name:np.array}``
+
+    """
+
+    out = []
+    for stage_refs in plan["stages"]:
+        cascade_vals = sc.odict()
+        for stage, refs in stage_refs.items():
+            cascade_vals[stage] = plan["weights"] @ _get_ref_vals(model, refs, plan["t_idx"]).sum(axis=0)
+        out.append(cascade_vals)
+    return out
+
+
 class Constraint:
     """
     Store conditions to satisfy during optimization
@@ -1048,12 +1247,14 @@ class Optimization(NamedItem):
     :param adjustments: An `Adjustment` or list of `Adjustment` objects
     :param measurables: A `Measurable` or list of `Measurable` objects
     :param constraints: Optionally provide a `Constraint` or list of `Constraint` objects
-    :param maxtime: Optionally specify maximum ASD time
-    :param maxiters: Optionally specify maximum number of ASD iterations or hyperopt evaluations
-    :param method: One of ['asd','pso','hyperopt'] to use
+    :param maxtime: Optionally specify maximum ASD, L-BFGS-B or surrogate time
+    :param maxiters: Optionally specify maximum number of ASD/L-BFGS-B iterations or hyperopt/surrogate evaluations
+    :param method: One of ['asd','pso','hyperopt','lbfgsb-fd','surrogate'] to use
                         - asd (to use normal ASD)
                         - pso (to use particle swarm optimization from pyswarm)
                         - hyperopt (to use hyperopt's Bayesian optimization function)
+                        - lbfgsb-fd (to use scipy's L-BFGS-B with finite difference gradients evaluated in parallel)
+                        - surrogate (to use a radial basis function surrogate to select which points to simulate)
 
     """
 
@@ -1063,8 +1264,8 @@ class Optimization(NamedItem):
             name = "default"
         NamedItem.__init__(self, name)
 
-        self.maxiters = maxiters  #: Maximum number of ASD iterations or hyperopt evaluations
-        self.maxtime = maxtime  #: Maximum ASD time
+        self.maxiters = maxiters  #: Maximum number of ASD/L-BFGS-B iterations or hyperopt/surrogate evaluations
+        self.maxtime = maxtime  #: Maximum ASD/L-BFGS-B/surrogate time
         self.method = method  #: Optimization method name
 
         assert adjustments is not None, "Must specify some adjustments to carry out an optimization"
@@ -1212,6 +1413,20 @@ class Optimization(NamedItem):
                 constraint_penalty += constraint.constrain_instructions(instructions, hard_constraint)
         return constraint_penalty
 
+    def compile(self, model=None) -> None:
+        """
+        Precompute Measurable evaluation plans
+
+        This method calls :meth:`Measurable.compile` on each ``Measurable`` so that the lookups required to
+        compute the objective are performed once at the start of optimization, rather than in every iteration.
+
+        :param model: A ``Model`` with the same structure as the models being optimized. If ``None``, the compiled plans are removed
+
+        """
+
+        for measurable in self.measurables:
+            measurable.compile(model)
+
     def compute_objective(self, model, baselines: list) -> float:
         """
         Return total objective function
@@ -1237,7 +1452,143 @@ class Optimization(NamedItem):
         return objective
 
 
-def _objective_fcn(x, pickled_model, optimization, hard_constraints: list, baselines: list):
+class OptimizationTrace:
+    """
+    Record optimization progress
+
+    An ``OptimizationTrace`` can be passed to :func:`optimize` to record every evaluation of the objective function,
+    regardless of the optimization method being used. For each evaluation, it stores the proposed adjustable values,
+    the objective value, the constraint penalty, whether the proposal was rejected because the constraints could
+    not be satisfied (``FailedConstraint``), and how long each stage of the evaluation took. This can be used to
+    check convergence, choose a suitable ``maxtime``, or identify the most expensive part of the optimization.
+
+    Example usage:
+
+    >>> trace = at.OptimizationTrace()
+    >>> at.optimize(P, optimization, parset, progset, instructions, trace=trace)
+    >>> trace.to_df()
+    >>> trace.summary()
+
+    If the same trace is passed to multiple optimizations, the records will be appended.
+
+    """
+
+    STAGES = ["unpickle", "update_instructions", "constrain_instructions", "process", "compute_objective"]  #: Stages of each evaluation that are timed
+
+    def __init__(self):
+        self.records = []  #: A list of dicts, one for each evaluation
+        self.adjustable_names = []  #: Names of the adjustables, used to label the adjustable values in the DataFrame
+        self.start_time = None  #: Time when the first optimization using this trace started
+
+    def __repr__(self):
+        return "OptimizationTrace(%d evaluations)" % (len(self.records))
+
+    def start(self, optimization) -> None:
+        """
+        Prepare to record an optimization
+
+        This method is called by :func:`optimize` before the first evaluation.
+
+        :param optimization: The ``Optimization`` being run
+
+        """
+
+        names = []
+        for adjustment in optimization.adjustments:
+            for adjustable in adjustment.adjustables:
+                name = adjustable.name
+                k = 1
+                while name in names:
+                    k += 1
+                    name = "%s (%d)" % (adjustable.name, k)
+                names.append(name)
+        self.adjustable_names = names
+
+        if self.start_time is None:
+            self.start_time = time.time()
+
+    def add(self, x, objective: float, penalty: float, timings: dict, rejected: bool = False) -> None:
+        """
+        Record an evaluation
+
+        :param x: Array of proposed adjustable values
+        :param objective: The objective value
+        :param penalty: The constraint penalty (``np.nan`` if the constraints were not applied)
+        :param timings: Dict with the time in seconds taken by each stage in ``OptimizationTrace.STAGES``
+        :param rejected: True if the proposal was rejected because the constraints could not be satisfied
+
+        """
+
+        self.records.append({"time": time.time(), "x": np.array(x, dtype=float), "objective": objective, "penalty": penalty, "rejected": rejected, "timings": timings})
+
+    @property
+    def n_evaluations(self) -> int:
+        return len(self.records)
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Return evaluations as a DataFrame
+
+        The DataFrame has one row per evaluation, with columns for the elapsed time (since the optimization started),
+        the objective value, the best objective value so far, the constraint penalty, whether the proposal was rejected,
+        the time taken for each stage and in total, and the adjustable values.
+
+        :return: A DataFrame indexed by evaluation number
+
+        """
+
+        t0 = self.start_time if self.start_time is not None else 0.0
+        rows = []
+        for record in self.records:
+            row = {"elapsed": record["time"] - t0, "objective": record["objective"], "penalty": record["penalty"], "rejected": record["rejected"]}
+            for stage in self.STAGES:
+                row["t_%s" % (stage)] = record["timings"].get(stage, 0.0)
+            row["t_total"] = sum(record["timings"].values())
+            names = self.adjustable_names if len(self.adjustable_names) == len(record["x"]) else ["x%d" % (i) for i in range(len(record["x"]))]
+            row.update(zip(names, record["x"]))
+            rows.append(row)
+
+        df = pd.DataFrame(rows)
+        df.index.name = "evaluation"
+        if len(df):
+            df.insert(2, "best_objective", df["objective"].cummin())
+        return df
+
+    def to_csv(self, filename) -> str:
+        """
+        Write evaluations to a CSV file
+
+        :param filename: The name of the file to write
+        :return: The full path of the file that was written
+
+        """
+
+        fullpath = sc.makefilepath(filename=filename, ext="csv", sanitize=True)
+        self.to_df().to_csv(fullpath)
+        return fullpath
+
+    def summary(self) -> pd.Series:
+        """
+        Return summary statistics
+
+        :return: A Series with the number of evaluations and rejections, the best objective value,
+                 the evaluation rate, and the total time spent in each stage
+
+        """
+
+        df = self.to_df()
+        out = sc.odict()
+        out["evaluations"] = len(df)
+        out["rejected"] = int(df["rejected"].sum()) if len(df) else 0
+        out["best_objective"] = df["objective"].min() if len(df) else np.nan
+        out["elapsed"] = df["elapsed"].max() if len(df) else 0.0
+        out["evaluations_per_second"] = out["evaluations"] / out["elapsed"] if out["elapsed"] > 0 else np.nan
+        for stage in self.STAGES + ["total"]:
+            out["t_%s" % (stage)] = df["t_%s" % (stage)].sum() if len(df) else 0.0
+        return pd.Series(out)
+
+
+def _objective_fcn(x, pickled_model, optimization, hard_constraints: list, baselines: list, trace: OptimizationTrace = None):
     """
     Return objective value
 
@@ -1250,20 +1601,41 @@ def _objective_fcn(x, pickled_model, optimization, hard_constraints: list, basel
     :param optimization: An ``Optimization``
     :param hard_constraints: A list of hard constraints (should be the same length as ``optimization.constraints``)
     :param baselines: A list of measurable baselines (should be the same length as ``optimization.measurables``)
+    :param trace: Optionally provide an ``OptimizationTrace`` to record this evaluation
     :return:
 
 
     """
 
+    timings = dict()
+    penalty = np.nan
+    tic = time.perf_counter()
+
+    def toc(stage):
+        nonlocal tic
+        timings[stage] = time.perf_counter() - tic
+        tic = time.perf_counter()
+
     try:
         model = pickle.loads(pickled_model)
+        toc("unpickle")
         optimization.update_instructions(x, model.program_instructions)
-        optimization.constrain_instructions(model.program_instructions, hard_constraints)
+        toc("update_instructions")
+        penalty = optimization.constrain_instructions(model.program_instructions, hard_constraints)
+        toc("constrain_instructions")
         model.process()
+        toc("process")
     except FailedConstraint:
+        toc("constrain_instructions")
+        if trace is not None:
+            trace.add(x, np.inf, penalty, timings, rejected=True)
         return np.inf  # Return an objective of `np.inf` if the constraints could not be satisfied by ``x``
 
     obj_val = optimization.compute_objective(model, baselines)
+    toc("compute_objective")
+
+    if trace is not None:
+        trace.add(x, obj_val, penalty, timings)
 
     # TODO - use constraint penalty somehow
     # The idea is to keep the optimization in a parameter regime where large corrections to the instructions
@@ -1276,7 +1648,299 @@ def _objective_fcn(x, pickled_model, optimization, hard_constraints: list, basel
     return obj_val
 
 
-def optimize(project, optimization, parset: ParameterSet, progset: ProgramSet, instructions: ProgramInstructions, x0=None, xmin=None, xmax=None, hard_constraints=None, baselines=None):
+_objective_worker_args = None  # Arguments for ``_objective_fcn``, set on each worker by ``_objective_worker_init``
+
+
+def _objective_worker_init(args: dict) -> None:
+    """
+    Initialize a worker for parallel objective evaluation
+
+    The arguments to the objective function (in particular, the pickled model) are the same for
+    every evaluation, so they are sent to each worker once when the pool is created, rather than
+    with every task.
+
+    :param args: Dict of keyword arguments for ``_objective_fcn``
+
+    """
+
+    global _objective_worker_args
+    _worker_init()
+    _objective_worker_args = args
+    if args.get("trace") is not None:
+        _objective_worker_args = dict(args, trace=OptimizationTrace())  # Records are sent back to the parent process by ``_objective_worker``
+
+
+def _objective_worker(x) -> tuple:
+    # Evaluate the objective function on a parallel worker, returning the objective and trace record (if tracing)
+    val = _objective_fcn(x, **_objective_worker_args)
+    trace = _objective_worker_args.get("trace")
+    return val, trace.records.pop() if trace is not None else None
+
+
+class _TimeLimitReached(Exception):
+    # Raised to stop L-BFGS-B when the maximum time has been exceeded
+    pass
+
+
+def _get_scale(x0, xmin, xmax) -> np.array:
+    """
+    Return characteristic scale of adjustables
+
+    Adjustables typically have very different magnitudes (e.g., spending vs start years), so optimization
+    algorithms that are not scale-invariant work with variables rescaled by the width of their bounds, or by
+    their initial magnitude if they are unbounded.
+
+    :param x0: Array of initial values
+    :param xmin: Array of lower bounds
+    :param xmax: Array of upper bounds
+    :return: Array of scale factors
+
+    """
+
+    scale = np.where(np.isfinite(xmax - xmin), xmax - xmin, np.maximum(np.abs(x0), 1.0))
+    scale[scale == 0] = 1.0  # Adjustables with equal upper and lower bounds cannot move anyway
+    return scale
+
+
+def _optimize_lbfgsb_fd(x0, xmin, xmax, args: dict, maxiters: int = None, maxtime: float = None, num_workers: int = None, rel_step: float = 1e-3) -> np.array:
+    """
+    Run L-BFGS-B with finite difference gradients
+
+    The gradient is estimated using central differences, which requires evaluating the objective at
+    ``2n`` perturbed points for ``n`` adjustables. These evaluations are independent, so they are
+    performed concurrently together with the evaluation at the current point, such that each L-BFGS-B
+    iteration takes roughly as long as a single model run (given enough workers). Where a perturbation would
+    cross a bound, or the objective is not finite at a perturbed point (e.g., due to a ``FailedConstraint``),
+    a one-sided difference is used instead.
+
+    The optimization is performed on rescaled variables (see :func:`_get_scale`). The objective is also rescaled so that the initial gradient has unit norm, which gives L-BFGS-B a sensible
+    initial step size regardless of the units of the Measurables.
+
+    :param x0: Array of initial values
+    :param xmin: Array of lower bounds (can be ``-np.inf``)
+    :param xmax: Array of upper bounds (can be ``np.inf``)
+    :param args: Dict of keyword arguments for ``_objective_fcn``
+    :param maxiters: Maximum number of L-BFGS-B iterations
+    :param maxtime: Maximum time in seconds. If exceeded, the best point found so far is returned
+    :param num_workers: Number of processes to use. If ``1``, the objective will be evaluated serially
+    :param rel_step: Finite difference step size, as a fraction of the scale of each adjustable
+    :return: Array of optimal values
+
+    """
+
+    x0 = np.array(x0, dtype=float)
+    xmin = np.array(xmin, dtype=float)
+    xmax = np.array(xmax, dtype=float)
+    n = len(x0)
+
+    # Work with rescaled variables ``u`` where ``x = x0 + scale*u``
+    scale = _get_scale(x0, xmin, xmax)
+    umin = (xmin - x0) / scale
+    umax = (xmax - x0) / scale
+
+    if num_workers == 1:
+        pool = None
+    else:
+        from multiprocessing import pool
+
+        pool = pool.Pool(min(num_workers, 2 * n + 1) if num_workers else None, initializer=_objective_worker_init, initargs=(args,))
+
+    def evaluate(points):
+        if pool is None:
+            return [_objective_fcn(x, **args) for x in points]
+        else:
+            vals, records = zip(*pool.map(_objective_worker, points))
+            if args.get("trace") is not None:
+                args["trace"].records += records
+            return vals
+
+    def objective_and_gradient(u):
+        # Return the objective and gradient with respect to ``u``, with the objective evaluated at the
+        # current point and the forward and backward perturbation for each adjustable in a single batch
+        upper = np.minimum(u + rel_step, umax)
+        lower = np.maximum(u - rel_step, umin)
+        points = [x0 + scale * u]
+        for i in range(n):
+            for val in [upper[i], lower[i]]:
+                ui = u.copy()
+                ui[i] = val
+                points.append(x0 + scale * ui)
+
+        vals = np.array(evaluate(points))
+        f0, f_upper, f_lower = vals[0], vals[1::2], vals[2::2]
+
+        if not np.isfinite(f0):
+            return f0, np.zeros(n)
+
+        # Fall back to one-sided differences if either side is not available
+        use_upper = np.isfinite(f_upper) & (upper > u)
+        use_lower = np.isfinite(f_lower) & (lower < u)
+        f_upper = np.where(use_upper, f_upper, f0)
+        f_lower = np.where(use_lower, f_lower, f0)
+        du = np.where(use_upper, upper, u) - np.where(use_lower, lower, u)
+        grad = np.zeros(n)
+        grad[du > 0] = (f_upper - f_lower)[du > 0] / du[du > 0]
+        return f0, grad
+
+    best = {"x": x0, "f": np.inf}
+    start_time = time.time()
+
+    f0, grad0 = objective_and_gradient(np.zeros(n))
+    f_scale = 1 / np.linalg.norm(grad0) if np.linalg.norm(grad0) > 0 else 1.0
+
+    def fcn(u):
+        if maxtime is not None and time.time() - start_time > maxtime:
+            raise _TimeLimitReached
+
+        if not np.any(u):
+            f, grad = f0, grad0  # Reuse the initial evaluation
+        else:
+            f, grad = objective_and_gradient(u)
+
+        if f < best["f"]:
+            best["x"] = x0 + scale * u
+            best["f"] = f
+
+        logger.debug("L-BFGS-B evaluation: objective=%g, |gradient|=%g", f, np.linalg.norm(grad / scale))
+        return f * f_scale, grad * f_scale
+
+    options = {}
+    if maxiters is not None:
+        options["maxiter"] = maxiters
+
+    try:
+        opt_result = scipy.optimize.minimize(fcn, np.zeros(n), jac=True, method="L-BFGS-B", bounds=scipy.optimize.Bounds(umin, umax), options=options)
+        logger.debug("L-BFGS-B finished: %s", opt_result.message)
+    except _TimeLimitReached:
+        logger.debug("L-BFGS-B reached the maximum time of %gs", maxtime)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return best["x"]
+
+
+def _optimize_surrogate(x0, xmin, xmax, args: dict, maxiters: int = None, maxtime: float = None, initial_radius: float = 0.1, min_radius: float = 1e-3, seed=None) -> np.array:
+    """
+    Run surrogate-assisted optimization
+
+    Each simulation is expensive compared to the optimization algorithm, so this method fits a radial basis
+    function (RBF) surrogate to all of the points evaluated so far, and uses it to choose the next point to simulate.
+    In each iteration, a large number of candidate points are generated by perturbing the best point within a
+    trust region, the surrogate is evaluated for all of them, and only the candidate with the lowest predicted
+    objective is simulated. The trust region expands after consecutive improvements and contracts after consecutive
+    failures, and optimization terminates once it has contracted below ``min_radius``.
+
+    Proposals that fail a constraint (i.e., where the objective is ``np.inf`` due to ``FailedConstraint``) count
+    as failures but are not used to fit the surrogate.
+
+    :param x0: Array of initial values
+    :param xmin: Array of lower bounds (can be ``-np.inf``)
+    :param xmax: Array of upper bounds (can be ``np.inf``)
+    :param args: Dict of keyword arguments for ``_objective_fcn``
+    :param maxiters: Maximum number of simulations (default 100)
+    :param maxtime: Maximum time in seconds
+    :param initial_radius: Initial trust region size, as a fraction of the scale of each adjustable
+    :param min_radius: Terminate when the trust region is smaller than this fraction of the scale of each adjustable
+    :param seed: Optionally specify a random seed (or ``np.random.Generator``) used to generate the candidate points
+    :return: Array of optimal values
+
+    """
+
+    from scipy.interpolate import RBFInterpolator
+
+    x0 = np.array(x0, dtype=float)
+    xmin = np.array(xmin, dtype=float)
+    xmax = np.array(xmax, dtype=float)
+    n = len(x0)
+    maxiters = maxiters if maxiters is not None else 100
+    rng = np.random.default_rng(seed)
+
+    # Work with rescaled variables ``u`` where ``x = x0 + scale*u``
+    scale = _get_scale(x0, xmin, xmax)
+    umin = (xmin - x0) / scale
+    umax = (xmax - x0) / scale
+
+    points = []  # Rescaled points that have been simulated
+    vals = []  # Objective values for each point
+    start_time = time.time()
+
+    def simulate(u):
+        points.append(u)
+        vals.append(_objective_fcn(x0 + scale * u, **args))
+        return vals[-1]
+
+    # Initial design - the initial point, and a step in each direction for each adjustable
+    simulate(np.zeros(n))
+    for i in range(n):
+        for step in [initial_radius, -initial_radius]:
+            u = np.zeros(n)
+            u[i] = np.clip(step, umin[i], umax[i])
+            if u[i] != 0:
+                simulate(u)
+
+    radius = initial_radius
+    n_success = 0
+    n_failure = 0
+    max_failures = max(n, 5)
+    n_candidates = min(100 * n, 5000)
+
+    while len(vals) < maxiters and radius >= min_radius:
+        if maxtime is not None and time.time() - start_time > maxtime:
+            logger.debug("Surrogate optimization reached the maximum time of %gs", maxtime)
+            break
+
+        finite = np.isfinite(vals)
+        best_idx = np.argmin(np.where(finite, vals, np.inf))
+        u_best, f_best = points[best_idx], vals[best_idx]
+
+        # Generate candidates around the best point, perturbing each adjustable with probability p
+        # (so that with many adjustables, candidates still explore lower-dimensional moves)
+        p = min(1.0, 20 / n)
+        mask = rng.random((n_candidates, n)) < p
+        mask[~mask.any(axis=1), rng.integers(n, size=(~mask.any(axis=1)).sum())] = True
+        candidates = u_best + mask * rng.standard_normal((n_candidates, n)) * radius
+        candidates = np.clip(candidates, umin, umax)
+
+        # Discard candidates that are too close to previously simulated points
+        evaluated = np.array(points)
+        distance = np.min(np.linalg.norm(candidates[:, None, :] - evaluated[None, :, :], axis=2), axis=1)
+        candidates = candidates[distance > 0.1 * min_radius]
+        if not candidates.size:
+            radius /= 2
+            continue
+
+        try:
+            surrogate = RBFInterpolator(evaluated[finite], np.array(vals)[finite], kernel="thin_plate_spline", degree=1)
+            u = candidates[np.argmin(surrogate(candidates))]
+        except (np.linalg.LinAlgError, ValueError):
+            u = candidates[0]  # If the surrogate could not be fitted (e.g., too few feasible points) then use a random candidate
+
+        f = simulate(u)
+        logger.debug("Surrogate evaluation %d: objective=%g (best=%g), radius=%g", len(vals), f, f_best, radius)
+
+        if f < f_best - 1e-3 * abs(f_best):
+            n_success += 1
+            n_failure = 0
+        else:
+            n_success = 0
+            n_failure += 1
+
+        if n_success >= 3:
+            radius = min(2 * radius, 0.5)
+            n_success = 0
+        elif n_failure >= max_failures:
+            radius /= 2
+            n_failure = 0
+
+    finite = np.isfinite(vals)
+    best_idx = np.argmin(np.where(finite, vals, np.inf))
+    logger.debug("Surrogate optimization finished after %d simulations", len(vals))
+    return x0 + scale * points[best_idx]
+
+
+def optimize(project, optimization, parset: ParameterSet, progset: ProgramSet, instructions: ProgramInstructions, x0=None, xmin=None, xmax=None, hard_constraints=None, baselines=None, num_workers: int = None, trace: OptimizationTrace = None, seed=None):
     """
     Main user entry point for optimization
 
@@ -1297,96 +1961,116 @@ def optimize(project, optimization, parset: ParameterSet, progset: ProgramSet, i
     :param xmax: Not for manual use - override upper bounds
     :param hard_constraints: Not for manual use - override hard constraints
     :param baselines: Not for manual use - override Measurable baseline values (for relative Measurables)
+    :param num_workers: Number of processes to use for methods that evaluate the objective in parallel (``'lbfgsb-fd'``). Defaults to the number of CPUs
+    :param trace: Optionally provide an :class:`OptimizationTrace` to record every evaluation of the objective
+    :param seed: Optionally specify a random seed for methods that use a local random number generator (``'surrogate'``)
     :return: A :class:`ProgramInstructions` instance representing optimal instructions
 
     """
 
-    assert optimization.method in ["asd", "pso", "hyperopt"]
+    assert optimization.method in ["asd", "pso", "hyperopt", "lbfgsb-fd", "surrogate"]
 
     model = Model(project.settings, project.framework, parset, progset, instructions)
     pickled_model = pickle.dumps(model)  # Unpickling effectively makes a deep copy, so this _should_ be faster
 
-    initialization = optimization.get_initialization(progset, model.program_instructions)
-    x0 = x0 if x0 is not None else initialization[0]
-    xmin = xmin if xmin is not None else initialization[1]
-    xmax = xmax if xmax is not None else initialization[2]
-
-    if not hard_constraints:
-        hard_constraints = optimization.get_hard_constraints(x0, model.program_instructions)  # The optimization passed in here knows how to calculate the hard constraints based on the program instructions
-
-    if not baselines:
-        baselines = optimization.get_baselines(pickled_model)  # The optimization passed in here knows how to calculate the hard constraints based on the program instructions
-
-    # Prepare additional arguments for the objective function
-    args = {
-        "pickled_model": pickled_model,
-        "optimization": optimization,
-        "hard_constraints": hard_constraints,
-        "baselines": baselines,
-    }
-
-    # Check that the initial conditions are OK
-    # Note that this cannot be done by `optimization.get_baselines` because the baselines need to be computed against the
-    # initial instructions which might be different to the initial conditions (e.g. baseline spending vs the scaled-up
-    # initialization used when minimizing spending)
-    initial_objective = _objective_fcn(x0, **args)
-    if not np.isfinite(initial_objective):
-        raise InvalidInitialConditions("Optimization cannot begin because the objective function was %s for the specified initialization" % (initial_objective))
-
-    if optimization.method == "asd":
-        optim_args = {
-            # 'stepsize': proj.settings.autofit_params['stepsize'],
-            "maxiters": optimization.maxiters,
-            "maxtime": optimization.maxtime,
-            # 'sinc': proj.settings.autofit_params['sinc'],
-            # 'sdec': proj.settings.autofit_params['sdec'],
-            "fulloutput": False,
-            "xmin": xmin,
-            "xmax": xmax,
+    # Resolve the quantities used by the Measurables once, rather than in every iteration
+    optimization.compile(model)
+
+    try:
+        initialization = optimization.get_initialization(progset, model.program_instructions)
+        x0 = x0 if x0 is not None else initialization[0]
+        xmin = xmin if xmin is not None else initialization[1]
+        xmax = xmax if xmax is not None else initialization[2]
+
+        if not hard_constraints:
+            hard_constraints = optimization.get_hard_constraints(x0, model.program_instructions)  # The optimization passed in here knows how to calculate the hard constraints based on the program instructions
+
+        if not baselines:
+            baselines = optimization.get_baselines(pickled_model)  # The optimization passed in here knows how to calculate the hard constraints based on the program instructions
+
+        # Prepare additional arguments for the objective function
+        args = {
+            "pickled_model": pickled_model,
+            "optimization": optimization,
+            "hard_constraints": hard_constraints,
+            "baselines": baselines,
+            "trace": trace,
         }
 
-        # Set ASD verbosity based on Atomica logging level
-        log_level = logger.getEffectiveLevel()
-        if log_level < logging.WARNING:
-            optim_args["verbose"] = 2
-        else:
-            optim_args["verbose"] = 0
+        if trace is not None:
+            trace.start(optimization)
+
+        # Check that the initial conditions are OK
+        # Note that this cannot be done by `optimization.get_baselines` because the baselines need to be computed against the
+        # initial instructions which might be different to the initial conditions (e.g. baseline spending vs the scaled-up
+        # initialization used when minimizing spending)
+        initial_objective = _objective_fcn(x0, **args)
+        if not np.isfinite(initial_objective):
+            raise InvalidInitialConditions("Optimization cannot begin because the objective function was %s for the specified initialization" % (initial_objective))
+
+        if optimization.method == "asd":
+            optim_args = {
+                # 'stepsize': proj.settings.autofit_params['stepsize'],
+                "maxiters": optimization.maxiters,
+                "maxtime": optimization.maxtime,
+                # 'sinc': proj.settings.autofit_params['sinc'],
+                # 'sdec': proj.settings.autofit_params['sdec'],
+                "fulloutput": False,
+                "xmin": xmin,
+                "xmax": xmax,
+            }
+
+            # Set ASD verbosity based on Atomica logging level
+            log_level = logger.getEffectiveLevel()
+            if log_level < logging.WARNING:
+                optim_args["verbose"] = 2
+            else:
+                optim_args["verbose"] = 0
+
+            opt_result = sc.asd(_objective_fcn, x0, args, **optim_args)
+            x_opt = opt_result["x"]
 
-        opt_result = sc.asd(_objective_fcn, x0, args, **optim_args)
-        x_opt = opt_result["x"]
+        elif optimization.method == "pso":
 
-    elif optimization.method == "pso":
+            import pyswarm
 
-        import pyswarm
+            optim_args = {"maxiter": 3, "lb": xmin, "ub": xmax, "minstep": 1e-3, "debug": True}
+            if np.any(~np.isfinite(xmin)) or np.any(~np.isfinite(xmax)):
+                errormsg = "PSO optimization requires finite upper and lower bounds to specify the search domain (i.e. every Adjustable needs to have finite bounds)"
+                raise Exception(errormsg)
 
-        optim_args = {"maxiter": 3, "lb": xmin, "ub": xmax, "minstep": 1e-3, "debug": True}
-        if np.any(~np.isfinite(xmin)) or np.any(~np.isfinite(xmax)):
-            errormsg = "PSO optimization requires finite upper and lower bounds to specify the search domain (i.e. every Adjustable needs to have finite bounds)"
-            raise Exception(errormsg)
+            x_opt, _ = pyswarm.pso(_objective_fcn, kwargs=args, **optim_args)
+        elif optimization.method == "hyperopt":
 
-        x_opt, _ = pyswarm.pso(_objective_fcn, kwargs=args, **optim_args)
-    elif optimization.method == "hyperopt":
+            import hyperopt
+            import functools
 
-        import hyperopt
-        import functools
+            if np.any(~np.isfinite(xmin)) or np.any(~np.isfinite(xmax)):
+                errormsg = "hyperopt optimization requires finite upper and lower bounds to specify the search domain (i.e. every Adjustable needs to have finite bounds)"
+                raise Exception(errormsg)
 
-        if np.any(~np.isfinite(xmin)) or np.any(~np.isfinite(xmax)):
-            errormsg = "hyperopt optimization requires finite upper and lower bounds to specify the search domain (i.e. every Adjustable needs to have finite bounds)"
-            raise Exception(errormsg)
+            space = []
+            for i, (lower, upper) in enumerate(zip(xmin, xmax)):
+                space.append(hyperopt.hp.uniform(str(i), lower, upper))
+            fcn = functools.partial(_objective_fcn, **args)  # Partial out the extra arguments to the objective
 
-        space = []
-        for i, (lower, upper) in enumerate(zip(xmin, xmax)):
-            space.append(hyperopt.hp.uniform(str(i), lower, upper))
-        fcn = functools.partial(_objective_fcn, **args)  # Partial out the extra arguments to the objective
+            optim_args = {"max_evals": optimization.maxiters if optimization.maxiters is not None else 100, "algo": hyperopt.tpe.suggest}
 
-        optim_args = {"max_evals": optimization.maxiters if optimization.maxiters is not None else 100, "algo": hyperopt.tpe.suggest}
+            x_opt = hyperopt.fmin(fcn, space, **optim_args)
+            x_opt = np.array([x_opt[str(n)] for n in range(len(x_opt.keys()))])
 
-        x_opt = hyperopt.fmin(fcn, space, **optim_args)
-        x_opt = np.array([x_opt[str(n)] for n in range(len(x_opt.keys()))])
+        elif optimization.method == "lbfgsb-fd":
+            x_opt = _optimize_lbfgsb_fd(x0, xmin, xmax, args, maxiters=optimization.maxiters, maxtime=optimization.maxtime, num_workers=num_workers)
+
+        elif optimization.method == "surrogate":
+            x_opt = _optimize_surrogate(x0, xmin, xmax, args, maxiters=optimization.maxiters, maxtime=optimization.maxtime, seed=seed)
+
+        # Use the optimal parameter values to generate new instructions
+        optimization.update_instructions(x_opt, model.program_instructions)
+        optimization.constrain_instructions(model.program_instructions, hard_constraints)
+    finally:
+        optimization.compile(None)  # The plans are specific to this model, so don't retain them in the Optimization
 
-    # Use the optimal parameter values to generate new instructions
-    optimization.update_instructions(x_opt, model.program_instructions)
-    optimization.constrain_instructions(model.program_instructions, hard_constraints)
     return model.program_instructions  # Return the modified instructions
     # Note that we do not return the value of the objective here because *in general* the objective isn't required
     # or expected to have a meaningful interpretation because it may arbitrarily combine quantities (e.g. spending
@@ -87,7 +87,7 @@ class Parameter(NamedItem):
 
         return self.ts[pop_name].interpolate(tvec, method=self._interpolation_method)
 
-    def sample(self, constant: bool) -> None:
+    def sample(self, constant: bool, rng=None) -> None:
         """
         Perturb parameter based on uncertainties
 
@@ -96,11 +96,12 @@ class Parameter(NamedItem):
 
         :param constant: If True, time series will be perturbed by a single constant offset. If False,
                          an different perturbation will be applied to each time specific value independently.
+        :param rng: Optionally specify a ``np.random.Generator`` or :class:`DesignStream` to draw perturbations from (see :meth:`TimeSeries.sample`)
 
         """
 
         for k, ts in self.ts.items():
-            self.ts[k] = ts.sample(constant)
+            self.ts[k] = ts.sample(constant, rng=rng)
 
     def smooth(self, tvec, method="smoothinterp", pop_names=None, **kwargs):
         """
@@ -277,17 +278,18 @@ class ParameterSet(NamedItem):
         else:
             raise Exception(f'Parameter "{name}" not found')
 
-    def sample(self, constant=True):
+    def sample(self, constant=True, rng=None):
         """
         Return a sampled copy of the ParameterSet
 
         :param constant: If True, time series will be perturbed by a single constant offset. If False,
                          an different perturbation will be applied to each time specific value independently.
+        :param rng: Optionally specify a ``np.random.Generator`` or :class:`DesignStream` to draw perturbations from (see :meth:`TimeSeries.sample`)
         :return: A new :class:`ParameterSet` with perturbed values
 
         """
 
         new = sc.dcp(self)
         for par in new.all_pars():
-            par.sample(constant)
+            par.sample(constant, rng=rng)
         return new
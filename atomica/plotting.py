@@ -532,15 +532,21 @@ class PlotData:
             # to summation or trapezoidal integration
             max_step = 0.5 * min(np.diff(s.tvec))  # Subdivide for trapezoidal integration with at least 2 divisions per timestep. Could be a lot of memory for integrating daily timesteps over a full simulation, but unlikely to be prohibitive
             vals = np.full(lower.shape, fill_value=np.nan)
-            for i, (l, u) in enumerate(zip(lower, upper)):
-                n = np.ceil((u - l) / max_step) + 1  # Add 1 so that in most cases, we can use the actual timestep values
-                t2 = np.linspace(l, u, int(n))
-                if interpolation_method == "linear":
-                    v2 = np.interp(t2, s.tvec, s.vals, left=np.nan, right=np.nan)  # Return NaN outside bounds - it should never be valid to use extrapolated output values in time aggregation
-                    vals[i] = np.trapz(y=v2 / scale, x=t2)  # Note division by timescale here, which annualizes it
-                elif interpolation_method == "previous":
-                    v2 = scipy.interpolate.interp1d(s.tvec, s.vals, kind="previous", copy=False, assume_sorted=True, bounds_error=False, fill_value=(np.nan, np.nan))(t2)
-                    vals[i] = sum(v2[:-1] / scale * np.diff(t2))
+            n_points = np.ceil((upper - lower) / max_step) + 1  # Add 1 so that in most cases, we can use the actual timestep values
+            if interpolation_method == "linear" and np.all(n_points == n_points[0]):
+                # If every bin is subdivided into the same number of points (e.g., annual bins) then all bins can be integrated at once
+                t2 = np.linspace(lower, upper, int(n_points[0]), axis=-1)
+                v2 = np.interp(t2, s.tvec, s.vals, left=np.nan, right=np.nan)
+                vals = np.trapz(y=v2 / scale, x=t2, axis=-1)
+            else:
+                for i, (l, u) in enumerate(zip(lower, upper)):
+                    t2 = np.linspace(l, u, int(n_points[i]))
+                    if interpolation_method == "linear":
+                        v2 = np.interp(t2, s.tvec, s.vals, left=np.nan, right=np.nan)  # Return NaN outside bounds - it should never be valid to use extrapolated output values in time aggregation
+                        vals[i] = np.trapz(y=v2 / scale, x=t2)  # Note division by timescale here, which annualizes it
+                    elif interpolation_method == "previous":
+                        v2 = scipy.interpolate.interp1d(s.tvec, s.vals, kind="previous", copy=False, assume_sorted=True, bounds_error=False, fill_value=(np.nan, np.nan))(t2)
+                        vals[i] = sum(v2[:-1] / scale * np.diff(t2))
 
             s.tvec = (lower + upper) / 2.0
 
@@ -1111,7 +1111,7 @@ class ProgramSet(NamedItem):
 
         return {(covout.par, covout.pop): covout.get_outcome(prop_coverage) for covout in self.covouts.values()}
 
-    def sample(self, constant: bool = True):
+    def sample(self, constant: bool = True, rng=None):
         """
         Perturb programs based on uncertainties
 
@@ -1122,15 +1122,16 @@ class ProgramSet(NamedItem):
 
         :param constant: If True, time series will be perturbed by a single constant offset. If False,
                          an different perturbation will be applied to each time specific value independently.
+        :param rng: Optionally specify a ``np.random.Generator`` or :class:`DesignStream` to draw perturbations from (see :meth:`TimeSeries.sample`)
         :return: A new ``ProgramSet`` with values perturbed by sampling
 
         """
 
         new = sc.dcp(self)
         for prog in new.programs.values():
-            prog.sample(constant)
+            prog.sample(constant, rng=rng)
         for covout in new.covouts.values():
-            covout.sample()
+            covout.sample(rng=rng)
         return new
 
 
@@ -1191,7 +1192,7 @@ class Program(NamedItem):
         """
         return "/year" not in self.unit_cost.units
 
-    def sample(self, constant: bool) -> None:
+    def sample(self, constant: bool, rng=None) -> None:
         """
         Perturb program values based on uncertainties
 
@@ -1201,13 +1202,14 @@ class Program(NamedItem):
 
         :param constant: If True, time series will be perturbed by a single constant offset. If False,
                          an different perturbation will be applied to each time specific value independently.
+        :param rng: Optionally specify a ``np.random.Generator`` or :class:`DesignStream` to draw perturbations from (see :meth:`TimeSeries.sample`)
         """
 
-        self.spend_data = self.spend_data.sample(constant)
-        self.unit_cost = self.unit_cost.sample(constant)
-        self.capacity_constraint = self.capacity_constraint.sample(constant)
-        self.saturation = self.saturation.sample(constant)
-        self.coverage = self.coverage.sample(constant)
+        self.spend_data = self.spend_data.sample(constant, rng=rng)
+        self.unit_cost = self.unit_cost.sample(constant, rng=rng)
+        self.capacity_constraint = self.capacity_constraint.sample(constant, rng=rng)
+        self.saturation = self.saturation.sample(constant, rng=rng)
+        self.coverage = self.coverage.sample(constant, rng=rng)
 
     def __repr__(self):
         output = sc.prepr(self)
@@ -1367,7 +1369,7 @@ class Covout:
 
         return len(self.progs)
 
-    def sample(self) -> None:
+    def sample(self, rng=None) -> None:
         """
         Perturb the values entered in the databook
 
@@ -1375,17 +1377,21 @@ class Covout:
         that do not vary over time - therefore, :meth:`Covout.sample()` does not have a ``constant``
         argument.
 
+        :param rng: Optionally specify a ``np.random.Generator`` or :class:`DesignStream` to draw perturbations from (see :meth:`TimeSeries.sample`)
+
         """
 
         if self.sigma is None:
             return
 
+        randn = (lambda: np.random.randn(1)[0]) if rng is None else rng.standard_normal
+
         for k, v in self.progs.items():
-            self.progs[k] = v + self.sigma * np.random.randn(1)[0]
+            self.progs[k] = v + self.sigma * randn()
         # Perturb the interactions
         if self._interactions:
             for k, v in self.interactions.items():
-                self.interactions[k] = v + self.sigma * np.random.randn(1)[0]
+                self.interactions[k] = v + self.sigma * randn()
             tokens = ["%s=%.4f" % ("+".join(k), v) for k, v in self.interactions.items()]
             self.imp_interaction = ",".join(tokens)
 
@@ -1517,6 +1523,91 @@ class Covout:
 
         return outcome
 
+    def get_outcome_gradient(self, prop_covered) -> dict:
+        """
+        Return derivatives of the outcome with respect to program coverage
+
+        This is the derivative of :meth:`Covout.get_outcome` with respect to the coverage of each program, and is
+        used to propagate sensitivities through the programs system (see :meth:`Model.process`). The outcome is
+        piecewise smooth in the coverage, so at the boundaries between pieces (e.g., programs with exactly equal
+        coverage with the nested interaction) the derivative is one-sided.
+
+        :param prop_covered: A dict with ``{prog_name:coverage}`` as for :meth:`Covout.get_outcome`
+        :return: A dict with ``{prog_name:derivative}`` for each program in ``self.progs``
+
+        """
+
+        progs = self._cached_progs.keys()
+        if self.n_progs == 0:
+            return {}
+        elif self.n_progs == 1:
+            return {progs[0]: self._deltas[0]}
+
+        cov = np.array([prop_covered[prog][0] for prog in progs])
+        n = len(cov)
+        outcomes = self._combination_outcomes.ravel()
+        grad = np.zeros(n)
+
+        if self.cov_interaction == "additive":
+            if np.sum(cov) > 1:
+                # Forward-mode differentiation of the calculation in `get_outcome()`. Each quantity is accompanied by
+                # its derivatives with respect to the coverage of each program in an extra trailing dimension
+                previous = np.cumsum(cov) - cov
+                additive = np.maximum(cov - np.maximum(cov - (1 - previous), 0), 0)
+                dadditive = np.zeros((n, n))
+                for j in range(n):
+                    if cov[j] + previous[j] <= 1:
+                        dadditive[j, j] = 1.0
+                    elif previous[j] < 1:
+                        dadditive[j, :j] = -1.0
+                remainder = 1 - additive
+                random = cov - additive
+                dremainder = -dadditive
+                drandom = np.eye(n) - dadditive
+                random_portion = np.divide(random, remainder, out=np.zeros_like(random), where=remainder != 0)
+                drandom_portion = np.zeros((n, n))
+                nonzero = remainder != 0
+                drandom_portion[nonzero] = (drandom[nonzero] - random_portion[nonzero, None] * dremainder[nonzero]) / remainder[nonzero, None]
+
+                sign = 2 * self.combinations - 1
+                net_random = self.combinations * random_portion + (self.combinations ^ 1) * (1 - random_portion)
+                dnet_random = sign[:, :, None] * drandom_portion[None, :, :]
+                additive_portion_coverage = self.combinations * additive
+                dadditive_portion_coverage = self.combinations[:, :, None] * dadditive[None, :, :]
+
+                dcombination_coverage = np.zeros((self.combinations.shape[0], n))
+                for i in range(n):
+                    contribution = np.ones((self.combinations.shape[0],))
+                    dcontribution = np.zeros((self.combinations.shape[0], n))
+                    for j in range(n):
+                        factor, dfactor = (additive_portion_coverage[:, j], dadditive_portion_coverage[:, j]) if i == j else (net_random[:, j], dnet_random[:, j])
+                        dcontribution = dcontribution * factor[:, None] + contribution[:, None] * dfactor
+                        contribution = contribution * factor
+                    dcombination_coverage += dcontribution
+                grad = outcomes @ dcombination_coverage
+            else:
+                grad = self._deltas.copy()
+
+        elif self.cov_interaction == "nested":
+            idx = np.argsort(cov)
+            prog_mask = np.full(cov.shape, fill_value=True)
+            for i in range(0, len(cov)):
+                combination_index = int("0b" + "".join(["1" if x else "0" for x in prog_mask]), 2)
+                grad[idx[i]] += outcomes[combination_index]
+                if i > 0:
+                    grad[idx[i - 1]] -= outcomes[combination_index]
+                prog_mask[idx[i]] = False
+
+        elif self.cov_interaction == "random":
+            factors = self.combinations * cov + (self.combinations ^ 1) * (1 - cov)
+            sign = 2 * self.combinations - 1
+            for i in range(n):
+                grad[i] = np.sum(outcomes * sign[:, i] * np.prod(np.delete(factors, i, axis=1), axis=1))
+        else:
+            raise Exception('Unknown reachability type "%s"', self.cov_interaction)
+
+        return dict(zip(progs, grad))
+
     def compute_impact_interaction(self, progs: np.array) -> float:
         """
         Return the output for a given combination of programs
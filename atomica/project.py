@@ -22,23 +22,33 @@ from .version import version, gitinfo
 from .calibration import calibrate
 from .data import ProjectData
 from .framework import ProjectFramework
-from .model import run_model
+from .model import run_model, model_settings
 from .parameters import ParameterSet
 
 from .programs import ProgramSet
 from .scenarios import Scenario, ParameterScenario, CombinedScenario, BudgetScenario, CoverageScenario
 from .optimization import Optimization, optimize, InvalidInitialConditions
 from .system import logger
-from .utils import NDict, evaluate_plot_string, NamedItem, parallel_progress, Quiet
+from .utils import NDict, evaluate_plot_string, NamedItem, parallel_progress, Quiet, sample_design, DesignStream, SimulationCache, _worker_init
 from .plotting import PlotData, plot_series
 from .results import Result
 from .migration import migrate
 import sciris as sc
 import numpy as np
+import pandas as pd
 import tqdm
 import logging
+from collections import OrderedDict
 from datetime import timezone
+import copyreg
 import functools
+import gzip
+import hashlib
+import io
+import json
+import os
+import pickle
+import zipfile
 
 __all__ = ["ProjectSettings", "Project"]
 
@@ -415,22 +425,62 @@ class Project(NamedItem):
         if key is None:
             key = -1
         if not sc.isstring(key) and not sc.isnumber(key) and not isinstance(key, tuple):
-            if not isinstance(key, [Result, list, sc.odict]):
+            if not isinstance(key, (Result, list, sc.odict)):
                 print('Warning: result "%s" is of unexpected type: "%s"' % (key, type(key)))
             return key  # It's not something that looks like a key
         else:
             try:
-                return self.scens[key]
+                return self.results[key]  # If the project was loaded from a container, the result is loaded here
             except Exception:
-                sc.printv('Warning, scenario "%s" not found!' % key, 1, verbose)
+                sc.printv('Warning, result "%s" not found!' % key, 1, verbose)
                 return None
 
-        if key is None:
-            key = -1
-        try:
-            return self.results[key]
-        except Exception:
-            return sc.printv('Warning, results "%s" not found!' % key, 1, verbose)  # Returns None
+    def memory_usage(self, pickled: bool = False) -> pd.DataFrame:
+        """
+        Return a breakdown of the memory used by the project
+
+        The first row, ``'Project'``, contains the objects stored in the project itself. The framework and program sets
+        are reported separately, and everything else (data, parameter sets, scenarios, optimizations, spreadsheets etc.)
+        is reported as ``'other'``. This is followed by one row for each stored result, with the bytes for each type of item
+        in :meth:`Result.memory_usage` summed over populations. Objects that are shared between the project and
+        results (such as the framework and program set copies stored in results) are only counted in the first row
+        they appear in. If the project was loaded from a container, only results that have been loaded are included.
+
+        :param pickled: If ``True``, also estimate the size of each row when the project is pickled (e.g., when saving the project)
+        :return: A DataFrame with the number of bytes for each item type, and the total bytes for each row
+
+        """
+
+        from .utils import _object_size, _pickled_size
+
+        columns = ["compartments", "keyrings", "characteristics", "parameters", "links", "interactions", "sensitivities", "framework", "progset", "other"]
+        seen = {id(self)}
+        index = ["Project"]
+        rows = [dict.fromkeys(columns, 0)]
+
+        project_items = {
+            "framework": [self.framework],
+            "progset": [self.progsets],
+            "other": [v for k, v in self.__dict__.items() if k not in {"framework", "progsets", "results"}],
+        }
+        for item, objs in project_items.items():
+            rows[0][item] = sum(_object_size(x, seen) for x in objs)
+        if pickled:
+            rows[0]["pickled"] = _pickled_size([objs for objs in project_items.values()])
+
+        for value in OrderedDict.values(self.results):  # Iterate without loading results from a container
+            for result in value if isinstance(value, list) else [value]:
+                if not isinstance(result, Result):
+                    continue  # Placeholder for a result that has not been loaded
+                usage = result._memory_usage(pickled=pickled, seen=seen).groupby(level="type", sort=False).sum()
+                index.append(result.name)
+                rows.append(usage["bytes"].to_dict())
+                if pickled:
+                    rows[-1]["pickled"] = usage["pickled"].sum()
+
+        df = pd.DataFrame(rows, index=index, columns=columns + (["pickled"] if pickled else [])).fillna(0).astype(np.int64)
+        df.insert(len(columns), "total", df[columns].sum(axis=1))
+        return df
 
     #######################################################################################################
     # Methods to perform major tasks
@@ -466,7 +516,7 @@ class Project(NamedItem):
         """ Modify the project settings, e.g. the simulation time vector. """
         self.settings.update_time_vector(start=sim_start, end=sim_end, dt=sim_dt)
 
-    def run_sim(self, parset=None, progset=None, progset_instructions=None, store_results=False, result_name: str = None):
+    def run_sim(self, parset=None, progset=None, progset_instructions=None, store_results=False, result_name: str = None, cache=None):
         """
         Run a single simulation
 
@@ -479,6 +529,8 @@ class Project(NamedItem):
         :param progset_instructions: A :class:`ProgramInstructions` instance. Programs will only be used if a instructions are provided
         :param store_results: If True, then the result will automatically be stored in ``self.results``
         :param result_name: Optionally assign a specific name to the result (otherwise, a unique default name will automatically be selected)
+        :param cache: Optionally specify a :class:`SimulationCache` (or the path to a cache directory). If the same simulation has been run
+                      previously, the stored result will be returned instead of running the model
         :return: A :class:`Result` instance
 
         """
@@ -499,15 +551,33 @@ class Project(NamedItem):
                 result_name = base_name + "_" + str(k)
                 k += 1
 
-        tm = sc.tic()
-        result = run_model(settings=self.settings, framework=self.framework, parset=parset, progset=progset, program_instructions=progset_instructions, name=result_name)
-        logger.info('Elapsed time for running "%s": %ss', self.name, sc.sigfig(sc.toc(tm, output=True), 3))
+        if cache is not None:
+            if not isinstance(cache, SimulationCache):
+                cache = SimulationCache(cache)
+            key = cache.key(self.framework, parset, progset if progset_instructions is not None else None, progset_instructions, self.settings, model_settings)
+            result = cache.get(key)
+        else:
+            result = None
+
+        if result is not None:
+            logger.info('Loaded cached result for "%s"', self.name)
+            # The cache key does not depend on names, so update the metadata to match this simulation
+            result.name = result_name
+            result.parset_name = parset.name
+            result.uid = sc.uuid()
+        else:
+            tm = sc.tic()
+            result = run_model(settings=self.settings, framework=self.framework, parset=parset, progset=progset, program_instructions=progset_instructions, name=result_name)
+            logger.info('Elapsed time for running "%s": %ss', self.name, sc.sigfig(sc.toc(tm, output=True), 3))
+            if cache is not None:
+                cache.put(key, result)
+
         if store_results:
             self.results.append(result)
 
         return result
 
-    def run_sampled_sims(self, parset, progset=None, progset_instructions=None, result_names=None, n_samples: int = 1, parallel=False, max_attempts=None, num_workers=None) -> list:
+    def run_sampled_sims(self, parset, progset=None, progset_instructions=None, result_names=None, n_samples: int = 1, parallel=False, max_attempts=None, num_workers=None, sampling=None, seed=None, checkpoint: str = None, resume: bool = False) -> list:
         """
         Run sampled simulations
 
@@ -531,44 +601,50 @@ class Project(NamedItem):
         :param parallel: If True, run simulations in parallel (on Windows, must have ``if __name__ == '__main__'`` gating the calling code)
         :param max_attempts: Number of retry attempts for bad initializations
         :param num_workers: If ``parallel`` is True, this determines the number of parallel workers to use (default is usually number of CPUs)
+        :param sampling: Optionally specify a sampling design. This can be one of ``'random'``, ``'lhs'``, ``'sobol'``, or ``'halton'``
+                         (see :func:`sample_design`), or a design matrix with one row per sample. Sample ``i`` is then drawn from row ``i`` of
+                         the design. If ``None``, independent random samples are drawn
+        :param seed: Optionally specify a seed for the sampling design. Samples that fail initialization are redrawn using a random number
+                     generator spawned for each sample from this seed, so results do not depend on which worker runs each sample. If ``None``,
+                     the seed is drawn from the global NumPy random number generator
+        :param checkpoint: Optionally specify a file name prefix for checkpoint files. The sampling plan is saved to ``<checkpoint>_plan.chk``
+                           and the results for sample ``i`` are saved to ``<checkpoint>_sample<i>.chk`` as soon as it is complete
+        :param resume: If ``True``, load the sampling plan and any completed samples from the checkpoint, and only run the missing samples
         :return: A list of Results that can be passed to `Ensemble.update()`. If multiple instructions are provided, the return value of this
                  function will be a list of lists, where the inner list iterates over different instructions for the same parset/progset samples.
                  It is expected in that case that the Ensemble's mapping function would take in a list of results
 
         """
 
-        assert (not progset) == (not progset_instructions), "If running with programs, both a progset and instructions must be provided"
-
-        parset = self.parset(parset)
-        progset = self.progset(progset) if progset is not None else None
-        progset_instructions = sc.promotetolist(progset_instructions, keepnone=True)
+        parset, progset, progset_instructions, result_names = _get_sampling_inputs(self, parset, progset, progset_instructions, result_names)
 
-        if not result_names:
-            if len(progset_instructions) > 1:
-                result_names = ["instructions_%d" % (i) for i in range(len(progset_instructions))]
-            else:
-                result_names = ["default"]
-        else:
-            result_names = sc.promotetolist(result_names)
-            assert (len(result_names) == 1 and not progset) or (len(progset_instructions) == len(result_names)), "Number of result names must match number of instructions"
+        samples = _get_sampling_plan(parset, progset, n_samples, sampling, seed, checkpoint, resume)  # List of (design,seed,checkpoint_file) tuples for each sample
+        results = _load_completed_samples(samples) if resume else {}
+        pending = [i for i in range(n_samples) if i not in results]
 
-        show_progress = n_samples > 1 and logger.getEffectiveLevel() <= logging.INFO
+        show_progress = len(pending) > 1 and logger.getEffectiveLevel() <= logging.INFO
 
-        if parallel:
-            fcn = functools.partial(_run_sampled_sim, proj=self, parset=parset, progset=progset, progset_instructions=progset_instructions, result_names=result_names, max_attempts=max_attempts)
-            results = parallel_progress(fcn, n_samples, show_progress=show_progress, num_workers=num_workers)
+        args = {"proj": self, "parset": parset, "progset": progset, "progset_instructions": progset_instructions, "result_names": result_names, "max_attempts": max_attempts}
+        fcn = functools.partial(_run_planned_sample, **args)
+        if parallel and pending:
+            # The project is sent to each worker once, so the tasks only contain the sample design and seed
+            results.update(zip(pending, parallel_progress(_sampling_worker, [samples[i] for i in pending], show_progress=show_progress, num_workers=num_workers, initializer=_sampling_worker_init, initargs=(args,))))
         elif show_progress:
             # Print the progress bar if the logging level was INFO or lower
             # This means that the user can still set the logging level higher e.g. WARNING to suppress output from Atomica in general
             # (including any progress bars)
             with Quiet():
-                results = [_run_sampled_sim(self, parset, progset, progset_instructions, result_names, max_attempts=max_attempts) for _ in tqdm.trange(n_samples)]
+                for i in tqdm.tqdm(pending):
+                    results[i] = fcn(samples[i])
         else:
-            results = [_run_sampled_sim(self, parset, progset, progset_instructions, result_names, max_attempts=max_attempts) for _ in range(n_samples)]
+            for i in pending:
+                results[i] = fcn(samples[i])
+
+        results = [results[i] for i in range(n_samples)]
 
         return results
 
-    def calibrate(self, parset=None, adjustables=None, measurables=None, max_time=60, save_to_project=False, new_name=None, default_min_scale=0.0, default_max_scale=2.0, default_weight=1.0, default_metric="fractional") -> ParameterSet:
+    def calibrate(self, parset=None, adjustables=None, measurables=None, max_time=60, save_to_project=False, new_name=None, default_min_scale=0.0, default_max_scale=2.0, default_weight=1.0, default_metric="fractional", **kwargs) -> ParameterSet:
         """
         Method to perform automatic calibration.
 
@@ -594,6 +670,8 @@ class Project(NamedItem):
         To calibrate a project-attached parameter set in place, provide its key as the new name argument to this method.
         Current fitting metrics are: "fractional", "meansquare", "wape"
         Note that scaling limits are absolute, not relative.
+
+        Any additional keyword arguments (e.g., ``n_starts``, ``decompose``, ``parallel``) are passed to :func:`calibrate`.
         """
 
         if parset is None:
@@ -616,7 +694,7 @@ class Project(NamedItem):
         for index, measurable in enumerate(measurables):
             if sc.isstring(measurable):  # Assume that a parameter name was passed in if not a tuple.
                 measurables[index] = (measurable, None, default_weight, default_metric)
-        new_parset = calibrate(project=self, parset=parset, pars_to_adjust=adjustables, output_quantities=measurables, max_time=max_time)
+        new_parset = calibrate(project=self, parset=parset, pars_to_adjust=adjustables, output_quantities=measurables, max_time=max_time, **kwargs)
         new_parset.name = new_name  # The new parset is a calibrated copy of the old, so change id.
         if save_to_project:
             self.parsets.append(new_parset)
@@ -639,6 +717,126 @@ class Project(NamedItem):
                 results.append(result)
         return results
 
+    def run_budget_sweep(self, optimization, budget_factors, instructions, parset=None, progset=None, parallel=False, num_workers=None, store_results=False) -> tuple:
+        """
+        Optimize allocations over a range of total budgets
+
+        This method produces an allocative efficiency curve by optimizing the allocation at several budget levels. Each
+        level is obtained by scaling the allocation in the instructions using :meth:`ProgramInstructions.scale_alloc`, so
+        spending for programs that should be scaled must be present in the instructions (e.g., by instantiating them with
+        ``ProgramInstructions(alloc=progset, ...)``) and a :class:`TotalSpendConstraint` would normally compute its total
+        spend from the instructions rather than having it specified explicitly.
+
+        To reduce the overall run time
+
+        - The Measurable baseline values are computed once, using the unscaled instructions, and shared by all levels
+        - Levels are run in order of proximity to levels that have already been optimized, and each level is initialized
+          from the optimal allocation of its nearest completed neighbour (scaled to the new budget). If that initialization
+          is not valid, the level is initialized from the scaled instructions instead
+        - If ``parallel`` is True, levels are optimized concurrently, with the first round of levels (one per worker) spread
+          evenly over the range of budget factors
+
+        :param optimization: An :class:`Optimization` instance
+        :param budget_factors: A list of multiplicative factors for the total budget
+        :param instructions: The :class:`ProgramInstructions` with the baseline allocation
+        :param parset: A :class:`ParameterSet` instance or name. If ``None``, the most recently added parset will be used
+        :param progset: A :class:`ProgramSet` instance or name. If ``None``, the most recently added progset will be used
+        :param parallel: If True, optimize budget levels in parallel (on Windows, must have ``if __name__ == '__main__'`` gating the calling code)
+        :param num_workers: If ``parallel`` is True, this determines the number of parallel workers to use (default is usually number of CPUs)
+        :param store_results: If True, the optimized results will be stored in ``self.results``
+        :return: A tuple ``(df, results)`` where ``df`` is a DataFrame indexed by budget factor containing the objective value and the
+                 optimized spending on each program in the program start year, and ``results`` is a list of :class:`Result` instances
+                 in the same order as ``budget_factors``
+
+        """
+
+        import concurrent.futures
+        import pickle
+        from .model import Model
+
+        parset = self.parset(parset)
+        progset = self.progset(progset)
+        budget_factors = sc.promotetolist(budget_factors)
+        assert len(set(budget_factors)) == len(budget_factors), "Budget factors must be unique"
+
+        # Compute the baselines once, based on the unscaled instructions
+        pickled_model = pickle.dumps(Model(self.settings, self.framework, parset, progset, instructions))
+        baselines = optimization.get_baselines(pickled_model)
+
+        # Precompute the scaled instructions, bounds and hard constraints for each level
+        level_instructions = []
+        level_bounds = []
+        level_constraints = []
+        for factor in budget_factors:
+            scaled_instructions = instructions.scale_alloc(factor)
+            x0, xmin, xmax = optimization.get_initialization(progset, scaled_instructions)
+            level_instructions.append(scaled_instructions)
+            level_bounds.append((xmin, xmax))
+            level_constraints.append(optimization.get_hard_constraints(x0, scaled_instructions))
+
+        # Arguments for `_run_budget_level` that are the same for every level. These are sent to each worker once
+        args = dict(proj=self, optimization=optimization, parset=parset, progset=progset, baselines=baselines)
+
+        def get_task(idx, neighbour):
+            # Return the level-specific arguments for `_run_budget_level`, initialized from the neighbour if possible
+            x0 = None
+            if neighbour is not None and budget_factors[neighbour] > 0:
+                warm_instructions = optimized_instructions[neighbour].scale_alloc(budget_factors[idx] / budget_factors[neighbour])
+                x0 = []
+                for adjustment in optimization.adjustments:
+                    x0 += adjustment.get_initialization(progset, warm_instructions)
+                x0 = np.clip(x0, *level_bounds[idx])
+            return dict(instructions=level_instructions[idx], x0=x0, hard_constraints=level_constraints[idx], result_name="Budget x%g" % (budget_factors[idx]))
+
+        def get_next(pending, completed):
+            # Return the pending level closest to a completed level, together with that completed level
+            return min(((i, j) for i in pending for j in completed), key=lambda x: abs(budget_factors[x[0]] - budget_factors[x[1]]))
+
+        optimized_instructions = [None] * len(budget_factors)
+        results = [None] * len(budget_factors)
+        order = sorted(range(len(budget_factors)), key=lambda x: budget_factors[x])
+
+        if parallel:
+            num_workers = num_workers if num_workers else os.cpu_count()
+            with concurrent.futures.ProcessPoolExecutor(num_workers, initializer=_budget_worker_init, initargs=(args,)) as executor:
+                n_seeds = min(num_workers, len(budget_factors))
+                seeds = [order[i] for i in sorted(set(np.linspace(0, len(order) - 1, n_seeds).round().astype(int)))]
+                pending = [x for x in order if x not in seeds]
+                running = {executor.submit(_budget_worker, get_task(idx, None)): idx for idx in seeds}
+                while running:
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        idx = running.pop(future)
+                        optimized_instructions[idx], results[idx] = future.result()
+                        logger.info("Optimized budget factor %g", budget_factors[idx])
+                    while pending and len(running) < n_seeds:
+                        idx, neighbour = get_next(pending, [i for i, x in enumerate(results) if x is not None])
+                        pending.remove(idx)
+                        running[executor.submit(_budget_worker, get_task(idx, neighbour))] = idx
+        else:
+            idx, neighbour = order[0], None
+            pending = order[1:]
+            while True:
+                optimized_instructions[idx], results[idx] = _run_budget_level(**args, **get_task(idx, neighbour))
+                logger.info("Optimized budget factor %g", budget_factors[idx])
+                if not pending:
+                    break
+                idx, neighbour = get_next(pending, [i for i, x in enumerate(results) if x is not None])
+                pending.remove(idx)
+
+        records = []
+        for factor, result in zip(budget_factors, results):
+            record = {"budget_factor": factor, "objective": optimization.compute_objective(result.model, baselines)}
+            alloc = progset.get_alloc(result.model.program_instructions.start_year, result.model.program_instructions)
+            for prog_name, spend in alloc.items():
+                record[prog_name] = spend[0]
+            records.append(record)
+            if store_results:
+                self.results.append(result)
+        df = pd.DataFrame.from_records(records).set_index("budget_factor").sort_index()
+
+        return df, results
+
     def run_optimization(self, optimname=None, maxtime=None, maxiters=None, store_results=True):
         """Run an optimization"""
         optim_ins = self.optim(optimname)
@@ -665,21 +863,35 @@ class Project(NamedItem):
         results = [unoptimized_result, optimized_result]
         return results
 
-    def save(self, filename: str = None, folder: str = None) -> str:
+    def save(self, filename: str = None, folder: str = None, container: bool = None) -> str:
         """
         Save binary project file
 
-        This method saves the entire project as a binary blob to disk
+        This method saves the entire project as a binary blob to disk. Alternatively, the project
+        can be saved as a container, which is a directory (or a zip file, if the file name ends with
+        ``.zip``) with separate entries for the framework, data, parameter sets, program sets, scenarios,
+        and each result. When a project is loaded from a container, results are only loaded when they
+        are accessed, and saving to an existing container only writes the entries that have changed.
 
         :param filename: Name of the file to save
         :param folder: Optionally specify a folder
+        :param container: If ``True``, save the project as a container. If ``None``, a container will be
+                          written if the destination is an existing container (e.g., if the project was loaded from one)
         :return: The full path of the file that was saved
 
         """
 
-        fullpath = sc.makefilepath(filename=filename, folder=folder, default=[self.filename, self.name], ext="prj", sanitize=True)
-        self.filename = fullpath
-        sc.saveobj(fullpath, self)
+        if container is None:
+            container = _is_container(sc.makefilepath(filename=filename, folder=folder, default=[self.filename, self.name], sanitize=True, makedirs=False))
+
+        if container:
+            fullpath = sc.makefilepath(filename=filename, folder=folder, default=[self.filename, self.name], sanitize=True)
+            self.filename = fullpath
+            _save_container(self, fullpath)
+        else:
+            fullpath = sc.makefilepath(filename=filename, folder=folder, default=[self.filename, self.name], ext="prj", sanitize=True)
+            self.filename = fullpath
+            sc.saveobj(fullpath, self)
         return fullpath
 
     @staticmethod
@@ -691,11 +903,14 @@ class Project(NamedItem):
         saved using :meth:`Project.save`. Migration is automatically performed as
         part of the loading operation.
 
-        :param filepath: The file path/name to load
+        :param filepath: The file path/name to load. This can also be a container written by :meth:`Project.save`
         :return: A new :class:`Project` instance
 
         """
 
+        if _is_container(filepath):
+            return _load_container(filepath)
+
         P = sc.loadobj(filepath, die=True)
         assert isinstance(P, Project)
         return P
@@ -706,7 +921,419 @@ class Project(NamedItem):
         self.__dict__ = P.__dict__
 
 
-def _run_sampled_sim(proj, parset, progset, progset_instructions: list, result_names: list, max_attempts: int = None):
+# Project attributes stored in each container entry. Any attributes not listed here are stored in the 'project' entry,
+# and results are stored in separate entries
+_CONTAINER_ENTRIES = {
+    "framework": ["framework"],
+    "data": ["data", "databook"],
+    "parsets": ["parsets"],
+    "progsets": ["progsets", "progbook"],
+    "scens": ["scens"],
+}
+
+
+def _is_container(path) -> bool:
+    # Return True if the path is a project container written by `_save_container()`
+    path = str(path)
+    if os.path.isdir(path):
+        return os.path.isfile(os.path.join(path, "manifest.json"))
+    elif os.path.isfile(path) and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            return "manifest.json" in z.namelist()
+    return False
+
+
+def _read_container_entry(path, entry: str) -> bytes:
+    # Return the stored (compressed) contents of an entry in a container
+    if os.path.isdir(path):
+        with open(os.path.join(path, entry), "rb") as f:
+            return f.read()
+    else:
+        with zipfile.ZipFile(path) as z:
+            return z.read(entry)
+
+
+def _load_container_entry(path, entry: str):
+    return pickle.loads(gzip.decompress(_read_container_entry(path, entry)))
+
+
+class _StoredResult:
+    """
+    Placeholder for a result that has not been loaded from a container
+
+    :param path: The path to the container
+    :param entry: The name of the container entry with the result
+    :param name: The name of the result
+
+    """
+
+    def __init__(self, path: str, entry: str, name: str):
+        self.path = path
+        self.entry = entry
+        self.name = name
+
+    def __repr__(self):
+        return f'<Result "{self.name}" (not loaded)>'
+
+    def load(self) -> Result:
+        logger.debug('Loading result "%s" from "%s"', self.name, self.path)
+        return _load_container_entry(self.path, self.entry)  # Migration takes place when the Result is unpickled
+
+
+class _ResultStore(NDict):
+    """
+    Results for a project loaded from a container
+
+    This NDict contains :class:`_StoredResult` placeholders for results that have not been loaded yet. The placeholders
+    are replaced by the results when they are accessed. Copying or pickling the NDict loads all of the results, and
+    produces a normal :class:`NDict`.
+
+    """
+
+    def __getitem__(self, *args, **kwargs):
+        value = sc.odict.__getitem__(self, *args, **kwargs)
+        if isinstance(value, _StoredResult):
+            return self._load(value)
+        elif isinstance(value, list) and any(isinstance(x, _StoredResult) for x in value):
+            return [self._load(x) if isinstance(x, _StoredResult) else x for x in value]
+        return value
+
+    def _load(self, stored: _StoredResult) -> Result:
+        result = stored.load()
+        for key, value in OrderedDict.items(self):
+            if value is stored:
+                sc.odict.__setitem__(self, key, result)  # Bypass NDict.__setitem__ so that the modified date is not updated
+        return result
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self, transpose=False):
+        items = [(key, self[key]) for key in self.keys()]
+        return tuple(map(list, zip(*items))) if transpose else items
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __repr__(self):
+        return repr(sc.odict(OrderedDict.items(self)))  # Display placeholders rather than loading results
+
+    def __reduce__(self):
+        return NDict, (), None, None, iter(self.items())
+
+
+def _restore_ndict(items) -> NDict:
+    # Reconstruct an NDict without going through NDict.__setitem__, which would update the modified date of every item
+    d = NDict()
+    for key, value in items:
+        sc.odict.__setitem__(d, key, value)
+    return d
+
+
+def _serialize_entry(obj) -> tuple:
+    # Return the name of the container entry and the compressed pickle. Entries are named based on a hash of their
+    # contents, so unchanged entries do not need to be written again
+    f = io.BytesIO()
+    pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[NDict] = lambda x: (_restore_ndict, (list(OrderedDict.items(x)),))
+    pickler.dump(obj)
+    data = f.getvalue()
+    return "%s.pkl.gz" % (hashlib.sha256(data).hexdigest()), gzip.compress(data, compresslevel=5, mtime=0)
+
+
+def _save_container(proj, path: str) -> None:
+    """
+    Save a project as a container
+
+    The container has a ``manifest.json`` listing the entries for each part of the project. Entries
+    are named by their content hash, so when saving to an existing container, only entries that have
+    changed are written. Results that have not been loaded from the container are not unpickled or
+    written again. If ``path`` ends with ``.zip``, the container is written to a zip file, otherwise
+    a directory is used.
+
+    :param proj: The :class:`Project` to save
+    :param path: The path to the container
+
+    """
+
+    existing = set()
+    if _is_container(path):
+        if os.path.isdir(path):
+            existing = set(os.listdir(path))
+        else:
+            with zipfile.ZipFile(path) as z:
+                existing = set(z.namelist())
+
+    pending = dict()  # Contents of entries that need to be written, or the placeholder to copy them from
+
+    def add(obj) -> str:
+        if isinstance(obj, _StoredResult):
+            entry = obj.entry
+            if entry not in existing and entry not in pending:
+                pending[entry] = obj
+        else:
+            entry, data = _serialize_entry(obj)
+            if entry not in existing:
+                pending[entry] = data
+        return entry
+
+    d = proj.__dict__.copy()
+    results = d.pop("results")
+    manifest = {"atomica_version": version, "entries": {}, "results": []}
+    for name, attrs in _CONTAINER_ENTRIES.items():
+        manifest["entries"][name] = add({attr: d.pop(attr) for attr in attrs if attr in d})
+    manifest["entries"]["project"] = add(d)
+    for key, result in OrderedDict.items(results):
+        manifest["results"].append([key, add(result)])
+    referenced = set(manifest["entries"].values()) | set(entry for _, entry in manifest["results"])
+    manifest = json.dumps(manifest, indent=2).encode()
+
+    def contents(entry):
+        data = pending[entry]
+        return _read_container_entry(data.path, data.entry) if isinstance(data, _StoredResult) else data
+
+    if path.lower().endswith(".zip"):
+        # Zip files are rewritten, but unchanged entries are copied from the existing file without being unpickled
+        with zipfile.ZipFile(path + ".tmp", "w", compression=zipfile.ZIP_STORED) as z:
+            for entry in sorted(referenced):
+                z.writestr(entry, contents(entry) if entry in pending else _read_container_entry(path, entry))
+            z.writestr("manifest.json", manifest)
+        os.replace(path + ".tmp", path)
+    else:
+        os.makedirs(path, exist_ok=True)
+        for entry in pending:
+            _write_container_file(os.path.join(path, entry), contents(entry))
+        _write_container_file(os.path.join(path, "manifest.json"), manifest)
+        for entry in existing - referenced - {"manifest.json"}:
+            if entry.endswith(".pkl.gz"):
+                os.remove(os.path.join(path, entry))  # Remove entries that are no longer used
+
+    logger.debug("Saved project container with %d new entries", len(pending))
+
+
+def _write_container_file(filename: str, data: bytes) -> None:
+    # Write to a temporary file first so that the container is not corrupted if saving is interrupted
+    with open(filename + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(filename + ".tmp", filename)
+
+
+def _load_container(path) -> Project:
+    """
+    Load a project container
+
+    The project entries are loaded immediately, but results are only loaded when they are accessed.
+
+    :param path: The path to the container
+    :return: A new :class:`Project` instance
+
+    """
+
+    path = os.path.abspath(str(path))
+    manifest = json.loads(_read_container_entry(path, "manifest.json"))
+
+    d = _load_container_entry(path, manifest["entries"]["project"])
+    for name in _CONTAINER_ENTRIES:
+        d.update(_load_container_entry(path, manifest["entries"][name]))
+
+    d["results"] = _ResultStore()
+    for key, entry in manifest["results"]:
+        sc.odict.__setitem__(d["results"], key, _StoredResult(path, entry, key))
+    d["filename"] = path
+
+    P = Project.__new__(Project)
+    P.__setstate__(d)  # Run migrations
+    return P
+
+
+def _get_sampling_inputs(proj, parset, progset, progset_instructions, result_names) -> tuple:
+    """
+    Validate inputs for sampled simulations
+
+    :param proj: A :class:`Project` instance
+    :param parset: A :class:`ParameterSet` instance or name
+    :param progset: A :class:`ProgramSet` instance or name, or ``None``
+    :param progset_instructions: A :class:`ProgramInstructions` instance, or a list of instructions
+    :param result_names: Optionally specify result names (see :meth:`Project.run_sampled_sims`)
+    :return: A tuple with the ParameterSet, the ProgramSet, a list of instructions, and a list of result names
+
+    """
+
+    assert (not progset) == (not progset_instructions), "If running with programs, both a progset and instructions must be provided"
+
+    parset = proj.parset(parset)
+    progset = proj.progset(progset) if progset is not None else None
+    progset_instructions = sc.promotetolist(progset_instructions, keepnone=True)
+
+    if not result_names:
+        if len(progset_instructions) > 1:
+            result_names = ["instructions_%d" % (i) for i in range(len(progset_instructions))]
+        else:
+            result_names = ["default"]
+    else:
+        result_names = sc.promotetolist(result_names)
+        assert (len(result_names) == 1 and not progset) or (len(progset_instructions) == len(result_names)), "Number of result names must match number of instructions"
+
+    return parset, progset, progset_instructions, result_names
+
+
+def _get_sampling_plan(parset, progset, n_samples: int, sampling=None, seed=None, checkpoint: str = None, resume: bool = False) -> list:
+    """
+    Prepare sampling design
+
+    This function generates the design row and seed for each sample, for use in :func:`_run_sampled_sim`.
+    The number of columns required in the design is determined by sampling the parset and progset once with a
+    :class:`DesignStream` that counts the draws. Each sample receives its own ``SeedSequence`` spawned from
+    the seed, so the samples do not depend on the global random number generator state inside parallel workers.
+
+    If a checkpoint is provided, the plan is saved to ``<checkpoint>_plan.chk`` so that an interrupted run can
+    be resumed with the same samples even if no seed was specified.
+
+    :param parset: A :class:`ParameterSet` instance
+    :param progset: A :class:`ProgramSet` instance, or ``None``
+    :param n_samples: Number of samples
+    :param sampling: A sampling method or design matrix (see :meth:`Project.run_sampled_sims`)
+    :param seed: Optionally specify a seed. If ``None``, a seed is drawn from the global NumPy random number generator
+    :param checkpoint: Optionally specify a file name prefix for checkpoint files
+    :param resume: If ``True``, reuse the plan saved in the checkpoint if it exists
+    :return: A list of ``(design,seed,checkpoint_file)`` tuples, one for each sample. ``checkpoint_file`` is ``None``
+             if no checkpoint was specified
+
+    """
+
+    if resume and not checkpoint:
+        raise Exception("A checkpoint must be specified in order to resume sampling")
+
+    plan_file = f"{checkpoint}_plan.chk" if checkpoint else None
+
+    if resume and os.path.isfile(plan_file):
+        plan = sc.loadobj(plan_file)
+        if len(plan) != n_samples:
+            raise Exception("The checkpoint %s contains a plan for %d samples but %d samples were requested" % (plan_file, len(plan), n_samples))
+    else:
+        if seed is None:
+            seed = np.random.randint(0, 2**32, dtype=np.int64)  # Respect the global random state, so that `np.random.seed()` still produces reproducible samples
+
+        seed_sequence = np.random.SeedSequence(seed)
+        design_seed, retry_seed = seed_sequence.spawn(2)
+
+        stream = DesignStream()
+        parset.sample(rng=stream)
+        if progset:
+            progset.sample(rng=stream)
+
+        if sampling is None or sc.isstring(sampling):
+            design = sample_design(n_samples, stream.n_drawn, method=sampling if sampling else "random", seed=design_seed)
+        else:
+            design = np.array(sampling, dtype=float)
+            assert design.shape == (n_samples, stream.n_drawn), "The design matrix must have shape (%d,%d) (number of samples, number of random draws per sample) but it had shape %s" % (n_samples, stream.n_drawn, design.shape)
+
+        plan = list(zip(design, retry_seed.spawn(n_samples)))
+
+        if checkpoint:
+            # Remove samples from any previous run, as they would not correspond to the new plan
+            for i in range(n_samples):
+                if os.path.isfile(_sample_checkpoint_file(checkpoint, i)):
+                    os.remove(_sample_checkpoint_file(checkpoint, i))
+            sc.saveobj(plan_file, plan)
+
+    return [(design, sample_seed, _sample_checkpoint_file(checkpoint, i) if checkpoint else None) for i, (design, sample_seed) in enumerate(plan)]
+
+
+def _sample_checkpoint_file(checkpoint: str, index: int) -> str:
+    """
+    Return checkpoint file name for a sample
+
+    :param checkpoint: File name prefix for checkpoint files
+    :param index: Sample index
+    :return: The file name that the sample's output is saved to
+
+    """
+
+    return f"{checkpoint}_sample{index}.chk"
+
+
+def _load_completed_samples(samples: list) -> dict:
+    """
+    Load completed samples from checkpoint files
+
+    :param samples: A sampling plan returned by :func:`_get_sampling_plan`
+    :return: A dict mapping sample index to the saved output for samples that have already been completed
+
+    """
+
+    completed = {i: sc.loadobj(x[2]) for i, x in enumerate(samples) if x[2] and os.path.isfile(x[2])}
+    if completed:
+        logger.info("Resuming from checkpoint - %d of %d samples already completed", len(completed), len(samples))
+    return completed
+
+
+def _save_sample_checkpoint(checkpoint_file: str, obj) -> None:
+    """
+    Save the output of a completed sample
+
+    The output is written to a temporary file first, so that an interruption while saving does not leave a
+    partially written checkpoint behind.
+
+    :param checkpoint_file: The file name to save to, or ``None`` to skip saving
+    :param obj: The object to save
+
+    """
+
+    if checkpoint_file:
+        sc.saveobj(checkpoint_file + ".tmp", obj)
+        os.replace(checkpoint_file + ".tmp", checkpoint_file)
+
+
+def _run_planned_sample(sample: tuple, mapping_function=None, **kwargs):
+    """
+    Run a sampled simulation from a sampling plan
+
+    This function unpacks the ``(design,seed,checkpoint_file)`` tuple from :func:`_get_sampling_plan` and runs the sample.
+    If a mapping function is provided, it is applied to the results before returning, so that when running in parallel,
+    the data reduction is performed on the worker and only the mapped output (e.g., ``PlotData``) is sent back. If a
+    checkpoint file is provided, the output is saved to it once the sample is complete.
+
+    :param sample: A ``(design,seed,checkpoint_file)`` tuple
+    :param mapping_function: Optionally specify a function to apply to the list of results (e.g., :attr:`Ensemble.mapping_function`)
+    :param kwargs: Arguments passed to :func:`_run_sampled_sim`
+    :return: A list of results, or the output of the mapping function
+
+    """
+
+    results = _run_sampled_sim(design=sample[0], seed=sample[1], **kwargs)
+    if mapping_function is not None:
+        results = mapping_function(results)
+    _save_sample_checkpoint(sample[2], results)
+    return results
+
+
+_sampling_worker_args = None  # Arguments for ``_run_planned_sample``, set on each worker by ``_sampling_worker_init``
+
+
+def _sampling_worker_init(args: dict) -> None:
+    """
+    Initialize a worker for parallel sampling
+
+    The project, parset, progset and instructions are the same for every sample, so they are sent to each
+    worker once when the pool is created (or inherited if the worker is forked), rather than with every sample.
+
+    :param args: Dict of keyword arguments for :func:`_run_planned_sample`
+
+    """
+
+    global _sampling_worker_args
+    _worker_init()
+    _sampling_worker_args = args
+
+
+def _sampling_worker(sample: tuple):
+    # Run a planned sample on a parallel worker
+    return _run_planned_sample(sample, **_sampling_worker_args)
+
+
+def _run_sampled_sim(proj, parset, progset, progset_instructions: list, result_names: list, max_attempts: int = None, design=None, seed=None):
     """
     Internal function to run simulation with sampling
 
@@ -720,6 +1347,8 @@ def _run_sampled_sim(proj, parset, progset, progset_instructions: list, result_n
 
     A sampled simulation may result in bad initial conditions. If that occurs, the parameters and program
     set will be resampled up to a maximum of ``n_attempts`` times, after which an error will be raised.
+    The initial conditions are checked with :func:`check_initialization` before running the simulation, so
+    rejected samples do not incur the cost of building the model.
 
     :param proj: A :class:`Project` instance
     :param parset: A :class:`ParameterSet` instance
@@ -727,26 +1356,89 @@ def _run_sampled_sim(proj, parset, progset, progset_instructions: list, result_n
     :param progset_instructions: A list of instructions to run against a single sample
     :param result_names: A list of result names (strings)
     :param max_attempts: Maximum number of sampling attempts before raising an error
+    :param design: Optionally specify a row of a sampling design (see :func:`sample_design`) to use for the first attempt
+    :param seed: Optionally specify a seed for the random number generator used if resampling is required
     :return: A list of results that either contains 1 result, or the same number of results as instructions
 
     """
 
-    from .model import BadInitialization  # avoid circular import
+    from .model import BadInitialization, get_initialization_systems, check_initialization  # avoid circular import
 
     if max_attempts is None:
         max_attempts = 50
 
+    rng = np.random.default_rng(seed) if (design is not None or seed is not None) else None
+    systems = get_initialization_systems(proj.framework, parset)
+
     attempts = 0
     while attempts < max_attempts:
+        sample_rng = DesignStream(design) if (attempts == 0 and design is not None) else rng
         try:
             if progset:
-                sampled_parset = parset.sample()
-                sampled_progset = progset.sample()
+                sampled_parset = parset.sample(rng=sample_rng)
+                sampled_progset = progset.sample(rng=sample_rng)
+                check_initialization(sampled_parset, systems, proj.settings.sim_start)  # Reject bad initial conditions before building the model
                 results = [proj.run_sim(parset=sampled_parset, progset=sampled_progset, progset_instructions=x, result_name=y) for x, y in zip(progset_instructions, result_names)]
             else:
-                sampled_parset = parset.sample()
+                sampled_parset = parset.sample(rng=sample_rng)
+                check_initialization(sampled_parset, systems, proj.settings.sim_start)
                 results = [proj.run_sim(parset=sampled_parset, result_name=y) for y in result_names]
             return results
         except BadInitialization:
             attempts += 1
     raise Exception("Failed simulation after %d attempts - something might have gone wrong" % (max_attempts))
+
+
+def _run_budget_level(proj, optimization, parset, progset, instructions, x0, hard_constraints: list, baselines: list, result_name: str) -> tuple:
+    """
+    Internal function to optimize a single budget level
+
+    This function is intended for internal use only, via :meth:`Project.run_budget_sweep`. It is a standalone
+    function so that it can be pickled for use with parallel workers.
+
+    :param proj: A :class:`Project` instance
+    :param optimization: An :class:`Optimization` instance
+    :param parset: A :class:`ParameterSet` instance
+    :param progset: A :class:`ProgramSet` instance
+    :param instructions: The scaled :class:`ProgramInstructions` for this budget level
+    :param x0: Initial values for the adjustables, or ``None`` to initialize from the instructions
+    :param hard_constraints: Hard constraints for this budget level
+    :param baselines: Measurable baseline values
+    :param result_name: Name to assign to the optimized result
+    :return: A tuple with the optimized :class:`ProgramInstructions` and the corresponding :class:`Result`
+
+    """
+
+    try:
+        optimized_instructions = optimize(proj, optimization, parset, progset, instructions, x0=x0, hard_constraints=hard_constraints, baselines=baselines)
+    except InvalidInitialConditions:
+        if x0 is None:
+            raise
+        optimized_instructions = optimize(proj, optimization, parset, progset, instructions, hard_constraints=hard_constraints, baselines=baselines)  # Fall back to initializing from the scaled instructions
+
+    result = proj.run_sim(parset=parset, progset=progset, progset_instructions=optimized_instructions, result_name=result_name)
+    return optimized_instructions, result
+
+
+_budget_worker_args = None  # Arguments for ``_run_budget_level``, set on each worker by ``_budget_worker_init``
+
+
+def _budget_worker_init(args: dict) -> None:
+    """
+    Initialize a worker for a parallel budget sweep
+
+    The project, optimization, parset, progset and baselines are the same for every budget level, so they are sent
+    to each worker once when the pool is created, rather than with every level.
+
+    :param args: Dict of keyword arguments for :func:`_run_budget_level` that are common to all levels
+
+    """
+
+    global _budget_worker_args
+    _worker_init()
+    _budget_worker_args = args
+
+
+def _budget_worker(task: dict) -> tuple:
+    # Optimize a budget level on a parallel worker
+    return _run_budget_level(**_budget_worker_args, **task)
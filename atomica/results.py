@@ -6,6 +6,10 @@ providing methods to conveniently access, plot, and export model outputs.
 
 """
 from collections import defaultdict
+import copy
+import json
+import os
+import sys
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -16,14 +20,15 @@ import logging
 from pathlib import Path
 
 import sciris as sc
+import xlsxwriter as xw
 from .excel import standard_formats
 from .system import FrameworkSettings as FS
 from .system import logger, NotFoundError
-from .utils import NamedItem, evaluate_plot_string, nested_loop
+from .utils import NamedItem, evaluate_plot_string, nested_loop, parallel_progress, _object_size, _pickled_size
 from .function_parser import parse_function
 from .version import version, gitinfo
 
-__all__ = ["Result", "export_results", "Ensemble"]
+__all__ = ["Result", "export_results", "export_raw_results", "load_raw_results", "ResultView", "Ensemble", "StreamingStatistics", "SampleStore"]
 
 
 class Result(NamedItem):
@@ -145,6 +150,77 @@ class Result(NamedItem):
                         print(f"NaNs detected in {var.name} ({pop.name})")
         return nans_present
 
+    def memory_usage(self, pickled: bool = False) -> pd.DataFrame:
+        """
+        Return a breakdown of the memory used by the result
+
+        The memory is reported for each population and type of item. The item types are
+
+        - ``compartments``, ``characteristics``, ``parameters`` and ``links`` - the integration objects and the arrays they store
+        - ``keyrings`` - the arrays storing the number of people by time since entry for timed compartments and links
+        - ``interactions`` - the interaction weights between populations
+        - ``sensitivities`` - forward sensitivities, if they were computed
+        - ``framework`` and ``progset`` - the copies of the framework and program set stored in the model. These
+          may be shared with other results, see :meth:`Project.memory_usage`
+        - ``other`` - everything else, such as the time vector, program instructions, and lookup tables
+
+        Items that are not associated with a single population have population ``'N.A.'``. Objects that are referred
+        to by more than one item are counted once, in the first item they are found in.
+
+        :param pickled: If ``True``, also estimate the size of each item when the result is pickled (e.g., when saving a project,
+                        or when sending results between processes). This takes longer, because the framework and program set are pickled
+        :return: A DataFrame indexed by population and item type, with the number of objects and number of bytes for each item
+
+        """
+
+        return self._memory_usage(pickled=pickled, seen=set())
+
+    def _memory_usage(self, pickled: bool, seen: set) -> pd.DataFrame:
+        # Implement `memory_usage()`. The set of object IDs already counted is passed in, so that objects shared
+        # between results are only counted once when reporting memory usage for a project
+
+        from .model import TimedCompartment, TimedLink
+
+        model = self.model
+        variables = [var for pop in model.pops for var in pop.comps + pop.characs + pop.pars + pop.links]
+
+        # Variables refer to each other and to their population, so they are marked as seen and their contents are counted individually
+        seen.update([id(self), id(model)] + [id(pop) for pop in model.pops] + [id(var) for var in variables])
+
+        rows = []
+
+        # Items stored at the model level
+        model_items = {
+            "interactions": (len(model.interactions), [model.interactions]),
+            "sensitivities": (len(getattr(model, "sensitivities", None) or {}), [getattr(model, "sensitivities", None), getattr(model, "_tangent", None)]),  # Not present in results from older versions
+            "framework": (int(model.framework is not None), [model.framework]),
+            "progset": (int(model.progset is not None), [model.progset]),
+        }
+        for item, (count, objs) in model_items.items():
+            objs = [x for x in objs if x is not None]
+            size = sum(_object_size(x, seen) for x in objs)
+            rows.append([FS.DEFAULT_SYMBOL_INAPPLICABLE, item, count, size, _pickled_size(objs) if pickled and size else 0])
+
+        # Everything else - the remaining model and result attributes, and the populations' lookup tables
+        other = [v for k, v in model.__dict__.items() if k not in {"pops", "interactions", "sensitivities", "_tangent", "framework", "progset"}]
+        other += [v for k, v in self.__dict__.items() if k != "model"]
+        other += [pop.__dict__ for pop in model.pops]
+        size = sum(_object_size(x, seen) for x in other)
+        rows.append([FS.DEFAULT_SYMBOL_INAPPLICABLE, "other", len(other), size, size])  # The lookup tables refer to variables, so the pickled size is approximated by the size in memory
+
+        for pop in model.pops:
+            keyrings = [var._vals for var in pop.comps + pop.links if isinstance(var, (TimedCompartment, TimedLink)) and var._vals is not None]
+            keyring_ids = {id(x) for x in keyrings}
+            rows.append([pop.name, "keyrings", len(keyrings), sum(_object_size(x, seen) for x in keyrings), _pickled_size(keyrings) if pickled and keyrings else 0])
+
+            for item, pop_vars in [("compartments", pop.comps), ("characteristics", pop.characs), ("parameters", pop.pars), ("links", pop.links)]:
+                size = sum(sys.getsizeof(var) + _object_size(var.__dict__, seen) for var in pop_vars)
+                arrays = [x for var in pop_vars for x in var.__dict__.values() if isinstance(x, np.ndarray) and id(x) not in keyring_ids]  # The arrays make up most of the pickled size of the variables
+                rows.append([pop.name, item, len(pop_vars), size, _pickled_size(arrays) if pickled else 0])
+
+        df = pd.DataFrame(rows, columns=["pop", "type", "count", "bytes", "pickled"]).set_index(["pop", "type"])
+        return df if pickled else df.drop(columns="pickled")
+
     def get_alloc(self, year=None) -> dict:
         """
         Return spending allocation
@@ -396,15 +472,36 @@ class Result(NamedItem):
 
         """
 
-        # Assemble the outputs into a dict
+        # Create DataFrame from dict
+        df = pd.DataFrame(self._get_raw_outputs(), index=self.t)
+        df.index.name = "Time"
+
+        # Optionally save it
+        if filename is not None:
+            output_fname = Path(filename).with_suffix(".xlsx").resolve()
+            df.T.to_excel(output_fname)
+
+        return df
+
+    def _get_raw_outputs(self) -> dict:
+        """
+        Assemble raw model outputs
+
+        :return: A dict with all model outputs, keyed by ``(variable type, pop name, variable name, label)``
+
+        """
+
         d = dict()
+        labels = dict()  # Cache labels because the same variables appear in every population
 
         def gl(name):
             # Local helper to get name and gracefully deal with transfer parameters that don't appear in the framework
-            try:
-                return self.framework.get_label(name)
-            except NotFoundError:
-                return "-"
+            if name not in labels:
+                try:
+                    labels[name] = self.framework.get_label(name)
+                except NotFoundError:
+                    labels[name] = "-"
+            return labels[name]
 
         for pop in self.model.pops:
             for comp in pop.comps:
@@ -431,16 +528,7 @@ class Result(NamedItem):
                     d[key] = np.zeros(self.t.shape)
                 d[key] += link.vals / self.dt
 
-        # Create DataFrame from dict
-        df = pd.DataFrame(d, index=self.t)
-        df.index.name = "Time"
-
-        # Optionally save it
-        if filename is not None:
-            output_fname = Path(filename).with_suffix(".xlsx").resolve()
-            df.T.to_excel(output_fname)
-
-        return df
+        return d
 
     def plot(self, plot_name=None, plot_group=None, pops=None, project=None):
         """
@@ -577,27 +665,20 @@ def export_results(results, filename=None, output_ordering=("output", "result",
     # Interpolate all outputs onto these years
     new_tvals = np.arange(np.ceil(results[0].t[0]), np.floor(results[0].t[-1]) + 1)
 
-    # Open the output file
+    # Open the output file. The workbook is opened in constant memory mode, so each row is flushed to disk as soon as it
+    # has been written, and each sheet is assembled and written in turn so only one sheet's values are held in memory
     output_fname = Path(filename).with_suffix(".xlsx").resolve()
-    writer = pd.ExcelWriter(output_fname, engine="xlsxwriter")
-    formats = standard_formats(writer.book)
+    workbook = xw.Workbook(str(output_fname), {"constant_memory": True})
+    formats = standard_formats(workbook)
+    formats["index"] = workbook.add_format({"bold": 1, "border": 1, "align": "center", "valign": "top"})  # Matches the style Pandas uses for headers and index labels
 
     # Write the plots sheet if any plots are available
     if "plots" in results[0].framework.sheets:
-        plot_df = []
         plots_available = results[0].framework.sheets["plots"][0]
-        for _, spec in plots_available.iterrows():
-            if "type" in spec and spec["type"] == "bar":
-                continue  # For now, don't do bars - not implemented yet
-            plot_df.append(_output_to_df(results, output_name=spec["name"], output=evaluate_plot_string(spec["quantities"]), tvals=new_tvals, time_aggregate=False))
-        _write_df(writer, formats, "Plot data annualized", pd.concat(plot_df), output_ordering)
-
-        plot_df = []
-        for _, spec in plots_available.iterrows():
-            if "type" in spec and spec["type"] == "bar":
-                continue  # For now, don't do bars - not implemented yet
-            plot_df.append(_output_to_df(results, output_name=spec["name"], output=evaluate_plot_string(spec["quantities"]), tvals=new_tvals, time_aggregate=True))
-        _write_df(writer, formats, "Plot data annual aggregated", pd.concat(plot_df), output_ordering)
+        plots_available = [spec for _, spec in plots_available.iterrows() if not ("type" in spec and spec["type"] == "bar")]  # For now, don't do bars - not implemented yet
+        for sheet_name, time_aggregate in [("Plot data annualized", False), ("Plot data annual aggregated", True)]:
+            plot_df = [_output_to_df(results, output_name=spec["name"], output=evaluate_plot_string(spec["quantities"]), tvals=new_tvals, time_aggregate=time_aggregate) for spec in plots_available]
+            _write_df(workbook, formats, sheet_name, pd.concat(plot_df), output_ordering)
 
     # Write cascades into separate sheets
     cascade_df = []
@@ -606,7 +687,7 @@ def export_results(results, filename=None, output_ordering=("output", "result",
     if cascade_df:
         # always split tables by cascade, since different cascades can have different stages or the same stages with different definitions
         # it's thus potentially very confusing if the tables are split by something other than the cascade
-        _write_df(writer, formats, "Cascade", pd.concat(cascade_df), ("cascade",) + cascade_ordering)
+        _write_df(workbook, formats, "Cascade", pd.concat(cascade_df), ("cascade",) + cascade_ordering)
 
     # If there are targetable parameters, output them
     targetable_code_names = list(results[0].framework.pars.index[results[0].framework.pars["targetable"] == "y"])
@@ -614,7 +695,7 @@ def export_results(results, filename=None, output_ordering=("output", "result",
         par_df = []
         for par_name in targetable_code_names:
             par_df.append(_output_to_df(results, output_name=par_name, output=par_name, tvals=new_tvals))
-        _write_df(writer, formats, "Target parameters annualized", pd.concat(par_df), output_ordering)
+        _write_df(workbook, formats, "Target parameters annualized", pd.concat(par_df), output_ordering)
 
     # If any of the results used programs, output them
     if any([x.used_programs for x in results]):
@@ -626,23 +707,34 @@ def export_results(results, filename=None, output_ordering=("output", "result",
                 prog_names += list(result.model.progset.programs.keys())
         prog_names = list(dict.fromkeys(prog_names))
 
-        prog_df = []
-        for prog_name in prog_names:
-            prog_df.append(_programs_to_df(results, prog_name, new_tvals, time_aggregate=False))
-        _write_df(writer, formats, "Programs annualized", pd.concat(prog_df), program_ordering)
-
-        prog_df = []
-        for prog_name in prog_names:
-            prog_df.append(_programs_to_df(results, prog_name, new_tvals, time_aggregate=True))
-        _write_df(writer, formats, "Programs annual aggregated", pd.concat(prog_df), program_ordering)
+        _write_df(workbook, formats, "Programs annualized", _programs_to_df(results, prog_names, new_tvals, time_aggregate=False), program_ordering)
+        _write_df(workbook, formats, "Programs annual aggregated", _programs_to_df(results, prog_names, new_tvals, time_aggregate=True), program_ordering)
 
-    writer.save()
-    writer.close()
+    workbook.close()
 
     return output_fname
 
 
-def _programs_to_df(results, prog_name, tvals, time_aggregate=False):
+def _index_df(keys: list, vals: list, tvals, names: list) -> pd.DataFrame:
+    """
+    Assemble output rows into a DataFrame
+
+    :param keys: List of tuples with the index labels for each row
+    :param vals: List of arrays with the values for each row
+    :param tvals: The time values corresponding to the columns
+    :param names: The names of the index levels
+    :return: A DataFrame with one row per key, and one column per time value
+
+    """
+
+    if keys:
+        index = pd.MultiIndex.from_tuples(keys, names=names)
+    else:
+        index = pd.MultiIndex.from_arrays([[]] * len(names), names=names)
+    return pd.DataFrame(np.array(vals, dtype=float).reshape(len(keys), len(tvals)), index=index, columns=tvals)
+
+
+def _programs_to_df(results, prog_names, tvals, time_aggregate=False):
     """
     Return a DataFrame for program outputs for a group of results
 
@@ -650,7 +742,7 @@ def _programs_to_df(results, prog_name, tvals, time_aggregate=False):
     (e.g. spending, coverage fraction)
 
     :param results: List of Results
-    :param prog_name: The name of a program
+    :param prog_names: The name of a program, or a list of program names
     :param tvals: Outputs will be interpolated onto the times in this array (typically would be annual)
     :param time_aggregate: False means output annualized Jan 1 values, True means use time_aggregation to sum or average the timestep values over the year for each parameter.
     :return: A DataFrame
@@ -659,31 +751,38 @@ def _programs_to_df(results, prog_name, tvals, time_aggregate=False):
 
     from .plotting import PlotData
 
+    prog_names = sc.promotetolist(prog_names)
+
+    out_quantities = {
+        "spending": "Spending ($)" if time_aggregate else "Spending ($/year)",
+        "equivalent_spending": "Equivalent spending ($)" if time_aggregate else "Equivalent spending ($/year)",
+        "coverage_number": "People covered" if time_aggregate else "People covered (people/year)",
+        "coverage_eligible": "People eligible",
+        "coverage_fraction": "Proportion covered",
+    }
+
     data = dict()
 
     for result in results:
-        if result.used_programs and prog_name in result.model.progset.programs:
-            programs_active = (result.model.program_instructions.start_year <= tvals) & (tvals <= result.model.program_instructions.stop_year)
+        if not result.used_programs:
+            continue
 
-            out_quantities = {
-                "spending": "Spending ($)" if time_aggregate else "Spending ($/year)",
-                "equivalent_spending": "Equivalent spending ($)" if time_aggregate else "Equivalent spending ($/year)",
-                "coverage_number": "People covered" if time_aggregate else "People covered (people/year)",
-                "coverage_eligible": "People eligible",
-                "coverage_fraction": "Proportion covered",
-            }
+        programs = [x for x in prog_names if x in result.model.progset.programs]
+        if not programs:
+            continue
 
-            for quantity, label in out_quantities.items():
-                plot_data = PlotData.programs(result, outputs=prog_name, quantity=quantity)
-                vals = plot_data.time_aggregate(_extend_tvals(tvals)) if time_aggregate else plot_data.interpolate(tvals)
-                vals.series[0].vals[~programs_active] = np.nan
-                data[(prog_name, result.name, label)] = vals.series[0].vals
+        programs_active = (result.model.program_instructions.start_year <= tvals) & (tvals <= result.model.program_instructions.stop_year)
 
-    df = pd.DataFrame(data, index=tvals)
-    df = df.T
-    df.index = df.index.set_names(["program", "result", "quantity"])  # Set the index names correctly so they can be reordered easily
+        # Retrieve all of the programs at once, so that the coverage is only computed once per quantity
+        for quantity, label in out_quantities.items():
+            plot_data = PlotData.programs(result, outputs=programs, quantity=quantity)
+            vals = plot_data.time_aggregate(_extend_tvals(tvals)) if time_aggregate else plot_data.interpolate(tvals)
+            for series in vals.series:
+                series.vals[~programs_active] = np.nan
+                data[(series.output, result.name, label)] = series.vals
 
-    return df
+    keys = [(prog_name, result.name, label) for prog_name in prog_names for result in results for label in out_quantities.values() if (prog_name, result.name, label) in data]
+    return _index_df(keys, [data[key] for key in keys], tvals, ["program", "result", "quantity"])
 
 
 def _extend_tvals(tvals):
@@ -725,19 +824,16 @@ def _cascade_to_df(results, cascade_name, tvals):
         if pop.type == pop_type:
             pop_names[pop.name] = pop.label
 
-    cascade_df = []
+    cascade_keys = []
+    cascade_vals = []
     for pop, label in pop_names.items():
-        data = sc.odict()
         for result in results:
-            cascade_vals, _ = get_cascade_vals(result, cascade_name, pops=pop, year=tvals)
-            for stage, vals in cascade_vals.items():
-                data[(cascade_name, pop_names[pop], result.name, stage)] = vals
-        df = pd.DataFrame(data, index=tvals)
-        df = df.T
-        df.index = df.index.set_names(["cascade", "pop", "result", "stage"])  # Set the index names correctly so they can be reordered easily
-        cascade_df.append(df)
+            vals, _ = get_cascade_vals(result, cascade_name, pops=pop, year=tvals)
+            for stage, stage_vals in vals.items():
+                cascade_keys.append((cascade_name, label, result.name, stage))
+                cascade_vals.append(stage_vals)
 
-    return pd.concat(cascade_df)
+    return _index_df(cascade_keys, cascade_vals, tvals, ["cascade", "pop", "result", "stage"])
 
 
 def _output_to_df(results, output_name: str, output, tvals, time_aggregate=False) -> pd.DataFrame:
@@ -762,57 +858,64 @@ def _output_to_df(results, output_name: str, output, tvals, time_aggregate=False
 
     """
 
-    from .plotting import PlotData
+    from .plotting import PlotData, Series
 
     pops = _filter_pops_by_output(results[0], output)
     pop_labels = {x: y for x, y in zip(results[0].pop_names, results[0].pop_labels) if x in pops}
-    data = dict()
 
     popdata = PlotData(results, pops=pops, outputs=output)
     assert len(popdata.outputs) == 1, "Framework plot specification should evaluate to exactly one output series - there were %d" % (len(popdata.outputs))
+    n_pop_series = len(popdata.series)
+
+    # Now do a population total. The totals are added to the same PlotData prior to interpolation, so that all
+    # series are interpolated together. Adding the population series together is the same as using `pop_aggregation='sum'`
+    number_units = {FS.QUANTITY_TYPE_NUMBER, results[0].model.pops[0].comps[0].units}
+    fraction_units = {FS.QUANTITY_TYPE_FRACTION, FS.QUANTITY_TYPE_PROPORTION, FS.QUANTITY_TYPE_PROBABILITY}
+    if popdata.series[0].units in number_units:
+        for result in popdata.results:
+            pop_series = [s for s in popdata.series if s.result == result]
+            popdata.series.append(Series(pop_series[0].tvec, sum(s.vals for s in pop_series), result, "total", popdata.outputs[0], units=pop_series[0].units, timescale=pop_series[0].timescale))
+    elif popdata.series[0].units in fraction_units:
+        popdata.series += PlotData(results, outputs=output, pops={"total": pops}, pop_aggregation="weighted").series
+
     if time_aggregate:
         popdata.time_aggregate(_extend_tvals(tvals))
     else:
         popdata.interpolate(tvals)
-    for result in popdata.results:
-        for pop_name in popdata.pops:
-            data[(output_name, popdata.results[result], pop_labels[pop_name])] = popdata[result, pop_name, popdata.outputs[0]].vals
 
-    # Now do a population total. Need to check the units after any aggregations
+    keys = []
+    vals = []
+    for s in popdata.series[:n_pop_series]:
+        keys.append((output_name, popdata.results[s.result], pop_labels[s.pop]))
+        vals.append(s.vals)
+
+    # Need to check the units after any aggregations
     # Check results[0].model.pops[0].comps[0].units just in case someone changes it later on
-    if popdata.series[0].units in {FS.QUANTITY_TYPE_NUMBER, results[0].model.pops[0].comps[0].units}:
-        # Number units, can use summation
-        popdata = PlotData(results, outputs=output, pops={"total": pops}, pop_aggregation="sum")
-        if time_aggregate:
-            popdata.time_aggregate(_extend_tvals(tvals))
-        else:
-            popdata.interpolate(tvals)
-        for result in popdata.results:
-            data[(output_name, popdata.results[result], "Total (sum)")] = popdata[result, popdata.pops[0], popdata.outputs[0]].vals
-    elif popdata.series[0].units in {FS.QUANTITY_TYPE_FRACTION, FS.QUANTITY_TYPE_PROPORTION, FS.QUANTITY_TYPE_PROBABILITY}:
-        popdata = PlotData(results, outputs=output, pops={"total": pops}, pop_aggregation="weighted")
-        if time_aggregate:
-            popdata.time_aggregate(_extend_tvals(tvals))
-        else:
-            popdata.interpolate(tvals)
-        for result in popdata.results:
-            data[(output_name, popdata.results[result], "Total (weighted average)")] = popdata[result, popdata.pops[0], popdata.outputs[0]].vals
+    if popdata.series[0].units in number_units:
+        total_label = "Total (sum)"
+    elif popdata.series[0].units in fraction_units:
+        total_label = "Total (weighted average)"
     else:
-        for result in popdata.results:
-            data[(output_name, popdata.results[result], "Total (unknown units)")] = np.full(tvals.shape, np.nan)
+        total_label = "Total (unknown units)"
+    totals = popdata.series[n_pop_series:]
+    for i, result in enumerate(popdata.results):
+        keys.append((output_name, popdata.results[result], total_label))
+        vals.append(totals[i].vals if total_label != "Total (unknown units)" else np.full(tvals.shape, np.nan))
 
-    df = pd.DataFrame(data, index=tvals)
-    df = df.T
-    df.index = df.index.set_names(["output", "result", "pop"])  # Set the index names correctly so they can be reordered easily
-    return df
+    return _index_df(keys, vals, tvals, ["output", "result", "pop"])
 
 
-def _write_df(writer, formats, sheet_name, df, level_ordering):
+def _write_df(workbook, formats, sheet_name, df, level_ordering):
     """
     Write a list of DataFrames into a worksheet
 
-    :param writer: A Pandas ExcelWriter instance specifying the file to write into
-    :param formats: The output of `standard_formats(workbook)` specifying the styles embedded in the workbook
+    The layout matches ``DataFrame.to_excel()``, but the cells are written row by row so that the
+    workbook can be opened in constant memory mode. Because rows cannot be revisited in that mode,
+    repeated index labels are written once at the start of each group rather than as merged cells.
+
+    :param workbook: An xlsxwriter ``Workbook`` instance specifying the file to write into
+    :param formats: The output of `standard_formats(workbook)` specifying the styles embedded in the workbook, with an additional ``'index'``
+                    format for the table headers and index labels
     :param sheet_name: The name of the sheet to create. It is assumed that this sheet will be generated entirely by
                        this function call (i.e. the sheet is not already present)
     :param df: A DataFrame that has a MultiIndex
@@ -834,11 +937,11 @@ def _write_df(writer, formats, sheet_name, df, level_ordering):
         order[level] = list(dict.fromkeys(df.index.get_level_values(level)))
 
     required_width = [0] * (len(level_ordering) - 1)
+    n_levels = len(level_ordering) - 1
 
     row = 0
 
-    worksheet = writer.book.add_worksheet(sheet_name)
-    writer.sheets[sheet_name] = worksheet  # Need to add it to the ExcelWriter for it to behave properly
+    worksheet = workbook.add_worksheet(sheet_name)
 
     for title, table in df.groupby(level=level_ordering[0], sort=False):
         worksheet.write_string(row, 0, title, formats["center_bold"])
@@ -848,9 +951,33 @@ def _write_df(writer, formats, sheet_name, df, level_ordering):
         table = table.reorder_levels(level_ordering[1:])
         for i in range(1, len(level_ordering)):
             table = table.reindex(order[level_ordering[i]], level=i - 1)
-        table.index = table.index.set_names([level_substitutions[x] if x in level_substitutions else x.title() for x in table.index.names])
-        table.to_excel(writer, sheet_name, startcol=0, startrow=row)
-        row += table.shape[0] + 2
+
+        # Write the header row
+        for i, name in enumerate(table.index.names):
+            worksheet.write_string(row, i, level_substitutions[name] if name in level_substitutions else name.title(), formats["index"])
+        for i, t in enumerate(table.columns):
+            worksheet.write(row, n_levels + i, t, formats["index"])
+        row += 1
+
+        # Write the rows. An index label is only written if it starts a new group i.e., if it or any of the labels
+        # to its left differ from the previous row
+        values = table.values
+        finite = np.isfinite(values)
+        previous = (None,) * n_levels
+        for labels, row_vals, row_finite in zip(table.index, values.tolist(), finite.tolist()):
+            new_group = False
+            for i, label in enumerate(labels):
+                new_group = new_group or label != previous[i] or i == n_levels - 1
+                if new_group:
+                    worksheet.write(row, i, label, formats["index"])
+            previous = labels
+            for i, (val, is_finite) in enumerate(zip(row_vals, row_finite)):
+                if is_finite:
+                    worksheet.write_number(row, n_levels + i, val)
+                elif not np.isnan(val):
+                    worksheet.write_string(row, n_levels + i, "inf" if val > 0 else "-inf")  # Same representation as ``DataFrame.to_excel()``
+            row += 1
+        row += 1
 
         required_width[0] = max(required_width[0], len(title))
         for i in range(0, len(required_width)):
@@ -861,6 +988,610 @@ def _write_df(writer, formats, sheet_name, df, level_ordering):
             worksheet.set_column(i, i, required_width[i] * 1.1 + 1)
 
 
+_RAW_FIELDS = ["type", "pop", "name", "label"]  # Metadata stored for each raw output
+
+
+def _raw_format(filename) -> tuple:
+    # Return the output path and format for a raw results file. If the file name does not have a recognized extension, the
+    # format is selected based on which libraries are available
+    formats = {".parquet": "parquet", ".feather": "feather", ".h5": "hdf5", ".hdf5": "hdf5", ".npz": "npz"}
+    filename = Path(filename)
+    if filename.suffix.lower() in formats:
+        return filename.resolve(), formats[filename.suffix.lower()]
+
+    try:
+        import pyarrow
+
+        return filename.with_suffix(".parquet").resolve(), "parquet"
+    except ModuleNotFoundError:
+        pass
+
+    try:
+        import h5py
+
+        return filename.with_suffix(".h5").resolve(), "hdf5"
+    except ModuleNotFoundError:
+        pass
+
+    return filename.with_suffix(".npz").resolve(), "npz"
+
+
+def export_raw_results(results, filename, float32: bool = False) -> Path:
+    """
+    Save raw outputs in a binary format
+
+    This function saves the same raw outputs as :meth:`Result.export_raw` for one or more results, but writes them
+    to a binary file which is much faster to write and read than Excel. The format is selected based on the file extension
+
+    - ``.parquet`` or ``.feather`` - long-format tables with one row per time point for each output (requires ``pyarrow``)
+    - ``.h5`` or ``.hdf5`` - an HDF5 file with an array of values for each result (requires ``h5py``)
+    - ``.npz`` - a compressed NumPy archive with an array of values for each result
+
+    If the file name has no recognized extension, Parquet is used if ``pyarrow`` is installed, then HDF5 if ``h5py``
+    is installed, otherwise NPZ. Each output is stored together with the result name, population, variable type,
+    variable name, and label. The files can be loaded with :func:`load_raw_results`.
+
+    :param results: A :class:`Result`, or list of `Results`. Results must all have different names
+    :param filename: The file name to write
+    :param float32: If ``True``, store values in single precision to halve the file size
+    :return: The name of the file that was written
+
+    """
+
+    if isinstance(results, dict):
+        results = list(results.values())
+    else:
+        results = sc.promotetolist(results)
+
+    result_names = [x.name for x in results]
+    if len(set(result_names)) != len(result_names):
+        raise Exception("Results must have different names (in their result.name property)")
+
+    output_fname, fmt = _raw_format(filename)
+    dtype = np.float32 if float32 else np.float64
+
+    # Assemble a 2D array of values for each result, with the metadata for each row
+    tables = []
+    for result in results:
+        d = result._get_raw_outputs()
+        metadata = {field: [key[i] for key in d] for i, field in enumerate(_RAW_FIELDS)}
+        tables.append((result.name, result.t, metadata, np.array(list(d.values()), dtype=dtype).reshape(len(d), len(result.t))))
+
+    if fmt in {"parquet", "feather"}:
+        import pyarrow as pa
+
+        # Convert to long format. The string columns are stored as categoricals so that only their codes are repeated for each time point
+        n_t = np.concatenate([np.full(values.shape[0], len(t)) for _, t, _, values in tables])
+        df = {"result": [name for name, _, _, values in tables for _ in range(values.shape[0])]}
+        for field in _RAW_FIELDS:
+            df[field] = [x for _, _, metadata, _ in tables for x in metadata[field]]
+        for field, vals in df.items():
+            categories = pd.Categorical(vals)
+            df[field] = pd.Categorical.from_codes(np.repeat(categories.codes, n_t), dtype=categories.dtype)
+        df["t"] = np.concatenate([np.tile(t, values.shape[0]) for _, t, _, values in tables])
+        df["value"] = np.concatenate([values.ravel() for _, _, _, values in tables])
+        df = pd.DataFrame(df)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**table.schema.metadata, b"atomica_version": version.encode(), b"atomica_results": json.dumps(result_names).encode()})
+        if fmt == "parquet":
+            import pyarrow.parquet
+
+            pyarrow.parquet.write_table(table, output_fname)
+        else:
+            import pyarrow.feather
+
+            pyarrow.feather.write_feather(table, output_fname)
+
+    elif fmt == "hdf5":
+        import h5py
+
+        with h5py.File(output_fname, "w") as f:
+            f.attrs["atomica_version"] = version
+            for i, (name, t, metadata, values) in enumerate(tables):
+                group = f.create_group(str(i))
+                group.attrs["name"] = name
+                group.create_dataset("t", data=t)
+                group.create_dataset("values", data=values, compression="gzip")
+                for field in _RAW_FIELDS:
+                    group.create_dataset(field, data=np.array(metadata[field], dtype=h5py.string_dtype()))
+
+    else:
+        arrays = {"atomica_version": np.array(version), "results": np.array(result_names)}
+        for i, (name, t, metadata, values) in enumerate(tables):
+            arrays[f"{i}_t"] = t
+            arrays[f"{i}_values"] = values
+            for field in _RAW_FIELDS:
+                arrays[f"{i}_{field}"] = np.array(metadata[field])
+        np.savez_compressed(output_fname, **arrays)
+
+    logger.info('Saved raw results to "%s"', output_fname)
+    return output_fname
+
+
+def load_raw_results(filename) -> sc.odict:
+    """
+    Load raw outputs
+
+    This function loads a file written by :func:`export_raw_results`. Only the names of the results are read
+    initially - the values for each result are read from the file the first time they are accessed.
+
+    :param filename: The file name to load
+    :return: An odict of :class:`ResultView` instances keyed by result name
+
+    """
+
+    filename, fmt = _raw_format(filename)
+    if not filename.exists():
+        raise FileNotFoundError(f'Raw results file "{filename}" does not exist')
+
+    views = sc.odict()
+
+    if fmt in {"parquet", "feather"}:
+        import pyarrow.compute
+        import pyarrow.feather
+        import pyarrow.parquet
+
+        if fmt == "parquet":
+            schema = pyarrow.parquet.read_schema(filename)
+        else:
+            schema = pyarrow.feather.read_table(filename, memory_map=True).schema
+
+        def _loader(name):
+            def load():
+                if fmt == "parquet":
+                    df = pyarrow.parquet.read_table(filename, filters=[("result", "=", name)]).to_pandas()
+                else:
+                    table = pyarrow.feather.read_table(filename, memory_map=True)
+                    df = table.filter(pyarrow.compute.equal(table["result"], name)).to_pandas()
+                n_t = df["t"].nunique()
+                metadata = {field: df[field].values[::n_t].astype(str) for field in _RAW_FIELDS}
+                return df["t"].values[:n_t], metadata, df["value"].values.reshape(-1, n_t)
+
+            return load
+
+        for name in json.loads(schema.metadata[b"atomica_results"].decode()):
+            views[name] = ResultView(name, _loader(name))
+
+    elif fmt == "hdf5":
+        import h5py
+
+        def _loader(key):
+            def load():
+                with h5py.File(filename, "r") as f:
+                    group = f[key]
+                    return group["t"][()], {field: group[field].asstr()[()] for field in _RAW_FIELDS}, group["values"][()]
+
+            return load
+
+        with h5py.File(filename, "r") as f:
+            for key in sorted(f.keys(), key=int):
+                name = f[key].attrs["name"]
+                views[name] = ResultView(name, _loader(key))
+
+    else:
+
+        def _loader(i):
+            def load():
+                with np.load(filename) as data:
+                    return data[f"{i}_t"], {field: data[f"{i}_{field}"] for field in _RAW_FIELDS}, data[f"{i}_values"]
+
+            return load
+
+        with np.load(filename) as data:
+            for i, name in enumerate(data["results"]):
+                views[str(name)] = ResultView(str(name), _loader(i))
+
+    return views
+
+
+class ResultView:
+    """
+    Read-only view of raw outputs
+
+    Instances of this class are returned by :func:`load_raw_results`. The values are read from the file
+    when they are first accessed.
+
+    :param name: The name of the result
+    :param loader: A function that returns a tuple with the time values, a dict of metadata arrays, and a 2D array of values
+
+    """
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self._loader = loader
+        self._data = None
+
+    def __repr__(self):
+        return f'<ResultView "{self.name}">'
+
+    def _load(self) -> tuple:
+        if self._data is None:
+            t, metadata, values = self._loader()
+            t = np.array(t, dtype=float)
+            values = np.array(values)
+            t.flags.writeable = False
+            values.flags.writeable = False
+            metadata = pd.DataFrame(metadata, columns=_RAW_FIELDS)
+            lookup = {(pop, name): i for i, (pop, name) in enumerate(zip(metadata["pop"], metadata["name"]))}
+            self._data = (t, metadata, values, lookup)
+        return self._data
+
+    @property
+    def t(self) -> np.array:
+        """
+        Time values
+
+        :return: Read-only array of time values
+
+        """
+
+        return self._load()[0]
+
+    @property
+    def metadata(self) -> pd.DataFrame:
+        """
+        Metadata for each output
+
+        :return: A DataFrame with the variable type, population, variable name and label for each row of :attr:`values`
+
+        """
+
+        return self._load()[1]
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        Output values
+
+        :return: Read-only array with shape ``(n_outputs, n_t)``
+
+        """
+
+        return self._load()[2]
+
+    def __getitem__(self, key) -> np.array:
+        """
+        Return values for a single output
+
+        :param key: A tuple with ``(pop_name, variable_name)``
+        :return: Read-only array of values
+
+        """
+
+        _, _, values, lookup = self._load()
+        if key not in lookup:
+            raise NotFoundError(f'Output "{key[1]}" in population "{key[0]}" was not found in result "{self.name}"')
+        return values[lookup[key]]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Return outputs as a DataFrame
+
+        :return: A DataFrame in the same format as :meth:`Result.export_raw`
+
+        """
+
+        t, metadata, values, _ = self._load()
+        df = pd.DataFrame(values.T, index=t, columns=pd.MultiIndex.from_frame(metadata, names=[None] * len(_RAW_FIELDS)))
+        df.index.name = "Time"
+        return df
+
+
+def _interpolate_samples(tvec: np.array, vals: np.ndarray, year: float = None) -> np.array:
+    """
+    Interpolate sampled values onto a year
+
+    This is equivalent to calling :meth:`Series.interpolate` for the series in each sample, but
+    operates on all of the samples at once.
+
+    :param tvec: Array of time values
+    :param vals: Array of sampled values with shape ``(n_samples, n_t)``
+    :param year: If ``None``, return the values at the first time point, otherwise interpolate onto the target year
+    :return: Array with one value for each sample. If the year is out of bounds, the values will be ``NaN``
+
+    """
+
+    if year is None:
+        return vals[:, 0]
+    elif year < tvec[0] or year > tvec[-1]:
+        logger.warning("Series has values from %.2f to %.2f so requested time point %s is out of bounds", tvec[0], tvec[-1], year)
+        return np.full(vals.shape[0], np.nan)
+
+    idx = np.searchsorted(tvec, year)
+    if tvec[idx] == year:
+        return vals[:, idx]
+    w = (year - tvec[idx - 1]) / (tvec[idx] - tvec[idx - 1])
+    return vals[:, idx - 1] + w * (vals[:, idx] - vals[:, idx - 1])
+
+
+class StreamingStatistics:
+    """
+    Accumulate statistics for sampled time series
+
+    This class accumulates summary statistics for a quantity sampled at a fixed set of time points, without
+    storing the samples. The mean and variance are updated online using Welford's algorithm, and quantiles
+    are estimated using a merging t-digest for each time point. The t-digest uses the arcsine scale function,
+    so it is most accurate in the tails, and if the number of samples is small relative to the compression,
+    quantiles are computed exactly (matching ``np.quantile``).
+
+    Instances can be merged, so that statistics accumulated separately (e.g., on different workers or machines)
+    can be combined, with the mean and variance being combined exactly.
+
+    :param compression: Compression parameter for the t-digest. Each digest retains at most approximately ``compression`` centroids per time point
+
+    """
+
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self.n = 0  #: Number of samples added
+        self.mean = None  #: Mean value at each time point
+        self._m2 = None  # Sum of squared deviations from the mean
+        self.min = None  #: Minimum value at each time point
+        self.max = None  #: Maximum value at each time point
+        self._centroids = None  # List with a ``(means, weights)`` tuple of the t-digest centroids for each time point
+        self._buffer = []  # Samples that have not yet been merged into the centroids
+
+    def __repr__(self):
+        return sc.prepr(self)
+
+    @property
+    def std(self) -> np.array:
+        """
+        Return the standard deviation
+
+        :return: Array with the (population) standard deviation at each time point, consistent with ``np.std``
+
+        """
+
+        return np.sqrt(self._m2 / self.n)
+
+    def add(self, vals) -> None:
+        """
+        Add a sample
+
+        :param vals: An array of values, with one value for each time point
+
+        """
+
+        vals = np.array(vals, dtype=float).ravel()
+        if self.n == 0:
+            self.n = 1
+            self.mean = vals.copy()
+            self._m2 = np.zeros(vals.shape)
+            self.min = vals.copy()
+            self.max = vals.copy()
+            self._centroids = [(np.empty(0), np.empty(0)) for _ in vals]
+        else:
+            self.n += 1
+            delta = vals - self.mean
+            self.mean += delta / self.n
+            self._m2 += delta * (vals - self.mean)
+            self.min = np.minimum(self.min, vals)
+            self.max = np.maximum(self.max, vals)
+
+        self._buffer.append(vals)
+        if len(self._buffer) >= self.compression:
+            self._flush()
+
+    def merge(self, other) -> None:
+        """
+        Merge statistics from another instance
+
+        :param other: A :class:`StreamingStatistics` instance with the same time points
+
+        """
+
+        if other.n == 0:
+            return
+        elif self.n == 0:
+            self.__dict__.update(sc.dcp(other.__dict__))
+            return
+
+        other._flush()
+        self._flush()
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.n / n
+        self._m2 = self._m2 + other._m2 + delta**2 * self.n * other.n / n
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self._centroids = [self._compress(np.concatenate([a[0], b[0]]), np.concatenate([a[1], b[1]])) for a, b in zip(self._centroids, other._centroids)]
+
+    def quantile(self, q: float) -> np.array:
+        """
+        Estimate a quantile
+
+        :param q: Quantile to compute, between 0 and 1
+        :return: Array with the estimated quantile at each time point
+
+        """
+
+        self._flush()
+        out = np.empty(len(self._centroids))
+        for i, (means, weights) in enumerate(self._centroids):
+            # Each centroid is placed at the mean rank of the samples it contains, with the extreme values at the first and last rank
+            ranks = np.cumsum(weights) - (weights + 1) / 2
+            ranks = np.concatenate([[0], ranks, [self.n - 1]])
+            vals = np.concatenate([[self.min[i]], means, [self.max[i]]])
+            out[i] = np.interp(q * (self.n - 1), ranks, vals)
+        return out
+
+    def _flush(self) -> None:
+        # Merge any buffered samples into the centroids
+        if not self._buffer:
+            return
+        buffer = np.vstack(self._buffer)
+        self._buffer = []
+        self._centroids = [self._compress(np.concatenate([means, buffer[:, i]]), np.concatenate([weights, np.ones(buffer.shape[0])])) for i, (means, weights) in enumerate(self._centroids)]
+
+    def _compress(self, means: np.array, weights: np.array) -> tuple:
+        # Merge adjacent centroids that fall within the same unit interval of the arcsine scale function
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = np.floor(self.compression / np.pi * (np.arcsin(2 * q - 1) + np.pi / 2))
+        starts = np.flatnonzero(np.concatenate([[True], k[1:] != k[:-1]]))
+        merged_weights = np.add.reduceat(weights, starts)
+        merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+        return merged_means, merged_weights
+
+
+class SampleStore:
+    """
+    Disk-backed storage for Ensemble samples
+
+    This class stores the values from sampled :class:`PlotData` instances in a memory-mapped ``.npy`` file containing an
+    array with shape ``(n_samples, n_series, n_t)``, so that the samples do not need to be held in memory. The first
+    sample is retained as a template, providing the time values, units, and colors for each series. Only the values are
+    stored for subsequent samples, so all samples must contain the same series, with the same time points.
+
+    The store behaves like a list of :class:`PlotData` instances - appending a PlotData writes its values to the file,
+    and indexing returns a PlotData whose series values are views into the memory-mapped array. The values for a particular
+    series across all samples can be retrieved as a single array using :meth:`get_values`.
+
+    :param filename: The ``.npy`` file to store the samples in. Any existing file will be overwritten
+    :param capacity: Optionally specify the number of samples to preallocate space for. The file will be enlarged as required
+
+    """
+
+    def __init__(self, filename, capacity: int = None):
+        self.filename = str(filename)
+        self.capacity = capacity  #: The number of samples to allocate space for when the first sample is added
+        self.n = 0  #: The number of samples stored
+        self.template = None  #: The first :class:`PlotData` instance, used to reconstruct samples
+        self.index = None  #: A dict mapping ``(result,pop,output)`` to the series index in the stored array
+        self._array = None  # Memory-mapped array
+
+    def __repr__(self):
+        return sc.prepr(self)
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        d["_array"] = None  # The array will be reopened from the file when it is next accessed
+        return d
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self[i]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self.n))]
+        if idx < 0:
+            idx += self.n
+        if not 0 <= idx < self.n:
+            raise IndexError("Sample index out of range")
+        plotdata = copy.copy(self.template)
+        plotdata.series = [self._view(series, self.array[idx, j]) for j, series in enumerate(self.template.series)]
+        return plotdata
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        Return the memory-mapped array
+
+        :return: A memory-mapped array with shape ``(capacity, n_series, n_t)``. Only the first :attr:`n` rows contain samples
+
+        """
+
+        if self._array is None and self.template is not None:
+            self._array = np.lib.format.open_memmap(self.filename, mode="r+")
+        return self._array
+
+    def append(self, plotdata) -> None:
+        """
+        Add a sample
+
+        :param plotdata: A :class:`PlotData` instance, containing the same series as the first sample
+
+        """
+
+        if self.template is None:
+            self.template = plotdata
+            self.index = {(x.result, x.pop, x.output): j for j, x in enumerate(plotdata.series)}
+            self._allocate(max(self.capacity or 0, 16))
+        elif self.n == self.array.shape[0]:
+            self._allocate(2 * self.n)
+
+        if len(plotdata.series) != len(self.index):
+            raise Exception("All samples must contain the same series")
+        for series in plotdata.series:
+            key = (series.result, series.pop, series.output)
+            if key not in self.index:
+                raise Exception("Series %s-%s-%s is not present in the first sample" % key)
+            self.array[self.n, self.index[key]] = series.vals
+        self.n += 1
+
+    def clear(self) -> None:
+        """
+        Remove all samples
+
+        The file will be overwritten when the next sample is added.
+
+        """
+
+        self.n = 0
+        self.template = None
+        self.index = None
+        self._array = None
+
+    def get_values(self, key: tuple) -> np.ndarray:
+        """
+        Return values for a series
+
+        :param key: A ``(result,pop,output)`` tuple
+        :return: A read-only memory-mapped array with shape ``(n_samples, n_t)``
+
+        """
+
+        vals = self.array[: self.n, self.index[key]]
+        vals.flags.writeable = False
+        return vals
+
+    def get_series(self, key: tuple) -> list:
+        """
+        Return series for all samples
+
+        :param key: A ``(result,pop,output)`` tuple
+        :return: A list of :class:`Series` instances, one for each sample, whose values are views into the memory-mapped array
+
+        """
+
+        template = self.template.series[self.index[key]]
+        return [self._view(template, vals) for vals in self.get_values(key)]
+
+    def flush(self) -> None:
+        # Write any changes to disk
+        if self._array is not None:
+            self._array.flush()
+
+    def _allocate(self, capacity: int) -> None:
+        # Create the file with space for the specified number of samples, copying any existing samples
+        old_array = self._array
+        shape = (capacity, len(self.template.series), len(self.template.series[0].vals))
+        self._array = np.lib.format.open_memmap(self.filename + ".tmp", mode="w+", dtype=float, shape=shape)
+        if old_array is not None:
+            self._array[: self.n] = old_array[: self.n]
+        self._array.flush()
+        del old_array
+        os.replace(self.filename + ".tmp", self.filename)
+
+    @staticmethod
+    def _view(series, vals):
+        # Return a copy of the series with the values replaced
+        series = copy.copy(series)
+        series.vals = vals
+        return series
+
+
 class Ensemble(NamedItem):
     """
     Class for working with sampled Results
@@ -874,24 +1605,40 @@ class Ensemble(NamedItem):
     - A reduction function that maps from Results^N => R^M where typically M would
       index
 
+    If a ``store`` is specified, the samples are written to a memory-mapped file as they are added, so that large numbers of samples
+    can be retained without holding them in memory. All methods remain available in this case.
+
+    If ``streaming=True``, the samples are not retained. Instead, each sample is folded into a :class:`StreamingStatistics`
+    instance for each result, pop, and output as soon as it is added, so the memory required does not depend on the number
+    of samples. In this mode, :meth:`plot_series`, :meth:`plot_bars` and :meth:`summary_statistics` are computed from the
+    accumulated statistics, while methods that require the individual samples (e.g., :meth:`plot_distribution`) are unavailable.
+
     :param mapping_function: A function that takes in a Result, or a list/dict of Results, and returns a single PlotData instance
     :param name: Name for the Ensemble (will appear on plots)
     :param baseline: Optionally provide the non-sampled results at instantiation
+    :param streaming: If True, accumulate summary statistics instead of storing the samples
+    :param store: Optionally specify a ``.npy`` file name to store the samples on disk in a :class:`SampleStore` rather than in memory
     :param kwargs: Additional arguments to pass to the mapping function
 
     """
 
-    def __init__(self, mapping_function=None, name: str = None, baseline_results=None, **kwargs):
+    def __init__(self, mapping_function=None, name: str = None, baseline_results=None, streaming: bool = False, store=None, **kwargs):
+
+        assert not (streaming and store), "A streaming Ensemble does not store samples"
 
         NamedItem.__init__(self, name)
         self.mapping_function = mapping_function  #: This function gets called by :meth:`Ensemble.add_sample`
-        self.samples = []  #: A list of :class:`PlotData` instances, one for each sample
+        self.samples = SampleStore(store) if store is not None else []  #: A list of :class:`PlotData` instances, one for each sample (or a :class:`SampleStore`)
         self.baseline = None  #: A single PlotData instance with reference values (i.e. outcome without sampling)
+        self.streaming = streaming  #: If True, samples are folded into :attr:`statistics` rather than being stored
+        self.statistics = dict()  #: If streaming, a dict keyed by ``(result,pop,output)`` with a :class:`StreamingStatistics` instance for each quantity
+        self._template = None  # If streaming, the first sample is retained to provide the time values, units and colors
+        self._values = None  # Cached arrays of sampled values - see `Ensemble._get_values()`
 
         if baseline_results:
             self.set_baseline(baseline_results, **kwargs)
 
-    def run_sims(self, proj, parset, progset=None, progset_instructions=None, result_names=None, n_samples: int = 1, parallel=False, max_attempts=None) -> None:
+    def run_sims(self, proj, parset, progset=None, progset_instructions=None, result_names=None, n_samples: int = 1, parallel=False, max_attempts=None, sampling=None, seed=None, num_workers=None, checkpoint: str = None, resume: bool = False) -> None:
         """
         Run and store sampled simulations
 
@@ -901,9 +1648,10 @@ class Ensemble(NamedItem):
         taken in by the mapping function (typically this would either be 1, or the number of
         budget scenarios being compared).
 
-        Note that a separate function, `_sample_and_map` is used, which does the conversion to
-        ``PlotData``. This is so that the data reduction is performed on the parallel workers
+        Note that the mapping function is applied to each sample's results on the worker that ran the
+        sample. This is so that the data reduction is performed on the parallel workers
         so that ``Multiprocessing`` only accumulates ``PlotData`` rather than ``Result`` instances.
+        The project is sent to each parallel worker once, rather than with every sample.
 
         :param proj: A :class:`Project` instance
         :param n_samples: An integer number of samples
@@ -915,33 +1663,65 @@ class Ensemble(NamedItem):
                              containing a single element if not using programs.
         :param parallel: If True, run simulations in parallel (on Windows, must have ``if __name__ == '__main__'`` gating the calling code)
         :param max_attempts: Number of retry attempts for bad initializations
+        :param sampling: Optionally specify a sampling method or design matrix (see :meth:`Project.run_sampled_sims`)
+        :param seed: Optionally specify a seed for the sampling design (see :meth:`Project.run_sampled_sims`)
+        :param num_workers: If ``parallel`` is True, this determines the number of parallel workers to use (default is usually number of CPUs)
+        :param checkpoint: Optionally specify a file name prefix for checkpoint files. The mapped output for each sample is saved as soon as
+                           it is complete (see :meth:`Project.run_sampled_sims`)
+        :param resume: If ``True``, load completed samples from the checkpoint and only run the missing samples
 
         """
 
-        self.samples = []  # Drop the old samples
+        from .project import _get_sampling_inputs, _get_sampling_plan, _load_completed_samples, _run_planned_sample, _sampling_worker, _sampling_worker_init  # avoid circular import
+
+        self._clear_samples()  # Drop the old samples
+        if isinstance(self.samples, SampleStore):
+            self.samples.capacity = n_samples
+
+        parset, progset, progset_instructions, result_names = _get_sampling_inputs(proj, parset, progset, progset_instructions, result_names)
+        samples = _get_sampling_plan(parset, progset, n_samples, sampling, seed, checkpoint, resume)
+        completed = _load_completed_samples(samples) if resume else {}
+        pending = [i for i in range(n_samples) if i not in completed]
+
+        def add_completed():
+            # Add samples as soon as they are available, so that the samples are not all held in memory if streaming or using a SampleStore
+            if self.streaming:
+                for i in list(completed):
+                    self._add_sample(completed.pop(i))
+            else:
+                while self.n_samples in completed:  # Samples must be added in order
+                    self._add_sample(completed.pop(self.n_samples))
+
+        def store(i, plotdata):
+            completed[i] = plotdata
+            add_completed()
 
-        if parallel:
+        add_completed()  # Add any samples loaded from the checkpoint
+
+        args = {"mapping_function": self.mapping_function, "proj": proj, "parset": parset, "progset": progset, "progset_instructions": progset_instructions, "result_names": result_names, "max_attempts": max_attempts}
+        original_level = logger.getEffectiveLevel()
+
+        if parallel and pending:
             # NB. The calling code must be wrapped in a 'if __name__ == '__main__'
-            # Currently not passing in any extra kwargs but that should be easy to add if/when required
-            # (main reason for deferring implementation is so as to have suitable test code when developing)
-            self.samples = sc.parallelize(_sample_and_map, iterarg=n_samples, kwargs={"mapping_function": self.mapping_function, "max_attempts": max_attempts, "proj": proj, "parset": parset, "progset": progset, "progset_instructions": progset_instructions, "result_names": result_names})
+            parallel_progress(_sampling_worker, [samples[i] for i in pending], num_workers=num_workers, show_progress=original_level <= logging.INFO, initializer=_sampling_worker_init, initargs=(args,), callback=lambda idx, plotdata: store(pending[idx], plotdata))
         else:
-            original_level = logger.getEffectiveLevel()
-            logger.setLevel(logging.WARNING)  # Never print debug messages inside the sampling loop - note that depending on the platform, this may apply within `sc.parallelize`
+            logger.setLevel(logging.WARNING)  # Never print debug messages inside the sampling loop
 
             if original_level <= logging.INFO:
-                range_iterator = tqdm.trange(n_samples)
+                range_iterator = tqdm.tqdm(pending)
             else:
-                range_iterator = range(n_samples)
+                range_iterator = pending
 
-            for _ in range_iterator:
-                sample = _sample_and_map(mapping_function=self.mapping_function, proj=proj, parset=parset, progset=progset, progset_instructions=progset_instructions, result_names=result_names, max_attempts=max_attempts)
-                self.samples.append(sample)
+            for i in range_iterator:
+                store(i, _run_planned_sample(samples[i], **args))
 
             logger.setLevel(original_level)  # Reset the logger
 
-        # Finally, set the colours for the first sample
-        self.samples[0].set_colors(pops=self.samples[0].pops, outputs=self.samples[0].outputs)
+        if isinstance(self.samples, SampleStore):
+            self.samples.flush()
+
+        if self.n_samples != n_samples:
+            raise Exception("Only %d of %d samples were completed" % (self.n_samples, n_samples))
 
     @property
     def n_samples(self) -> int:
@@ -952,8 +1732,19 @@ class Ensemble(NamedItem):
 
         """
 
+        if self.streaming:
+            return next(iter(self.statistics.values())).n if self.statistics else 0
         return len(self.samples)
 
+    @property
+    def _first_sample(self):
+        # Return the first sample, which is used to look up the outputs, pops, time values, units and colors
+        if isinstance(self.samples, SampleStore):
+            return self.samples.template
+        elif self.samples:
+            return self.samples[0]
+        return self._template
+
     @property
     def outputs(self) -> list:
         """
@@ -969,8 +1760,8 @@ class Ensemble(NamedItem):
         :return: A list of outputs (strings)
 
         """
-        if self.samples:
-            return list(self.samples[0].outputs.keys())
+        if self._first_sample is not None:
+            return list(self._first_sample.outputs.keys())
         elif self.baseline:
             return list(self.baseline.outputs.keys())
         else:
@@ -988,8 +1779,8 @@ class Ensemble(NamedItem):
 
         """
 
-        if self.samples:
-            return self.samples[0].series[0].tvec
+        if self._first_sample is not None:
+            return self._first_sample.series[0].tvec
         elif self.baseline:
             return self.baseline[0].series[0].tvec
         else:
@@ -1010,8 +1801,8 @@ class Ensemble(NamedItem):
         :return: A list of population names (strings)
 
         """
-        if self.samples:
-            return list(self.samples[0].pops.keys())
+        if self._first_sample is not None:
+            return list(self._first_sample.pops.keys())
         elif self.baseline:
             return list(self.baseline.pops.keys())
         else:
@@ -1032,8 +1823,8 @@ class Ensemble(NamedItem):
         :return: A list of population names (strings)
 
         """
-        if self.samples:
-            return list(self.samples[0].results.keys())
+        if self._first_sample is not None:
+            return list(self._first_sample.results.keys())
         elif self.baseline:
             return list(self.baseline.results.keys())
         else:
@@ -1054,12 +1845,60 @@ class Ensemble(NamedItem):
 
         """
 
+        if self.streaming:
+            raise Exception("Individual samples are not retained by an Ensemble with streaming=True")
+        elif isinstance(self.samples, SampleStore):
+            return sc.odict({key: self.samples.get_series(key) for key in self.samples.index})
+
         series_lookup = defaultdict(list)
         for sample in self.samples:
             for series in sample.series:
                 series_lookup[(series.result, series.pop, series.output)].append(series)
         return sc.odict(series_lookup)
 
+    def _get_values(self, result: str, pop: str, output: str) -> np.ndarray:
+        """
+        Return sampled values as an array
+
+        Statistics over samples are computed from a 2D array of values for each quantity. These arrays are
+        assembled for all quantities in a single pass over the samples, and are then cached until the samples
+        change. If the samples are in a :class:`SampleStore`, the array is read directly from the store.
+
+        :param result: Result name
+        :param pop: Population name
+        :param output: Output name
+        :return: Array of values with shape ``(n_samples, n_t)``. This array should not be modified
+
+        """
+
+        if self.streaming:
+            raise Exception("Individual samples are not retained by an Ensemble with streaming=True")
+        elif isinstance(self.samples, SampleStore):
+            return self.samples.get_values((result, pop, output))
+
+        if self._values is None or self._values[0] != len(self.samples):
+            values = defaultdict(list)
+            for sample in self.samples:
+                for series in sample.series:
+                    values[(series.result, series.pop, series.output)].append(series.vals)
+            self._values = (len(self.samples), {key: np.vstack(vals) for key, vals in values.items()})
+
+        return self._values[1][result, pop, output]
+
+    def _get_year_values(self, result: str, pop: str, output: str, year: float = None) -> np.ndarray:
+        """
+        Return sampled values for a single year
+
+        :param result: Result name
+        :param pop: Population name
+        :param output: Output name
+        :param year: If ``None``, return values for the first time point, otherwise interpolate onto the target year
+        :return: Array with one value for each sample
+
+        """
+
+        return _interpolate_samples(self._first_sample[result, pop, output].tvec, self._get_values(result, pop, output), year)
+
     def set_baseline(self, results, **kwargs) -> None:
         """
         Add a baseline to the Ensemble
@@ -1098,10 +1937,86 @@ class Ensemble(NamedItem):
         plotdata = self.mapping_function(results, **kwargs)
         assert isinstance(plotdata, PlotData)  # Make sure the mapping function returns the correct type
         # assert len(plotdata.results) == 1, 'The mapping function must return a PlotData instance with only one Result'
-        if not self.samples:
+        self._add_sample(plotdata)
+
+    def _add_sample(self, plotdata) -> None:
+        """
+        Store a mapped sample
+
+        If the Ensemble is streaming, the sample is added to the accumulated statistics and then discarded. Otherwise,
+        the sample is appended to :attr:`samples`.
+
+        :param plotdata: A :class:`PlotData` instance returned by the mapping function
+
+        """
+
+        if self._first_sample is None:
             # Set the colors on the first PlotData to be added - for performance, only do this for the first sample
             plotdata.set_colors(pops=plotdata.pops, outputs=plotdata.outputs)
-        self.samples.append(plotdata)
+
+        if not self.streaming:
+            self.samples.append(plotdata)
+            self._values = None
+            return
+
+        if self._template is None:
+            self._template = plotdata
+        for series in plotdata.series:
+            key = (series.result, series.pop, series.output)
+            if key not in self.statistics:
+                self.statistics[key] = StreamingStatistics()
+            self.statistics[key].add(series.vals)
+
+    def _clear_samples(self) -> None:
+        # Remove all samples and accumulated statistics
+        if isinstance(self.samples, SampleStore):
+            self.samples.clear()
+        else:
+            self.samples = []
+        self.statistics = dict()
+        self._template = None
+        self._values = None
+
+    def merge(self, other) -> None:
+        """
+        Merge samples from another Ensemble
+
+        This method combines the samples from another Ensemble with the same mapping function into this Ensemble.
+        If the Ensembles are streaming, the accumulated statistics are merged, so Ensembles that were run separately
+        (e.g., on different machines) can be combined without transferring the individual samples.
+
+        :param other: An :class:`Ensemble` instance with the same value of ``streaming``
+
+        """
+
+        if self.streaming != other.streaming:
+            raise Exception("Cannot merge a streaming Ensemble with an Ensemble that stores samples")
+
+        if not self.streaming:
+            for plotdata in other.samples:
+                self._add_sample(plotdata)
+            return
+
+        if self._template is None and other._template is not None:
+            self._template = sc.dcp(other._template)
+        for key, statistics in other.statistics.items():
+            if key in self.statistics:
+                self.statistics[key].merge(statistics)
+            else:
+                self.statistics[key] = sc.dcp(statistics)
+
+    def _check_samples(self, require_samples: bool = False) -> None:
+        """
+        Check that samples are available for plotting
+
+        :param require_samples: If True, the individual samples are required, so an error will be raised if the Ensemble is streaming
+
+        """
+
+        if require_samples and self.streaming:
+            raise Exception("This method requires the individual samples, which are not retained by an Ensemble with streaming=True")
+        if not self.n_samples:
+            raise Exception("Cannot plot samples because no samples have been added yet")
 
     def update(self, result_list, **kwargs) -> None:
         """
@@ -1126,6 +2041,32 @@ class Ensemble(NamedItem):
         for sample in result_list:
             self.add(sample, **kwargs)
 
+    def _interpolate_statistics(self, result: str, pop: str, output: str, year: float, quantities: list) -> list:
+        """
+        Return accumulated statistics for a single year
+
+        If the year does not correspond to a time point in the Ensemble, the statistics are linearly interpolated
+        between the time points. This is exact for the mean, and an approximation for the other quantities.
+
+        :param result: Result name
+        :param pop: Population name
+        :param output: Output name
+        :param year: The year to return values for. If ``None``, the first time point will be used
+        :param quantities: A list of quantities - supported values are 'mean', 'std', 'median', 'max', 'min', 'Q1', and 'Q3'
+        :return: A list of values, one for each quantity
+
+        """
+
+        statistics = self.statistics[result, pop, output]
+        lookup = {"mean": lambda: statistics.mean, "std": lambda: statistics.std, "median": lambda: statistics.quantile(0.5), "max": lambda: statistics.max, "min": lambda: statistics.min, "Q1": lambda: statistics.quantile(0.25), "Q3": lambda: statistics.quantile(0.75)}
+        tvec = self._template[result, pop, output].tvec
+
+        values = []
+        for quantity in quantities:
+            vals = lookup[quantity]()
+            values.append(vals[0] if year is None else np.interp(year, tvec, vals, left=np.nan, right=np.nan))
+        return values
+
     def plot_distribution(self, year: float = None, fig=None, results=None, outputs=None, pops=None):
         """
         Plot a kernel density distribution
@@ -1148,8 +2089,7 @@ class Ensemble(NamedItem):
 
         """
 
-        if not self.samples:
-            raise Exception("Cannot plot samples because no samples have been added yet")
+        self._check_samples(require_samples=True)
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
@@ -1158,18 +2098,12 @@ class Ensemble(NamedItem):
             fig = plt.figure()
         ax = plt.gca()
 
-        series_lookup = self._get_series()
-
         for result in results:
             for output in outputs:
                 for pop in pops:
                     # Assemble the outputs
-                    if year is None:
-                        vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
-                    else:
-                        vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
+                    vals = self._get_year_values(result, pop, output, year)
 
-                    # color = series_lookup[output,pop][0].color
                     value_range = (vals.min(), vals.max())
 
                     if value_range[0] == value_range[1]:
@@ -1189,7 +2123,7 @@ class Ensemble(NamedItem):
                         val = series.vals[0] if year is None else series.interpolate(year)
                         plt.axvline(val, color=color, linestyle="dashed")
 
-                    proposed_label = "%s (%s)" % (output, series_lookup[result, pop, output][0].unit_string)
+                    proposed_label = "%s (%s)" % (output, self._first_sample[result, pop, output].unit_string)
                     if ax.xaxis.get_label().get_text():
                         assert proposed_label == ax.xaxis.get_label().get_text(), "The outputs being superimposed have different units"
                     else:
@@ -1216,8 +2150,7 @@ class Ensemble(NamedItem):
 
         assert style in {"samples", "quartile", "ci", "std"}
 
-        if not self.samples:
-            raise Exception("Cannot plot samples because no samples have been added yet")
+        self._check_samples(require_samples=style == "samples")
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
@@ -1226,34 +2159,36 @@ class Ensemble(NamedItem):
             fig = plt.figure()
         ax = plt.gca()
 
-        series_lookup = self._get_series()
-
         for result in results:
             for output in outputs:
                 for pop in pops:
 
-                    these_series = series_lookup[result, pop, output]
-                    vals = np.vstack([x.vals.ravel() for x in these_series])  # Turn samples into a matrix
+                    these_series = [self._first_sample[result, pop, output]]
+                    if self.streaming:
+                        statistics = self.statistics[result, pop, output]
+                        mean, std, quantile = statistics.mean, statistics.std, statistics.quantile
+                    else:
+                        vals = self._get_values(result, pop, output)
+                        mean, std, quantile = np.mean(vals, axis=0), np.std(vals, axis=0), lambda q: np.quantile(vals, q, axis=0)
 
                     if self.baseline:
                         baseline_series = self.baseline[result, pop, output]
                         plt.plot(baseline_series.tvec, baseline_series.vals, color=baseline_series.color, label="%s: %s-%s-%s (baseline)" % (self.name, result, pop, output))[0]
                     else:
-                        plt.plot(these_series[0].tvec, np.mean(vals, axis=0), color=these_series[0].color, linestyle="dashed", label="%s: %s-%s-%s (mean)" % (self.name, result, pop, output))[0]
+                        plt.plot(these_series[0].tvec, mean, color=these_series[0].color, linestyle="dashed", label="%s: %s-%s-%s (mean)" % (self.name, result, pop, output))[0]
 
                     if style == "samples":
-                        for series in these_series:
-                            plt.plot(series.tvec, series.vals, color=series.color, alpha=0.05)
+                        plt.plot(these_series[0].tvec, vals.T, color=these_series[0].color, alpha=0.05)
 
                     elif style == "quartile":
-                        ax.fill_between(these_series[0].tvec, np.quantile(vals, 0.25, axis=0), np.quantile(vals, 0.75, axis=0), alpha=0.15, color=these_series[0].color)
+                        ax.fill_between(these_series[0].tvec, quantile(0.25), quantile(0.75), alpha=0.15, color=these_series[0].color)
                     elif style == "ci":
-                        ax.fill_between(these_series[0].tvec, np.quantile(vals, 0.025, axis=0), np.quantile(vals, 0.975, axis=0), alpha=0.15, color=these_series[0].color)
+                        ax.fill_between(these_series[0].tvec, quantile(0.025), quantile(0.975), alpha=0.15, color=these_series[0].color)
                     elif style == "std":
                         if self.baseline:
-                            ax.fill_between(baseline_series.tvec, baseline_series.vals - np.std(vals, axis=0), baseline_series.vals + np.std(vals, axis=0), alpha=0.15, color=baseline_series.color)
+                            ax.fill_between(baseline_series.tvec, baseline_series.vals - std, baseline_series.vals + std, alpha=0.15, color=baseline_series.color)
                         else:
-                            ax.fill_between(these_series[0].tvec, np.mean(vals, axis=0) - np.std(vals, axis=0), np.mean(vals, axis=0) + np.std(vals, axis=0), alpha=0.15, color=these_series[0].color)
+                            ax.fill_between(these_series[0].tvec, mean - std, mean + std, alpha=0.15, color=these_series[0].color)
                     else:
                         raise Exception("Unknown style")
 
@@ -1293,8 +2228,7 @@ class Ensemble(NamedItem):
 
         """
 
-        if not self.samples:
-            raise Exception("Cannot plot samples because no samples have been added yet")
+        self._check_samples()
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
@@ -1313,9 +2247,7 @@ class Ensemble(NamedItem):
             else:
                 offset = np.floor(max(ax.get_xlim())) + 1
 
-        series_lookup = self._get_series()
-
-        x = []
+        sample_errors = []
         baselines = []
         labels = []
 
@@ -1323,26 +2255,28 @@ class Ensemble(NamedItem):
         for year, result, output, pop in nested_loop([years, results, outputs, pops], map(base_order.index, order)):
 
             if year is None:
-                vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
-                year_val = series_lookup[result, pop, output][0].tvec[0]
+                year_val = self._first_sample[result, pop, output].tvec[0]
                 labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year_val))
             else:
-                vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
                 labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year))
 
+            if self.streaming:
+                mean, std = self._interpolate_statistics(result, pop, output, year, ["mean", "std"])
+            else:
+                vals = self._get_year_values(result, pop, output, year)
+                mean, std = np.mean(vals), np.std(vals)
+
             if self.baseline:
                 if year is None:
                     baselines.append(self.baseline[result, pop, output].vals[0])
                 else:
                     baselines.append(self.baseline[result, pop, output].interpolate(year)[0])
             else:
-                baselines.append(np.mean(vals))
+                baselines.append(mean)
 
-            x.append(vals.ravel())
+            sample_errors.append(std)
 
-        locations = offset + np.arange(len(x))
-        sample_array = np.vstack(x).T
-        sample_errors = np.std(sample_array, axis=0)
+        locations = offset + np.arange(len(sample_errors))
 
         for location, baseline, error, label in zip(locations, baselines, sample_errors, labels):
             if horizontal:
@@ -1352,7 +2286,7 @@ class Ensemble(NamedItem):
 
         ax.legend()
 
-        proposed_label = "%s (%s)" % (output, series_lookup[result, pop, output][0].unit_string)
+        proposed_label = "%s (%s)" % (output, self._first_sample[result, pop, output].unit_string)
 
         if horizontal:
             ax.set_ylim(-0.5, locations[-1] + 0.5)
@@ -1390,8 +2324,7 @@ class Ensemble(NamedItem):
 
         """
 
-        if not self.samples:
-            raise Exception("Cannot plot samples because no samples have been added yet")
+        self._check_samples(require_samples=True)
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
@@ -1407,8 +2340,6 @@ class Ensemble(NamedItem):
             ax = fig.axes[0]
             offset = len(ax.get_xticks())
 
-        series_lookup = self._get_series()
-
         x = []
         baseline = []
         labels = []
@@ -1423,14 +2354,13 @@ class Ensemble(NamedItem):
                             else:
                                 baseline.append(self.baseline[result, pop, output].interpolate(year)[0])
 
+                        vals = self._get_year_values(result, pop, output, year)
                         if year is None:
-                            vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
-                            year_val = series_lookup[result, pop, output][0].tvec[0]
+                            year_val = self._first_sample[result, pop, output].tvec[0]
                             labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year_val))
                         else:
-                            vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
                             labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year))
-                        x.append(vals.ravel())
+                        x.append(vals)
 
         locations = offset + np.arange(len(x))
 
@@ -1451,7 +2381,7 @@ class Ensemble(NamedItem):
             ax.set_xticks(np.arange(locations[-1] + 1))
             ax.set_xticklabels(new_labels)
 
-        proposed_label = "%s (%s)" % (output, series_lookup[result, pop, output][0].unit_string)
+        proposed_label = "%s (%s)" % (output, self._first_sample[result, pop, output].unit_string)
         if ax.yaxis.get_label().get_text():
             assert proposed_label == ax.yaxis.get_label().get_text(), "The outputs being superimposed have different units"
         else:
@@ -1460,8 +2390,7 @@ class Ensemble(NamedItem):
         return fig
 
     def summary_statistics(self, years=None, results=None, outputs=None, pops=None):
-        if not self.samples:
-            raise Exception("Cannot plot samples because no samples have been added yet")
+        self._check_samples()
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
@@ -1470,7 +2399,6 @@ class Ensemble(NamedItem):
         else:
             years = sc.promotetolist(years)
 
-        series_lookup = self._get_series()
         records = list()
 
         for year in years:
@@ -1485,17 +2413,15 @@ class Ensemble(NamedItem):
                                 baseline = self.baseline[result, pop, output].interpolate(year)[0]
                             records.append((year, result, output, pop, "baseline", baseline))
 
-                        if year is None:
-                            vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
+                        quantities = ["mean", "median", "max", "min", "Q1", "Q3"]
+                        if self.streaming:
+                            values = self._interpolate_statistics(result, pop, output, year, quantities)
                         else:
-                            vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
+                            vals = self._get_year_values(result, pop, output, year)
+                            values = [np.mean(vals), np.median(vals), np.max(vals), np.min(vals), np.quantile(vals, 0.25), np.quantile(vals, 0.75)]
 
-                        records.append((year, result, output, pop, "mean", np.mean(vals)))
-                        records.append((year, result, output, pop, "median", np.median(vals)))
-                        records.append((year, result, output, pop, "max", np.max(vals)))
-                        records.append((year, result, output, pop, "min", np.min(vals)))
-                        records.append((year, result, output, pop, "Q1", np.quantile(vals, 0.25)))
-                        records.append((year, result, output, pop, "Q3", np.quantile(vals, 0.75)))
+                        for quantity, value in zip(quantities, values):
+                            records.append((year, result, output, pop, quantity, value))
 
                 df = pd.DataFrame.from_records(records, columns=["year", "result", "output", "pop", "quantity", "value"])
                 df = df.set_index(["year", "result", "output", "pop", "quantity"])
@@ -1510,13 +2436,10 @@ class Ensemble(NamedItem):
         # One plot for each population
         # Different colours for each result
 
-        if not self.samples:
-            raise Exception("Cannot plot samples because no samples have been added yet")
+        self._check_samples(require_samples=True)
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
 
-        series_lookup = self._get_series()
-
         figs = []
 
         # Put all the values in a DataFrame
@@ -1526,7 +2449,7 @@ class Ensemble(NamedItem):
                 df_dict = dict()
                 # Construct a dataframe with all of the outputs, with categorical results
                 for output in self.outputs:
-                    df_dict[output] = [x.vals[0] for x in series_lookup[result, pop, output]]
+                    df_dict[output] = self._get_values(result, pop, output)[:, 0]
                 df = pd.DataFrame.from_dict(df_dict)
                 df["result"] = result
                 dfs.append(df)
@@ -1541,24 +2464,3 @@ class Ensemble(NamedItem):
 
             figs.append(fig)
         return figs
-
-
-def _sample_and_map(proj, parset, progset, progset_instructions, result_names, mapping_function, max_attempts, **kwargs):
-    """
-    Helper function to sample
-
-    This function runs a sampled simulation and also calls an Ensemble's mapping
-    function prior to returning. This means that the Result goes out of scope and
-    is discarded. Used when performing parallel simulations via `Ensemble.run_sims()`
-    (which is used for memory-constrained simulations)
-
-    """
-
-    # First, get a single sample (could have multiple results if multiple instructions)
-    results = proj.run_sampled_sims(n_samples=1, parset=parset, progset=progset, progset_instructions=progset_instructions, result_names=result_names, max_attempts=max_attempts)
-
-    # Then convert it to a plotdata via the mapping function
-    plotdata = mapping_function(results[0], **kwargs)
-
-    # Finally, return the plotdata instead of the result
-    return plotdata
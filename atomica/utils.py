@@ -4,19 +4,25 @@ Define utility classes used throughout Atomica
 """
 
 import ast
+import hashlib
 import inspect
 import itertools
 import logging
 import os
+import pickle
 import re
+import sys
 import time
+import types
 import zlib
 from bisect import bisect_right, bisect_left
+from collections import OrderedDict
 from datetime import datetime
 from functools import partial
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
 import scipy.interpolate
 from tqdm import tqdm
 
@@ -35,6 +41,10 @@ __all__ = [
     "fast_gitinfo",
     "datetime_to_year",
     "parallel_progress",
+    "sample_design",
+    "DesignStream",
+    "hash_content",
+    "SimulationCache",
     "start_logging",
     "stop_logging",
 ]
@@ -588,7 +598,7 @@ class TimeSeries:
         interpolator = method(t1, v1, **kwargs)
         return interpolator(t2)
 
-    def sample(self, constant=True):
+    def sample(self, constant=True, rng=None):
         """
         Return a sampled copy of the TimeSeries
 
@@ -597,6 +607,8 @@ class TimeSeries:
 
         :param constant: If True, time series will be perturbed by a single constant offset. If False,
                          an different perturbation will be applied to each time specific value independently.
+        :param rng: Optionally specify an object with a ``standard_normal()`` method to draw the perturbations from, such as
+                    a ``np.random.Generator`` or a :class:`DesignStream`. By default, the global NumPy random number generator is used
         :return: A copied ``TimeSeries`` with perturbed values
 
         """
@@ -606,7 +618,7 @@ class TimeSeries:
 
         new = self.copy()
         if self.sigma is not None:
-            delta = self.sigma * np.random.randn(1)[0]
+            delta = self.sigma * (np.random.randn(1)[0] if rng is None else rng.standard_normal())
             if self.assumption is not None:
                 new.assumption += delta
 
@@ -615,7 +627,7 @@ class TimeSeries:
                 new.vals = [v + delta for v in new.vals]
             else:
                 # Sample again for each data point
-                for i, (v, delta) in enumerate(zip(new.vals, self.sigma * np.random.randn(len(new.vals)))):
+                for i, (v, delta) in enumerate(zip(new.vals, self.sigma * (np.random.randn(len(new.vals)) if rng is None else rng.standard_normal(len(new.vals))))):
                     new.vals[i] = v + delta
 
         # Sampling flag only needs to be set if the TimeSeries had data to change
@@ -625,6 +637,411 @@ class TimeSeries:
         return new
 
 
+def sample_design(n_samples: int, n_dims: int, method: str = "lhs", seed=None) -> np.array:
+    """
+    Generate a stratified sampling design
+
+    Sampling perturbs each uncertain quantity (for example, a ``TimeSeries`` with an uncertainty value) using
+    draws from a standard normal distribution. Rather than drawing these independently for every sample, this
+    function generates a design matrix where each column corresponds to one of the standard normal draws
+    required for a sample. Latin hypercube and quasi-Monte Carlo designs cover the distribution of each draw more
+    evenly than independent random sampling, which means quantiles of the outputs converge with fewer samples.
+    Each row of the design would normally be used via a :class:`DesignStream`.
+
+    :param n_samples: Number of samples (rows)
+    :param n_dims: Number of standard normal draws required per sample (columns)
+    :param method: One of
+
+        - 'random' - independent draws
+        - 'lhs' - Latin hypercube sampling
+        - 'sobol' - Scrambled Sobol sequence. Balance properties are only guaranteed if ``n_samples`` is a power of 2
+        - 'halton' - Scrambled Halton sequence
+
+    :param seed: Optionally specify a seed, ``np.random.SeedSequence`` or ``np.random.Generator`` for the design
+    :return: An array of standard normal variates with shape ``(n_samples, n_dims)``
+
+    """
+
+    rng = np.random.default_rng(seed)
+
+    if n_dims == 0:
+        return np.zeros((n_samples, 0))
+    elif method == "random":
+        return rng.standard_normal((n_samples, n_dims))
+
+    try:
+        from scipy.stats import qmc, norm
+    except ImportError:
+        raise Exception('Sampling method "%s" requires scipy.stats.qmc, which is available in scipy>=1.7. Upgrade scipy, or use method="random"' % (method))
+
+    if method == "lhs":
+        sampler = qmc.LatinHypercube(d=n_dims, seed=rng)
+    elif method == "sobol":
+        sampler = qmc.Sobol(d=n_dims, scramble=True, seed=rng)
+    elif method == "halton":
+        sampler = qmc.Halton(d=n_dims, scramble=True, seed=rng)
+    else:
+        raise Exception('Unknown sampling method "%s" - must be one of "random", "lhs", "sobol", or "halton"' % (method))
+
+    u = np.clip(sampler.random(n_samples), np.finfo(float).eps, 1 - np.finfo(float).eps)  # Guard against infinite values from the inverse CDF
+    return norm.ppf(u)
+
+
+class DesignStream:
+    """
+    Supply standard normal draws from a sampling design
+
+    The ``sample()`` methods of :class:`TimeSeries`, :class:`ParameterSet` and :class:`ProgramSet` take an ``rng``
+    argument that supplies the standard normal perturbations. A ``np.random.Generator`` can be used for random sampling.
+    A ``DesignStream`` instead returns the values in one row of a design matrix (see :func:`sample_design`) in order,
+    so that sample ``i`` can be reproduced exactly from row ``i`` of the design.
+
+    If no values are provided, the stream returns zeros. This can be used to count the number of draws required
+    to sample an object, which gives the number of columns required in the design.
+
+    Example:
+
+        >>> stream = at.DesignStream()
+        >>> _ = parset.sample(rng=stream)
+        >>> design = at.sample_design(100, stream.n_drawn, method='lhs')
+        >>> sampled_parset = parset.sample(rng=at.DesignStream(design[0]))
+
+    :param values: Optionally provide an array of standard normal values
+
+    """
+
+    def __init__(self, values=None):
+        self.values = None if values is None else np.ravel(values).astype(float)
+        self.n_drawn = 0  #: Number of values drawn so far
+
+    def standard_normal(self, size=None):
+        """
+        Return the next values from the stream
+
+        :param size: Number of values to return. If ``None``, a scalar is returned
+        :return: A scalar or an array of values
+
+        """
+
+        n = 1 if size is None else int(np.prod(size))
+        if self.values is None:
+            x = np.zeros(n)
+        elif self.n_drawn + n > self.values.size:
+            raise Exception("The sampling design has %d values per sample, but more values were required. The design must be generated for the same ParameterSet and ProgramSet being sampled" % (self.values.size))
+        else:
+            x = self.values[self.n_drawn : self.n_drawn + n]
+        self.n_drawn += n
+        return x[0] if size is None else x.reshape(size)
+
+
+_HASH_EXCLUDED = {"created", "modified", "uid", "version", "gitinfo", "spreadsheet"}  # Metadata that does not affect simulation results
+_HASH_PRIMITIVES = {type(None), bool, int, float, str, np.float64, np.int64, np.bool_}
+
+
+def _update_hash(h, obj, _active=None) -> None:
+    """
+    Add an object's contents to a hash
+
+    Unlike hashing a pickle, the hash only depends on the contents of the object. In particular, it does not
+    depend on metadata such as creation dates and UIDs (see ``_HASH_EXCLUDED``), the names of :class:`NamedItem`
+    objects (names are only relevant when they are used as keys), or the order of items in unordered containers.
+    This means that the same hash is produced for copies of the object, and in different sessions.
+
+    :param h: A ``hashlib`` hash object to update
+    :param obj: The object to add to the hash
+    :param _active: Internal set of object IDs being hashed, to handle circular references
+
+    """
+
+    if _active is None:
+        _active = set()
+
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes, np.generic)):
+        h.update(b"%s:%s;" % (type(obj).__name__.encode(), repr(obj.item() if isinstance(obj, np.generic) else obj).encode()))
+        return
+    elif isinstance(obj, type):
+        h.update(b"%s;" % (obj.__qualname__.encode()))
+        return
+    elif isinstance(obj, (types.FunctionType, types.BuiltinFunctionType, types.MethodType, partial)):
+        return  # Functions are derived from the other contents (e.g., parsed function strings)
+
+    if id(obj) in _active:
+        h.update(b"<circular>;")
+        return
+    _active.add(id(obj))
+
+    h.update(b"%s(" % (type(obj).__qualname__.encode()))
+    if isinstance(obj, np.ndarray) and obj.dtype != object:
+        h.update(b"%s%s" % (obj.dtype.str.encode(), repr(obj.shape).encode()))
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, np.ndarray):
+        _update_hash(h, obj.shape, _active)
+        _update_hash(h, obj.ravel().tolist(), _active)
+    elif isinstance(obj, pd.DataFrame):
+        _update_hash(h, (list(obj.columns), list(obj.index), obj.values), _active)
+    elif isinstance(obj, pd.Series):
+        _update_hash(h, (obj.name, list(obj.index), obj.values), _active)
+    elif isinstance(obj, (list, tuple)):
+        if all(type(x) in _HASH_PRIMITIVES for x in obj):
+            h.update(repr(obj).encode())  # Faster than hashing each item separately
+        else:
+            for x in obj:
+                if type(x) in _HASH_PRIMITIVES:
+                    h.update(b"%s;" % (repr(x).encode()))
+                else:
+                    _update_hash(h, x, _active)
+    elif isinstance(obj, (set, frozenset)):
+        for digest in sorted(hash_content(x) for x in obj):
+            h.update(digest.encode())
+    elif isinstance(obj, dict):
+        items = [(repr(k) if type(k) in _HASH_PRIMITIVES else hash_content(k), v) for k, v in obj.items()]
+        if not isinstance(obj, OrderedDict):
+            items = sorted(items, key=lambda x: x[0])
+        if all(type(v) in _HASH_PRIMITIVES for _, v in items):
+            h.update(repr(items).encode())  # Faster than hashing each item separately
+        else:
+            for k, v in items:
+                h.update(k.encode())
+                if type(v) in _HASH_PRIMITIVES:
+                    h.update(b"%s;" % (repr(v).encode()))
+                else:
+                    _update_hash(h, v, _active)
+    elif hasattr(obj, "__dict__"):
+        excluded = _HASH_EXCLUDED | {"name"} if isinstance(obj, NamedItem) else _HASH_EXCLUDED
+        _update_hash(h, {k: v for k, v in obj.__dict__.items() if k not in excluded}, _active)
+    elif hasattr(obj, "__slots__"):
+        _update_hash(h, [getattr(obj, k, None) for cls in type(obj).__mro__ for k in getattr(cls, "__slots__", [])], _active)
+    else:
+        h.update(pickle.dumps(obj))
+    h.update(b");")
+
+    _active.remove(id(obj))
+
+
+def hash_content(*args) -> str:
+    """
+    Return a hash of the contents of objects
+
+    The hash is stable across copies of the objects and across sessions, and does not depend on metadata such as
+    creation dates, UIDs, and the names of :class:`NamedItem` objects. This is used to identify simulations
+    in a :class:`SimulationCache`.
+
+    :param args: Objects to hash
+    :return: A hexadecimal string
+
+    """
+
+    h = hashlib.sha256()
+    _update_hash(h, args)
+    return h.hexdigest()
+
+
+class SimulationCache:
+    """
+    On-disk cache of simulation results
+
+    A ``SimulationCache`` stores results in a directory, keyed by a hash of the inputs to the simulation.
+    If a cache is passed to :meth:`Project.run_sim`, then if a simulation with the same framework, parameter
+    set, program set, program instructions and project settings was run previously, the stored result will be
+    returned instead of running the model. The key also includes the Atomica version, so results from other
+    versions are never returned. The least recently used results are removed when the cache exceeds its maximum size.
+
+    Example usage:
+
+    >>> cache = at.SimulationCache('./cache', max_size=1e9)
+    >>> res = P.run_sim(parset='default', cache=cache) # Runs the model
+    >>> res = P.run_sim(parset='default', cache=cache) # Returns the stored result
+
+    :param path: Directory to store results in. It will be created if it does not exist
+    :param max_size: Maximum total size of the stored results, in bytes
+
+    """
+
+    def __init__(self, path, max_size: float = 1e9):
+        self.path = Path(path).resolve()
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def __repr__(self):
+        return f'<SimulationCache "{self.path}" ({len(self._entries())} results, {self.size / 1e6:.1f} MB)>'
+
+    @staticmethod
+    def key(*args) -> str:
+        """
+        Return the cache key for simulation inputs
+
+        :param args: The simulation inputs
+        :return: The key for the stored result
+
+        """
+
+        from .version import version  # Import here to avoid circular import
+
+        return hash_content(version, *args)
+
+    def _entries(self) -> list:
+        return list(self.path.glob("*.res"))
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the stored results
+
+        :return: Size in bytes
+
+        """
+
+        return sum(x.stat().st_size for x in self._entries())
+
+    def get(self, key: str):
+        """
+        Return a stored result
+
+        :param key: The key for the result (see :meth:`SimulationCache.key`)
+        :return: The stored result, or ``None`` if there is no result with this key
+
+        """
+
+        filename = self.path / f"{key}.res"
+        try:
+            obj = sc.loadobj(filename, die=True)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning('Could not load cached result "%s" - %s', filename, e)
+            return None
+
+        os.utime(filename)  # Record that the result was used
+        return obj
+
+    def put(self, key: str, obj) -> None:
+        """
+        Store a result
+
+        If the cache exceeds the maximum size after the result is added, the least recently used results will be removed.
+
+        :param key: The key for the result (see :meth:`SimulationCache.key`)
+        :param obj: The result to store
+
+        """
+
+        filename = self.path / f"{key}.res"
+        tmp = filename.with_suffix(".tmp")
+        sc.saveobj(tmp, obj)
+        os.replace(tmp, filename)  # Other processes using the cache will not see partially written results
+        self._evict()
+
+    def clear(self) -> None:
+        """
+        Remove all stored results
+
+        """
+
+        for entry in self._entries():
+            entry.unlink()
+
+    def _evict(self) -> None:
+        # Remove least recently used results until the cache is within its maximum size
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another process
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        size = sum(x[1] for x in entries)
+        for _, entry_size, entry in sorted(entries, key=lambda x: x[0]):
+            if size <= self.max_size:
+                break
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+
+def _object_size(obj, seen: set = None) -> int:
+    """
+    Estimate the memory used by an object
+
+    The size includes everything the object refers to, except for objects whose IDs are in ``seen``.
+    Objects are added to ``seen`` as they are counted, so an object that is referred to in several places
+    is only counted once. The size of NumPy arrays and Pandas objects are computed from the size of their
+    data, and other objects are measured using ``sys.getsizeof()``.
+
+    :param obj: The object to measure
+    :param seen: Set of object IDs that should not be counted. This set is updated in-place
+    :return: Estimated number of bytes
+
+    """
+
+    if seen is None:
+        seen = set()
+
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, np.ndarray):
+            size += sys.getsizeof(obj)  # Includes the data if the array owns it
+            if obj.base is not None:
+                stack.append(obj.base)  # Views refer to the memory of another object
+            if obj.dtype == object:
+                stack.extend(obj.ravel().tolist())
+        elif isinstance(obj, (pd.DataFrame, pd.Series)):
+            size += int(obj.memory_usage(index=True, deep=True).sum())
+        elif isinstance(obj, pd.Index):
+            size += obj.memory_usage(deep=True)
+        elif isinstance(obj, (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, partial)):
+            size += sys.getsizeof(obj)  # Don't count the contents of classes, modules, or functions
+        elif isinstance(obj, dict):
+            size += sys.getsizeof(obj)
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            size += sys.getsizeof(obj)
+            stack.extend(obj)
+        else:
+            size += sys.getsizeof(obj)
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+
+    return size
+
+
+class _ByteCounter:
+    # File-like object that only counts the number of bytes written to it
+    def __init__(self):
+        self.n = 0
+
+    def write(self, b) -> None:
+        self.n += memoryview(b).nbytes
+
+
+def _pickled_size(obj) -> int:
+    """
+    Return the size of an object when pickled
+
+    The pickle is not stored, so this does not require memory for a copy of the pickled object.
+
+    :param obj: The object to pickle
+    :return: Number of bytes
+
+    """
+
+    counter = _ByteCounter()
+    pickle.dump(obj, counter, protocol=pickle.HIGHEST_PROTOCOL)
+    return counter.n
+
+
 def evaluate_plot_string(plot_string: str):
     """
     Evaluate a plotting output specification
@@ -856,7 +1273,7 @@ def _worker_init() -> None:
     logger.setLevel(logging.WARNING)
 
 
-def parallel_progress(fcn, inputs, num_workers=None, show_progress=True) -> list:
+def parallel_progress(fcn, inputs, num_workers=None, show_progress=True, initializer=None, initargs: tuple = (), callback=None) -> list:
     """
     Run a function in parallel with a optional single progress bar
 
@@ -873,13 +1290,18 @@ def parallel_progress(fcn, inputs, num_workers=None, show_progress=True) -> list
     :param inputs: A collection of inputs that will each be passed to (list, array, etc.)
                     OR a number, if the fcn() has no input arguments
     :param num_workers: Number of processes, defaults to the number of CPUs
+    :param initializer: Optionally specify a function to initialize each worker, which should call :func:`_worker_init`. This
+                        can be used to send large objects that are common to all inputs to each worker once, rather than with every input
+    :param initargs: Arguments for the ``initializer``
+    :param callback: Optionally specify a function that is called as ``callback(i, output)`` as soon as each output is available.
+                     In that case, the outputs are not retained and the returned list will contain ``None`` for each input
     :return: An list of outputs
 
     """
 
     from multiprocessing import pool
 
-    pool = pool.Pool(num_workers, initializer=_worker_init)
+    pool = pool.Pool(num_workers, initializer=initializer if initializer is not None else _worker_init, initargs=initargs)
 
     results = [None]
     if sc.isnumber(inputs):
@@ -889,17 +1311,20 @@ def parallel_progress(fcn, inputs, num_workers=None, show_progress=True) -> list
         results *= len(inputs)
         pbar = tqdm(total=len(inputs)) if show_progress else None
 
-    def callback(result, idx):
-        results[idx] = result
+    def store(result, idx):
+        if callback is None:
+            results[idx] = result
+        else:
+            callback(idx, result)
         if show_progress:
             pbar.update(1)
 
     if sc.isnumber(inputs):
         for i in range(inputs):
-            pool.apply_async(fcn, callback=partial(callback, idx=i))
+            pool.apply_async(fcn, callback=partial(store, idx=i))
     else:
         for i, x in enumerate(inputs):
-            pool.apply_async(fcn, args=(x,), callback=partial(callback, idx=i))
+            pool.apply_async(fcn, args=(x,), callback=partial(store, idx=i))
 
     pool.close()
     pool.join()
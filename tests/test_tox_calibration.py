@@ -5,6 +5,8 @@ import atomica as at
 import matplotlib.pyplot as plt
 import os
 
+testdir = at.parent_dir()
+
 
 def test_scale_factors():
     P = at.demo("sir", do_run=False)
@@ -25,5 +27,201 @@ def test_scale_factors():
     assert np.isclose(scale2, baseline * 3, 1e-4)
 
 
+def test_update_scale_factors():
+    # Check that updating the scale factors on a prebuilt model matches building the model from scratch
+    # This includes a duration parameter for a timed compartment, which requires storage to be reallocated
+    P = at.Project(framework=testdir / "timed_tb_framework.xlsx", databook=testdir / "timed_tb_databook.xlsx", do_run=False)
+    ps = P.parsets[0].copy()
+    model = at.Model(P.settings, P.framework, ps)
+
+    par_names = []
+    for par_name in ["early_dur"] + list(ps.pars.keys())[:12]:
+        par = ps.pars[par_name]
+        for pop_name in par.pops:
+            par.y_factor[pop_name] = 1.1
+        par_names.append(par_name)
+    ps.pars[par_names[-1]].meta_y_factor = 0.9
+
+    model.update_scale_factors(ps, par_names)
+    model.process()
+    expected = at.Model(P.settings, P.framework, ps)
+    expected.process()
+
+    for pop, expected_pop in zip(model.pops, expected.pops):
+        for var, expected_var in zip(pop.comps + pop.characs + pop.pars + pop.links, expected_pop.comps + expected_pop.characs + expected_pop.pars + expected_pop.links):
+            assert np.allclose(var.vals, expected_var.vals, equal_nan=True)
+
+
+def test_build_once_calibration():
+    from atomica.calibration import _build_template, _build_target_index, _calculate_objective
+
+    P = at.demo("sir", do_run=False)
+    pars_to_adjust = [("transpercontact", "adults", 0.1, 1.9), ("sus", "adults", 0.5, 1.5)]
+    output_quantities = [("ch_prev", "adults", 1.0, "fractional")]
+
+    # Evaluating the objective on the prebuilt model should give the same value as rebuilding the model
+    template = _build_template(P, P.parsets[0], pars_to_adjust)
+    targets = _build_target_index(P, output_quantities, P.settings.tvec)
+    for y_factors in [[1.0, 1.0], [0.5, 1.2], [1.5, 0.8]]:
+        rebuilt = _calculate_objective(y_factors, pars_to_adjust, targets, P.parsets[0].copy(), P)
+        prebuilt = _calculate_objective(y_factors, pars_to_adjust, targets, P.parsets[0].copy(), P, template=template)
+        assert np.isclose(rebuilt, prebuilt)
+
+    calibrated = at.calibrate(P, P.parsets[0], pars_to_adjust, output_quantities, max_time=5)
+    assert calibrated.pars["transpercontact"].y_factor["adults"] != P.parsets[0].pars["transpercontact"].y_factor["adults"]
+
+
+def test_fit_report():
+    from atomica.calibration import _build_target_index, _calculate_objective
+
+    P = at.demo("tb", do_run=False)
+    res = P.run_sim()
+    output_quantities = [("ac_prev", None, 1.0, "fractional"), ("ac_inf", None, 2.0, "wape"), ("alive", None, 0.5, "meansquare")]
+
+    df = at.fit_report(P, res, output_quantities)
+    assert set(df.index.get_level_values("quantity")) == {"ac_prev", "ac_inf", "alive"}
+    assert np.isclose(df["contribution"].sum(), 1)
+
+    # The report should be consistent with the objective used for calibration
+    targets = _build_target_index(P, [(x[0], pop_name, x[2], x[3]) for x in output_quantities for pop_name in P.data.pops], res.model.t)
+    objective = _calculate_objective([], [], targets, P.parsets[0].copy(), P)
+    assert np.isclose(objective, df["weighted score"].sum())
+
+    # Check the interpolation against the model outputs at the data times
+    for target in targets:
+        var = res.model.get_pop(target["pop_name"]).get_variable(target["var_label"])[0]
+        assert np.allclose(np.interp(target["t"], var.t, var.vals), (1 - target["w"]) * var.vals[target["t_idx"]] + target["w"] * var.vals[target["t_idx1"]])
+
+    df = at.fit_report(P, res)  # Default output quantities
+    assert len(df) > 0
+
+
+def test_decomposed_calibration():
+    from atomica.calibration import _get_population_groups
+
+    P = at.demo("hypertension", do_run=False)
+    P.settings.sim_end = 2025
+    assert _get_population_groups(P.framework, P.parsets[0]) == [["m_rural"], ["f_rural"], ["m_urban"], ["f_urban"]]
+
+    P2 = at.demo("combined", do_run=False)
+    assert len(_get_population_groups(P2.framework, P2.parsets[0])) == 2
+
+    # An aggregation with an interaction term only connects populations that interact. Remove the transfers and
+    # make the interaction block-diagonal, so that children and adults form separate groups (prisoners do not interact
+    # with the other populations in the TB demo, so they are only connected via transfers)
+    P3 = at.demo("tb", do_run=False)
+    P3.framework.pars.at["foi_in", "function"] = "SRC_POP_AVG(foi_out, w_ctc)"
+    parset = P3.parsets[0]
+    for transfer in parset.transfers.values():
+        for par in transfer.values():
+            par.ts.clear()
+    children = {"0-4", "5-14"}
+    for from_pop, par in parset.interactions["w_ctc"].items():
+        for to_pop in list(par.ts.keys()):
+            if (from_pop in children) != (to_pop in children):
+                del par.ts[to_pop]
+    assert _get_population_groups(P3.framework, parset) == [["0-4", "5-14"], ["15-64", "65+"], ["Prisoners"]]
+
+    # Generate synthetic data from a perturbed parset, so that the calibration has something to do
+    pars_to_adjust = [("screen", None, 0.1, 3), ("diag", None, 0.1, 3)]
+    output_quantities = [("all_screened", None, 1.0, "fractional"), ("all_dx", None, 1.0, "fractional")]
+    truth = P.parsets[0].copy()
+    for par_name, _, _, _ in pars_to_adjust:
+        for i, pop_name in enumerate(truth.pars[par_name].pops):
+            truth.pars[par_name].y_factor[pop_name] = 0.6 + 0.2 * i
+    res = P.run_sim(truth)
+    for var_label, _, _, _ in output_quantities:
+        for pop_name in P.data.pops:
+            ts = P.data.get_ts(var_label, pop_name)
+            var = res.get_variable(var_label, pop_name)[0]
+            for t in [2017, 2018]:
+                ts.insert(t, np.interp(t, var.t, var.vals))
+
+    initial = at.fit_report(P, P.run_sim(), output_quantities)["weighted score"].sum()
+
+    calibrated = at.calibrate(P, P.parsets[0], pars_to_adjust, output_quantities, max_time=10, decompose=True)
+    assert at.fit_report(P, P.run_sim(calibrated), output_quantities)["weighted score"].sum() < 0.1 * initial
+
+    # Include a meta y-factor, which requires cycling between the population groups and the meta y-factor
+    calibrated = at.calibrate(P, P.parsets[0], pars_to_adjust + [("diag", "all", 0.5, 1.5)], output_quantities, max_time=5, decompose=True, max_cycles=2, parallel=True, num_workers=2)
+    assert at.fit_report(P, P.run_sim(calibrated), output_quantities)["weighted score"].sum() < 0.1 * initial
+
+
+def test_multistart_calibration():
+    P = at.demo("sir", do_run=False)
+    pars_to_adjust = [("transpercontact", "adults", 0.1, 1.9)]
+    output_quantities = [("ch_prev", "adults", 1.0, "fractional")]
+    single = at.calibrate(P, P.parsets[0], pars_to_adjust, output_quantities, max_time=5)
+    multi = P.calibrate(parset="default", adjustables=pars_to_adjust, measurables=output_quantities, max_time=5, n_starts=3, parallel=True, num_workers=2)
+
+    single_score = at.fit_report(P, P.run_sim(single), output_quantities)["weighted score"].sum()
+    multi_score = at.fit_report(P, P.run_sim(multi), output_quantities)["weighted score"].sum()
+    assert multi_score <= single_score * 1.01
+
+    # With a seed, the start points and the seeds for each run are reproducible, regardless of whether they are run in parallel
+    serial = at.calibrate(P, P.parsets[0], pars_to_adjust, output_quantities, max_time=5, n_starts=3, seed=1)
+    parallel = at.calibrate(P, P.parsets[0], pars_to_adjust, output_quantities, max_time=5, n_starts=3, seed=1, parallel=True, num_workers=2)
+    assert serial.pars["transpercontact"].y_factor["adults"] == parallel.pars["transpercontact"].y_factor["adults"]
+
+
+def test_sample_posterior():
+    P = at.demo("sir", do_run=False)
+    pars_to_adjust = [("transpercontact", "adults", 0.1, 1.9), ("recrate", "adults", 0.5, 1.5)]
+    output_quantities = [("ch_prev", "adults", 1.0, "fractional")]
+    checkpoint = str(testdir / "temp" / "posterior")
+    for fname in [checkpoint + "_chain0.chk", checkpoint + "_chain1.chk"]:
+        if os.path.exists(fname):
+            os.remove(fname)
+
+    parsets = at.sample_posterior(P, P.parsets[0], pars_to_adjust, output_quantities, n_samples=10, n_chains=2, burn_in=20, thin=2, seed=1, checkpoint=checkpoint, checkpoint_interval=10)
+    assert len(parsets) == 10
+    assert len({ps.name for ps in parsets}) == 10
+    vals = np.array([ps.pars["transpercontact"].y_factor["adults"] for ps in parsets])
+    assert np.all((vals >= 0.1) & (vals <= 1.9))
+    assert os.path.exists(checkpoint + "_chain0.chk")
+
+    # Resuming from the checkpoints should give the same samples without running the chains again
+    resumed = at.sample_posterior(P, P.parsets[0], pars_to_adjust, output_quantities, n_samples=10, n_chains=2, burn_in=20, thin=2, seed=1, checkpoint=checkpoint)
+    assert np.allclose(vals, [ps.pars["transpercontact"].y_factor["adults"] for ps in resumed])
+
+    # Running in parallel should give the same samples as running in serial
+    parallel = at.sample_posterior(P, P.parsets[0], pars_to_adjust, output_quantities, n_samples=10, n_chains=2, burn_in=20, thin=2, seed=1, parallel=True, num_workers=2)
+    assert np.allclose(vals, [ps.pars["transpercontact"].y_factor["adults"] for ps in parallel])
+
+    # The sampled parsets can be used to run an ensemble
+    results = [P.run_sim(ps) for ps in parsets[:3]]
+    assert len(results) == 3
+
+
+def test_screen_parameters():
+    P = at.demo("sir", do_run=False)
+    pars_to_adjust = [(x, "adults", 0.1, 3) for x in ["transpercontact", "recrate", "infdeath", "susdeath"]]
+    output_quantities = [("ch_prev", "adults", 1.0, "fractional")]
+
+    df = at.screen_parameters(P, P.parsets[0], pars_to_adjust, output_quantities, threshold=0.02)
+    assert df.loc[("recrate", "adults"), "relative"] == 1
+    assert not df.loc[("susdeath", "adults"), "keep"]
+    assert df["keep"].sum() == 3
+
+    df = at.screen_parameters(P, P.parsets[0], pars_to_adjust, output_quantities, method="morris", n_trajectories=3, parallel=True, num_workers=2, seed=1)
+    assert len(df) == 4
+    assert np.all(df["sigma"] >= 0)
+
+    # The same seed gives the same trajectories
+    repeated = at.screen_parameters(P, P.parsets[0], pars_to_adjust, output_quantities, method="morris", n_trajectories=3, seed=1)
+    assert np.allclose(df["effect"], repeated["effect"], equal_nan=True)
+
+    # Quantities with negligible effects are left unchanged by the calibration
+    calibrated = at.calibrate(P, P.parsets[0], pars_to_adjust, output_quantities, max_time=5, screen=0.02)
+    assert calibrated.pars["susdeath"].y_factor["adults"] == P.parsets[0].pars["susdeath"].y_factor["adults"]
+
+
 if __name__ == "__main__":
     test_scale_factors()
+    test_update_scale_factors()
+    test_build_once_calibration()
+    test_fit_report()
+    test_decomposed_calibration()
+    test_multistart_calibration()
+    test_sample_posterior()
+    test_screen_parameters()
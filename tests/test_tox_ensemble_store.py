@@ -0,0 +1,65 @@
+# Check that Ensembles with samples stored on disk match Ensembles with samples in memory
+
+import os
+import pickle
+import numpy as np
+import atomica as at
+import matplotlib.pyplot as plt
+
+testdir = at.parent_dir()  # Must be relative to current file to work with tox
+tmpdir = testdir / "temp"
+os.makedirs(tmpdir, exist_ok=True)
+
+
+def _mapping_function(results):
+    return at.PlotData(results, outputs=["sus", "inf"])
+
+
+def test_ensemble_store():
+    P = at.demo("sir", do_run=False)
+
+    ensemble = at.Ensemble(_mapping_function)
+    ensemble.run_sims(P, "default", n_samples=20, seed=1)
+    stored = at.Ensemble(_mapping_function, store=tmpdir / "ensemble_store.npy")
+    stored.run_sims(P, "default", n_samples=20, seed=1, parallel=True, num_workers=2)
+
+    assert isinstance(stored.samples, at.SampleStore)
+    assert stored.n_samples == 20
+    assert stored.samples.array.shape == (20, 2, len(stored.tvec))
+    assert np.array_equal(stored.samples[-1]["default", "adults", "inf"].vals, ensemble.samples[-1]["default", "adults", "inf"].vals)
+    assert np.array_equal(stored.samples.get_values(("default", "adults", "sus")), np.vstack([x["default", "adults", "sus"].vals for x in ensemble.samples]))
+    assert np.allclose(stored.summary_statistics().values, ensemble.summary_statistics().values)
+
+    stored.plot_series()
+    stored.boxplot()
+    plt.close("all")
+
+    # The store is reopened after unpickling, and grows as samples are added
+    stored = pickle.loads(pickle.dumps(stored))
+    for i in range(5):
+        stored.add(P.run_sim(result_name="default"))
+    assert stored.n_samples == 25
+    assert np.array_equal(stored.samples[3]["default", "adults", "sus"].vals, ensemble.samples[3]["default", "adults", "sus"].vals)
+
+
+def test_ensemble_values():
+    P = at.demo("sir", do_run=False)
+    ensemble = at.Ensemble(_mapping_function)
+    ensemble.run_sims(P, "default", n_samples=10, seed=1)
+
+    # Statistics computed from the cached array of values match interpolating each sample individually
+    vals = np.array([x["default", "adults", "inf"].interpolate(2012.3) for x in ensemble.samples])
+    df = ensemble.summary_statistics(years=2012.3)
+    assert np.isclose(df.loc[(2012.3, "default", "inf", "adults", "mean")].values[0], np.mean(vals))
+    assert np.isclose(df.loc[(2012.3, "default", "inf", "adults", "Q3")].values[0], np.quantile(vals, 0.75))
+    assert np.all(np.isnan(ensemble.summary_statistics(years=1900.5).values))
+
+    # The cached values are updated when samples are added
+    ensemble.add(P.run_sim(result_name="default"))
+    assert ensemble._get_values("default", "adults", "sus").shape == (11, len(ensemble.tvec))
+    assert np.array_equal(ensemble._get_values("default", "adults", "sus")[-1], ensemble.samples[-1]["default", "adults", "sus"].vals)
+
+
+if __name__ == "__main__":
+    test_ensemble_store()
+    test_ensemble_values()
@@ -7,6 +7,7 @@ import numpy as np
 import sciris as sc
 import atomica as at
 import logging
+import os
 
 logger = logging.getLogger()
 
@@ -561,6 +562,195 @@ def test_cascade_conversions():
     plt.title("Optimized")
 
 
+def _uncompiled_objective(measurable, result) -> float:
+    # Evaluate a Measurable directly from the variables and cascade values, without any precomputed plan
+    model = result.model
+    t = measurable.t
+
+    if isinstance(measurable, at.MaximizeCascadeStage):
+        return sum(np.sum(at.get_cascade_vals(result, measurable.measurable_name, pop, t)[0][stage]) for pop in measurable.pop_names for stage in measurable.cascade_stage)
+    elif isinstance(measurable, at.MaximizeCascadeConversionRate):
+        val = 0
+        for pop in measurable.pop_names:
+            cascade_array = np.hstack(at.get_cascade_vals(result, measurable.measurable_name, pop, t)[0].values())
+            val += np.sum(cascade_array[1:] / cascade_array[0:-1])
+        return val
+
+    t_filter = (model.t == t) if len(t) == 1 else (model.t >= t[0]) & (model.t < t[1])
+    if measurable.measurable_name in model.progset.programs:
+        return np.sum(model.progset.get_alloc(model.t, model.program_instructions)[measurable.measurable_name][t_filter])
+
+    val = 0.0
+    for pop in model.pops:
+        if measurable.pop_names and pop.name not in sc.promotetolist(measurable.pop_names):
+            continue
+        try:
+            variables = pop.get_variable(measurable.measurable_name)
+        except at.NotFoundError:
+            continue
+        for var in variables:
+            val += np.sum(var.vals[t_filter] / (var.dt if isinstance(var, at.model.Link) else 1.0))
+    return val
+
+
+def test_compiled_measurables():
+    # Check that the precompiled evaluation plans give the same objective values as evaluating
+    # the Measurables directly
+
+    P = at.demo(which=test, do_run=False)
+    P.update_settings(sim_end=2030.0)
+
+    alloc = sc.odict([("Risk avoidance", 0.0), ("Harm reduction 1", 0.0), ("Harm reduction 2", 0.0), ("Treatment 1", 50.0), ("Treatment 2", 1.0)])
+    instructions = at.ProgramInstructions(alloc=alloc, start_year=2020)
+
+    measurables = [
+        at.Measurable("ch_all", [2020, np.inf]),
+        at.Measurable("sus", 2025, pop_names="adults"),
+        at.Measurable("foi", [2020, 2025]),
+        at.Measurable(":dead", [2020, 2030]),
+        at.Measurable("Treatment 1", [2020, 2025]),
+        at.Measurable("Risk avoidance", 2021),
+        at.MaximizeCascadeStage("main", [2025, 2027.3], cascade_stage=[0, -1]),
+        at.MaximizeCascadeConversionRate("main", 2027.3),
+    ]
+
+    result = P.run_sim(parset="default", progset="default", progset_instructions=instructions)
+    model = result.model
+
+    expected = [_uncompiled_objective(m, result) for m in measurables]
+    cascade_vals = at.get_cascade_vals(result, "main", "all", [2025, 2027.3])[0]
+    assert np.isclose(expected[6], np.sum(cascade_vals[0]) + np.sum(cascade_vals[-1]))
+    for m, val in zip(measurables, expected):
+        assert m._plan is None
+        assert np.isclose(m.get_objective_val(model, None), val, equal_nan=True)  # Evaluation without a cached plan
+
+    for m in measurables:
+        m.compile(model)
+        assert m._plan is not None
+
+    model_copy = sc.dcp(model)  # The plans should remain valid for copies of the model
+    for m, val in zip(measurables, expected):
+        assert np.isclose(m.get_objective_val(model_copy, None), val, equal_nan=True)
+        m.compile(None)
+        assert m._plan is None
+
+    # Optimization should not retain the compiled plans
+    adjustments = [at.SpendingAdjustment("Treatment 1", 2020, "abs", 0.0, 100.0), at.SpendingAdjustment("Treatment 2", 2020, "abs", 0.0, 100.0)]
+    optimization = at.Optimization(name="default", adjustments=adjustments, measurables=at.MaximizeMeasurable("ch_all", [2020, np.inf]), constraints=at.TotalSpendConstraint(), maxtime=2)
+    at.optimize(P, optimization, parset=P.parsets["default"], progset=P.progsets["default"], instructions=instructions)
+    assert optimization.measurables[0]._plan is None
+
+
+def test_lbfgsb_fd():
+    # Gradient-based optimization with parallel finite differences should reallocate
+    # spending from Treatment 1 to Treatment 2, the same as in `test_standard()`
+
+    P = at.demo(which=test, do_run=False)
+    P.update_settings(sim_end=2030.0)
+
+    alloc = sc.odict([("Risk avoidance", 0.0), ("Harm reduction 1", 0.0), ("Harm reduction 2", 0.0), ("Treatment 1", 50.0), ("Treatment 2", 1.0)])
+
+    instructions = at.ProgramInstructions(alloc=alloc, start_year=2020)  # Instructions for default spending
+    adjustments = list()
+    adjustments.append(at.SpendingAdjustment("Treatment 1", 2020, "abs", 0.0, 100.0))
+    adjustments.append(at.SpendingAdjustment("Treatment 2", 2020, "abs", 0.0, 100.0))
+    measurables = at.MaximizeMeasurable("ch_all", [2020, np.inf])
+    constraints = at.TotalSpendConstraint()  # Cap total spending in all years
+
+    for num_workers in [1, 2]:
+        optimization = at.Optimization(name="default", adjustments=adjustments, measurables=measurables, constraints=constraints, method="lbfgsb-fd", maxiters=20)
+        optimized_instructions = at.optimize(P, optimization, parset=P.parsets["default"], progset=P.progsets["default"], instructions=instructions, num_workers=num_workers)
+        assert optimized_instructions.alloc["Treatment 2"].get(2020) > 25
+        assert np.isclose(optimized_instructions.alloc["Treatment 1"].get(2020) + optimized_instructions.alloc["Treatment 2"].get(2020), 51)
+
+
+def test_surrogate():
+    # Surrogate-assisted optimization should reallocate spending from Treatment 1 to Treatment 2,
+    # the same as in `test_standard()`
+
+    P = at.demo(which=test, do_run=False)
+    P.update_settings(sim_end=2030.0)
+
+    alloc = sc.odict([("Risk avoidance", 0.0), ("Harm reduction 1", 0.0), ("Harm reduction 2", 0.0), ("Treatment 1", 50.0), ("Treatment 2", 1.0)])
+
+    instructions = at.ProgramInstructions(alloc=alloc, start_year=2020)  # Instructions for default spending
+    adjustments = list()
+    adjustments.append(at.SpendingAdjustment("Treatment 1", 2020, "abs", 0.0, 100.0))
+    adjustments.append(at.SpendingAdjustment("Treatment 2", 2020, "abs", 0.0, 100.0))
+    measurables = at.MaximizeMeasurable("ch_all", [2020, np.inf])
+    constraints = at.TotalSpendConstraint()  # Cap total spending in all years
+    optimization = at.Optimization(name="default", adjustments=adjustments, measurables=measurables, constraints=constraints, method="surrogate", maxiters=50)
+
+    optimized_instructions = at.optimize(P, optimization, parset=P.parsets["default"], progset=P.progsets["default"], instructions=instructions, seed=0)
+    assert optimized_instructions.alloc["Treatment 2"].get(2020) > 25
+    assert np.isclose(optimized_instructions.alloc["Treatment 1"].get(2020) + optimized_instructions.alloc["Treatment 2"].get(2020), 51)
+
+    # The candidate points are drawn from a local generator, so the same seed reproduces the result
+    # regardless of the state of the global random number generator
+    np.random.seed(1)
+    repeated_instructions = at.optimize(P, optimization, parset=P.parsets["default"], progset=P.progsets["default"], instructions=instructions, seed=0)
+    for prog in ["Treatment 1", "Treatment 2"]:
+        assert repeated_instructions.alloc[prog].get(2020) == optimized_instructions.alloc[prog].get(2020)
+
+
+def test_budget_sweep():
+
+    P = at.demo(which=test, do_run=False)
+    P.update_settings(sim_end=2030.0)
+
+    alloc = sc.odict([("Risk avoidance", 0.0), ("Harm reduction 1", 0.0), ("Harm reduction 2", 0.0), ("Treatment 1", 50.0), ("Treatment 2", 1.0)])
+
+    instructions = at.ProgramInstructions(alloc=alloc, start_year=2020)  # Instructions for default spending
+    adjustments = list()
+    adjustments.append(at.SpendingAdjustment("Treatment 1", 2020, "abs", 0.0, 100.0))
+    adjustments.append(at.SpendingAdjustment("Treatment 2", 2020, "abs", 0.0, 100.0))
+    measurables = at.MaximizeMeasurable("ch_all", [2020, np.inf])
+    constraints = at.TotalSpendConstraint()  # Cap total spending in all years
+    optimization = at.Optimization(name="default", adjustments=adjustments, measurables=measurables, constraints=constraints, maxtime=5)
+
+    budget_factors = [1.0, 0.5, 2.0]
+    for parallel in [False, True]:
+        df, results = P.run_budget_sweep(optimization, budget_factors, instructions, parset="default", progset="default", parallel=parallel, num_workers=2)
+        assert list(df.index) == sorted(budget_factors)
+        assert [x.name for x in results] == ["Budget x1", "Budget x0.5", "Budget x2"]
+        assert np.allclose(df["Treatment 1"] + df["Treatment 2"], 51 * df.index)
+        assert np.all(np.diff(df["objective"]) < 0)  # More budget should improve the objective
+
+
+def test_trace():
+
+    P = at.demo(which=test, do_run=False)
+    P.update_settings(sim_end=2030.0)
+
+    alloc = sc.odict([("Risk avoidance", 0.0), ("Harm reduction 1", 0.0), ("Harm reduction 2", 0.0), ("Treatment 1", 50.0), ("Treatment 2", 1.0)])
+
+    instructions = at.ProgramInstructions(alloc=alloc, start_year=2020)  # Instructions for default spending
+    adjustments = list()
+    adjustments.append(at.SpendingAdjustment("Treatment 1", 2020, "abs", 0.0, 100.0))
+    adjustments.append(at.SpendingAdjustment("Treatment 2", 2020, "abs", 0.0, 100.0))
+    measurables = at.MaximizeMeasurable("ch_all", [2020, np.inf])
+    constraints = at.TotalSpendConstraint()  # Cap total spending in all years
+
+    for method in ["asd", "lbfgsb-fd"]:
+        optimization = at.Optimization(name="default", adjustments=adjustments, measurables=measurables, constraints=constraints, method=method, maxiters=10)
+        trace = at.OptimizationTrace()
+        at.optimize(P, optimization, parset=P.parsets["default"], progset=P.progsets["default"], instructions=instructions, num_workers=2, trace=trace)
+
+        df = trace.to_df()
+        assert len(df) == trace.n_evaluations > 1
+        assert list(df.columns[-2:]) == ["Treatment 1", "Treatment 2"]
+        assert np.all(np.diff(df["best_objective"]) <= 0)
+        assert np.all(df["t_process"] > 0)
+        assert np.all(df["elapsed"] >= 0)
+
+        summary = trace.summary()
+        assert summary["evaluations"] == len(df)
+        assert summary["best_objective"] == df["objective"].min()
+
+    fname = trace.to_csv(at.parent_dir() / "temp" / "optimization_trace.csv")
+    assert os.path.exists(fname)
+
+
 if __name__ == "__main__":
     test_standard()
     test_unresolvable()
@@ -577,3 +767,8 @@ if __name__ == "__main__":
     test_cascade_final_stage()
     test_cascade_multi_stage()
     test_cascade_conversions()
+    test_compiled_measurables()
+    test_lbfgsb_fd()
+    test_surrogate()
+    test_budget_sweep()
+    test_trace()
@@ -1,9 +1,11 @@
 # This script performs various tests on Result objects
 
 import numpy as np
+import pandas as pd
 import atomica as at
 import matplotlib.pyplot as plt
 import os
+import pickle
 import sciris as sc
 import pytest
 
@@ -31,10 +33,121 @@ def test_export():
     program_ordering = ("quantity", "program", "result")
     at.export_results(P.results, tmpdir / "export_multi_reordered.xlsx", output_ordering=output_ordering, cascade_ordering=cascade_ordering, program_ordering=program_ordering)
 
+    # Check the layout and values of the first table
+    sheet = pd.read_excel(tmpdir / "export_multi.xlsx", sheet_name="Plot data annualized", header=None)
+    spec = P.framework.sheets["plots"][0].iloc[0]
+    result = P.results["parset1"]
+    assert sheet.iloc[0, 0] == spec["name"]
+    assert list(sheet.iloc[1, :2]) == ["Result", "Population"]
+    years = sheet.iloc[1, 2:].values.astype(float)
+    d = at.PlotData(result, outputs=at.evaluate_plot_string(spec["quantities"]), pops=result.pop_names[0]).interpolate(years)
+    assert list(sheet.iloc[2, :2]) == [result.name, result.pop_labels[0]]
+    assert np.allclose(sheet.iloc[2, 2:].values.astype(float), d.series[0].vals)
+    assert pd.isna(sheet.iloc[3, 0])  # The result name is only written in the first row of each group
+
     # Test raw exports
     P.results["parset1"].export_raw(tmpdir / "export_raw_parset.xlsx")
     P.results["progset1"].export_raw(tmpdir / "export_raw_progset.xlsx")
 
 
+@pytest.mark.parametrize("fmt", [".npz", ".h5", ".parquet", ".feather"])
+def test_export_raw_results(fmt):
+    if fmt == ".h5":
+        pytest.importorskip("h5py")
+    elif fmt in {".parquet", ".feather"}:
+        pytest.importorskip("pyarrow")
+
+    P = at.demo("sir", do_run=False)
+    results = [P.run_sim(result_name="parset1"), P.run_sim(result_name="parset2")]
+    fname = at.export_raw_results(results, tmpdir / f"export_raw_results{fmt}")
+    views = at.load_raw_results(fname)
+
+    assert views.keys() == ["parset1", "parset2"]
+    assert views["parset2"]._data is None  # Values are only loaded when needed
+    df = views["parset2"].to_dataframe()
+    assert df.equals(results[1].export_raw())
+    assert np.array_equal(views["parset1"]["adults", "inf"], results[0].get_variable("inf", "adults")[0].vals)
+    with pytest.raises(ValueError):
+        views["parset1"].values[0, 0] = 1  # Views are read-only
+
+    # Single precision
+    fname = at.export_raw_results(results[0], tmpdir / f"export_raw_results_float32{fmt}", float32=True)
+    views = at.load_raw_results(fname)
+    assert views[0].values.dtype == np.float32
+    assert np.allclose(views[0].to_dataframe().values, results[0].export_raw().values, rtol=1e-6)
+
+
+def test_shared_framework():
+    P = at.demo("sir", do_run=False)
+    r1 = P.run_sim(result_name="r1")
+    r2 = P.run_sim(result_name="r2")
+
+    # Models built from the same framework share a copy of it, which is also shared after copying and pickling
+    assert r1.framework is r2.framework
+    assert r1.framework is not P.framework
+    assert r1.framework.spreadsheet is None and P.framework.spreadsheet is not None
+    assert sc.dcp(r1).framework is r1.framework
+    r3, r4 = pickle.loads(pickle.dumps([r1, r2]))
+    assert r3.framework is r4.framework
+    assert pickle.loads(pickle.dumps(r1)).framework is r1.framework
+
+    # Changing the framework results in a new copy
+    P.framework.pars.at["transpercontact", "display name"] = "Modified"
+    r5 = P.run_sim(result_name="r5")
+    assert r5.framework is not r1.framework
+    assert r5.framework.get_label("transpercontact") == "Modified"
+
+
+def test_memory_usage():
+    P = at.Project(framework=testdir / "timed_tb_framework.xlsx", databook=testdir / "timed_tb_databook.xlsx", do_run=False)
+    P.settings.sim_dt = 0.25
+    r1 = P.run_sim(result_name="r1", store_results=True)
+    P.run_sim(result_name="r2", store_results=True)
+
+    # Check the breakdown by population and type
+    usage = r1.memory_usage(pickled=True)
+    assert set(usage.index.get_level_values("pop")) == set(r1.pop_names) | {"N.A."}
+    assert usage.loc[(r1.pop_names[0], "keyrings"), "bytes"] > 0
+    assert usage.loc[("N.A.", "framework"), "bytes"] > 0
+    assert np.isclose(usage["pickled"].sum(), len(pickle.dumps(r1)), rtol=0.1)
+
+    # The framework copy shared by both results is only counted once
+    usage = P.memory_usage()
+    assert list(usage.index) == ["Project", "r1", "r2"]
+    assert usage.at["r1", "framework"] > 0 and usage.at["r2", "framework"] == 0
+    assert usage.at["r2", "keyrings"] == r1.memory_usage().xs("keyrings", level="type")["bytes"].sum()
+    assert np.all(usage["total"] == usage.drop(columns="total").sum(axis=1))
+
+
+def test_postcompute_parameters():
+    P = at.demo("tb", do_run=False)
+    r1 = P.run_sim()
+    r2 = sc.dcp(r1)
+
+    # Parameters that are not required for integration are only evaluated when their values are first accessed
+    pop = r1.model.pops[0]
+    daly_rate = pop.get_variable("daly_rate")[0]
+    yll_rate = pop.get_variable("yll_rate")[0]
+    assert "vals" not in daly_rate.__dict__ and "vals" not in yll_rate.__dict__
+
+    # Dependencies are evaluated first
+    vals = daly_rate.vals
+    assert "vals" in daly_rate.__dict__ and "vals" in yll_rate.__dict__
+    assert vals is daly_rate.vals  # The values are cached
+    assert np.allclose(vals, yll_rate.vals + pop.get_variable("yld_rate")[0].vals)
+
+    # Values do not depend on the order in which the parameters are accessed
+    for pop in r2.model.pops:
+        for par in pop.pars[::-1]:
+            par.vals
+    for pop1, pop2 in zip(r1.model.pops, r2.model.pops):
+        for par1, par2 in zip(pop1.pars, pop2.pars):
+            assert np.array_equal(par1.vals, par2.vals, equal_nan=True)
+
+
 if __name__ == "__main__":
     test_export()
+    test_export_raw_results(".npz")
+    test_shared_framework()
+    test_memory_usage()
+    test_postcompute_parameters()
@@ -0,0 +1,127 @@
+# Check that sampling designs are space-filling and reproducible
+
+import os
+import numpy as np
+import sciris as sc
+import atomica as at
+import pytest
+
+testdir = at.parent_dir()  # Must be relative to current file to work with tox
+tmpdir = testdir / "temp"
+os.makedirs(tmpdir, exist_ok=True)
+
+
+def _get_vals(results):
+    # Return the final value of "dx" in each sample
+    return np.array([r[0].get_variable("dx")[0].vals[-1] for r in results])
+
+
+def _mapping_function(results):
+    # Module-level so that it can be sent to parallel workers
+    return at.PlotData(results, outputs="dx")
+
+
+@pytest.mark.parametrize("method", ["random", "lhs", "sobol", "halton"])
+def test_sample_design(method):
+    z = at.sample_design(16, 3, method=method, seed=1)
+    assert z.shape == (16, 3)
+    assert np.all(np.isfinite(z))
+    assert np.array_equal(z, at.sample_design(16, 3, method=method, seed=1))
+    if method == "lhs":
+        # Each stratum of the marginal distribution should contain exactly one sample
+        from scipy.stats import norm
+
+        strata = np.floor(norm.cdf(z) * 16)
+        for i in range(3):
+            assert sorted(strata[:, i]) == list(range(16))
+
+
+def test_design_stream():
+    stream = at.DesignStream()
+    P = at.Project(framework=testdir / "test_uncertainty_framework.xlsx", databook=testdir / "test_uncertainty_databook.xlsx", do_run=False)
+    P.parsets[0].sample(rng=stream)
+    assert stream.n_drawn > 0
+
+    stream = at.DesignStream([0.5, 1.5])
+    assert stream.standard_normal() == 0.5
+    assert np.array_equal(stream.standard_normal(1), [1.5])
+    with pytest.raises(Exception):
+        stream.standard_normal()
+
+
+@pytest.mark.parametrize("sampling", ["lhs", "sobol"])
+def test_sampled_sims_design(sampling):
+    P = at.Project(framework=testdir / "test_uncertainty_framework.xlsx", databook=testdir / "test_uncertainty_databook.xlsx", do_run=False)
+    progset = at.ProgramSet.from_spreadsheet(testdir / "test_uncertainty_high_progbook.xlsx", project=P)
+    instructions = at.ProgramInstructions(start_year=2018, alloc=progset)
+
+    a = _get_vals(P.run_sampled_sims("default", progset, instructions, n_samples=4, sampling=sampling, seed=1))
+    b = _get_vals(P.run_sampled_sims("default", progset, instructions, n_samples=4, sampling=sampling, seed=1, parallel=True, num_workers=2))
+    assert np.array_equal(a, b)
+
+    ensemble = at.Ensemble(_mapping_function)
+    ensemble.run_sims(P, "default", progset, instructions, n_samples=4, sampling=sampling, seed=1)
+    assert np.allclose(a, [x.series[0].vals[-1] for x in ensemble.samples])
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_resume_sampling(parallel):
+    P = at.Project(framework=testdir / "test_uncertainty_framework.xlsx", databook=testdir / "test_uncertainty_databook.xlsx", do_run=False)
+    checkpoint = str(tmpdir / f"resume_sampling_{parallel}")
+
+    a = _get_vals(P.run_sampled_sims("default", n_samples=4, checkpoint=checkpoint))
+
+    # Simulate an interrupted run - the missing samples are rerun with their original seeds
+    os.remove(checkpoint + "_sample1.chk")
+    os.remove(checkpoint + "_sample3.chk")
+    b = _get_vals(P.run_sampled_sims("default", n_samples=4, checkpoint=checkpoint, resume=True, parallel=parallel, num_workers=2))
+    assert np.array_equal(a, b)
+
+    ensemble = at.Ensemble(_mapping_function)
+    ensemble.run_sims(P, "default", n_samples=4, checkpoint=checkpoint + "_ensemble")
+    vals = [x.series[0].vals[-1] for x in ensemble.samples]
+    os.remove(checkpoint + "_ensemble_sample0.chk")
+    ensemble.run_sims(P, "default", n_samples=4, checkpoint=checkpoint + "_ensemble", resume=True, parallel=parallel)
+    assert np.allclose(vals, [x.series[0].vals[-1] for x in ensemble.samples])
+
+    with pytest.raises(Exception):
+        P.run_sampled_sims("default", n_samples=3, checkpoint=checkpoint, resume=True)
+
+
+@pytest.mark.parametrize("project", ["sir", "hiv", "combined"])
+def test_check_initialization(project):
+    # The initialization check should reject exactly the same parsets as the model build
+    P = at.demo(project, do_run=False)
+    systems = at.get_initialization_systems(P.framework, P.parsets[0])
+    names = {name for x in systems.values() for name in x[0]}
+    rng = np.random.default_rng(0)
+
+    for i in range(10):
+        parset = sc.dcp(P.parsets[0])
+        for name in names:
+            for pop_name in parset.pars[name].y_factor:
+                parset.pars[name].y_factor[pop_name] = rng.uniform(0.3, 1.7) if i else 1.0
+
+        try:
+            at.check_initialization(parset, systems, P.settings.sim_start)
+            valid = True
+        except at.BadInitialization:
+            valid = False
+        assert valid or i > 0
+
+        try:
+            at.Model(P.settings, P.framework, parset)
+            assert valid
+        except at.BadInitialization:
+            assert not valid
+
+
+if __name__ == "__main__":
+    for method in ["random", "lhs", "sobol", "halton"]:
+        test_sample_design(method)
+    test_design_stream()
+    test_sampled_sims_design("lhs")
+    test_sampled_sims_design("sobol")
+    test_resume_sampling(False)
+    test_resume_sampling(True)
+    test_check_initialization("sir")
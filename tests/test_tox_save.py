@@ -1,5 +1,8 @@
+import os
+import shutil
 import numpy as np
 import atomica as at
+import pytest
 
 testdir = at.parent_dir()
 tmpdir = testdir / "temp"
@@ -13,5 +16,43 @@ def test_save():
     P2.run_sim()
 
 
+@pytest.mark.parametrize("fname", ["test_project_container", "test_project_container.zip"])
+def test_save_container(fname):
+    fname = tmpdir / fname
+    shutil.rmtree(fname, ignore_errors=True)
+    if os.path.isfile(fname):
+        os.remove(fname)
+
+    P = at.demo("sir")
+    P.run_sim(result_name="second", store_results=True)
+    P.save(fname, container=True)
+
+    # Results are only loaded when they are accessed
+    P2 = at.Project.load(fname)
+    assert P2.results.keys() == P.results.keys()
+    assert not any(isinstance(x, at.Result) for x in dict.values(P2.results))
+    result = P2.result("second")
+    assert isinstance(result, at.Result)
+    assert np.array_equal(result.get_variable("inf", "adults")[0].vals, P.results["second"].get_variable("inf", "adults")[0].vals)
+    assert sum(isinstance(x, at.Result) for x in dict.values(P2.results)) == 1
+
+    # Saving again writes a container by default, and only the new result needs to be written
+    P2.run_sim(result_name="third", store_results=True)
+    P2.save()
+    if os.path.isdir(fname):
+        assert len(os.listdir(fname)) == 1 + 6 + 3  # Manifest, project entries, and one entry per result
+
+    P3 = at.Project.load(fname)
+    assert P3.results.keys() == ["parset_default", "second", "third"]
+    assert [x.name for x in P3.results.values()] == ["parset_default", "second", "third"]
+
+    # Projects loaded from containers can still be saved as a single file
+    P3.save(tmpdir / "test_project_container.prj")
+    P4 = at.Project.load(tmpdir / "test_project_container.prj")
+    assert isinstance(P4.results[0], at.Result)
+
+
 if __name__ == "__main__":
     test_save()
+    test_save_container("test_project_container")
+    test_save_container("test_project_container.zip")
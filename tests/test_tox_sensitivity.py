@@ -0,0 +1,106 @@
+# Check that forward sensitivities match finite differences
+
+import numpy as np
+import atomica as at
+import sciris as sc
+
+testdir = at.parent_dir()  # Must be relative to current file to work with tox
+
+
+def _finite_difference(P, parset, factor, progset=None, instructions=None, h=1e-6):
+    # Return central finite difference derivatives of all compartments and characteristics
+    models = []
+    for delta in [h, -h]:
+        ps = sc.dcp(parset)
+        instr = sc.dcp(instructions)
+        if isinstance(factor, str):
+            alloc = progset.get_alloc(P.settings.tvec, instructions)[factor]
+            instr.alloc[factor] = at.TimeSeries(P.settings.tvec, alloc + delta, units="$/year")
+        elif factor[1] is None:
+            ps.pars[factor[0]].meta_y_factor += delta
+        else:
+            ps.pars[factor[0]].y_factor[factor[1]] += delta
+        m = at.Model(P.settings, P.framework, ps, progset, instr)
+        m.process()
+        models.append(m)
+
+    derivatives = {}
+    for pop in models[0].pops:
+        for var in pop.comps + pop.characs:
+            derivatives[(var.name, pop.name)] = (var.vals - models[1].get_pop(pop.name).get_variable(var.name)[0].vals) / (2 * h)
+    return derivatives
+
+
+def _check_sensitivities(P, parset, sensitivity, progset=None, instructions=None):
+    m = at.Model(P.settings, P.framework, parset, progset, instructions)
+    m.process(sensitivity=sensitivity)
+    assert m.sensitivity_factors == sensitivity
+
+    for i, factor in enumerate(sensitivity):
+        h = 1e-3 if isinstance(factor, str) else 1e-6  # Spending has much larger magnitude than the scale factors
+        for (name, pop), fd in _finite_difference(P, parset, factor, progset, instructions, h=h).items():
+            assert np.allclose(m.get_sensitivity(name, pop)[:, i], fd, rtol=1e-4, atol=1e-3 * max(1, np.nanmax(np.abs(fd))), equal_nan=True), f"Sensitivity of {name} ({pop}) with respect to {factor} does not match finite differences"
+
+
+def test_dual():
+    fcn, deps = at.parse_function("max(x,0.5)*exp(y)+sdiv(x,y)")
+    x = at.Dual(np.array([0.2, 0.8]), np.array([[1.0, 0.0], [1.0, 0.0]]))
+    y = at.Dual(np.array([1.0, 2.0]), np.array([[0.0, 1.0], [0.0, 1.0]]))
+    z = fcn(x=x, y=y)
+    assert np.allclose(z.val, fcn(x=x.val, y=y.val))
+    assert np.allclose(z.grad, [[1.0, 0.5 * np.exp(1.0) - 0.2], [np.exp(2.0) + 0.5, 0.8 * np.exp(2.0) - 0.2]])
+
+
+def test_sensitivity():
+    # Scale factors are chosen to avoid the model being exactly at the threshold of min/max/floor functions (e.g., an integer number of contacts)
+    P = at.demo("sir", do_run=False)
+    parset = P.parsets[0]
+    parset.pars["contacts"].y_factor["adults"] = 0.93
+    parset.pars["recrate"].meta_y_factor = 0.9
+    _check_sensitivities(P, parset, [("contacts", "adults"), ("foi", None), ("recrate", None)])
+
+
+def test_program_sensitivity():
+    # Derivatives are propagated through program coverage and outcomes, and can be computed with respect to spending.
+    # Spending is reduced so that programs do not reach full coverage, otherwise the derivatives with respect to spending would be zero
+    P = at.demo("sir", do_run=False)
+    parset = P.parsets[0]
+    parset.pars["contacts"].y_factor["adults"] = 0.93
+    instructions = at.ProgramInstructions(start_year=2018, alloc=P.progsets[0]).scale_alloc(1e-4)
+    _check_sensitivities(P, parset, [("contacts", "adults"), ("recrate", None), "Risk avoidance", "Harm reduction 2", "Treatment 1"], P.progsets[0], instructions)
+
+    co = at.Covout("par", "pop", {"a": 0.5, "b": 0.2, "c": 0.8}, baseline=0.1)
+    prop_covered = {"a": np.array([0.5]), "b": np.array([0.4]), "c": np.array([0.6])}
+    for cov_interaction in ["additive", "random", "nested"]:
+        co.cov_interaction = cov_interaction
+        grad = co.get_outcome_gradient(prop_covered)
+        for prog in prop_covered:
+            perturbed = [{k: v + (h if k == prog else 0.0) for k, v in prop_covered.items()} for h in [1e-6, -1e-6]]
+            assert np.isclose(grad[prog], (co.get_outcome(perturbed[0]) - co.get_outcome(perturbed[1])) / 2e-6)
+
+
+def test_junction_sensitivity():
+    F = at.ProjectFramework(testdir / "framework_junction_remainder_test_2.xlsx")
+    D = at.ProjectData.new(F, np.arange(2000, 2001), pops={"pop1": "Population 1"}, transfers=0)
+    P = at.Project(name="test", framework=F, do_run=False)
+    P.settings.update_time_vector(dt=0.25)
+    P.load_databook(databook_path=D.to_spreadsheet(), make_default_parset=True, do_run=False)
+    parset = P.parsets[0]
+    par_names = [x for x in parset.pars.keys() if x in F.pars.index]
+    for par_name in par_names:
+        parset.pars[par_name].meta_y_factor = 0.9
+    _check_sensitivities(P, parset, [(x, None) for x in par_names])
+
+
+def test_aggregation_sensitivity():
+    # The TB force of infection averages over source populations weighted by contacts and population size
+    P = at.demo("tb", do_run=False)
+    _check_sensitivities(P, P.parsets[0], [("foi_in", None), ("spd_infxness", "15-64")])
+
+
+if __name__ == "__main__":
+    test_dual()
+    test_sensitivity()
+    test_program_sensitivity()
+    test_junction_sensitivity()
+    test_aggregation_sensitivity()
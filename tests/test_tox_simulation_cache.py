@@ -0,0 +1,74 @@
+# Check that the simulation cache returns stored results for identical inputs
+
+import os
+import shutil
+import numpy as np
+import sciris as sc
+import atomica as at
+
+testdir = at.parent_dir()
+tmpdir = testdir / "temp"
+
+
+def test_hash_content():
+    P = at.demo("sir", do_run=False)
+
+    # The hash does not depend on metadata, but does depend on values
+    parset = sc.dcp(P.parsets[0])
+    parset.name = "renamed"
+    assert at.hash_content(parset) == at.hash_content(P.parsets[0])
+    parset.pars["contacts"].y_factor["adults"] = 2
+    assert at.hash_content(parset) != at.hash_content(P.parsets[0])
+    assert at.hash_content({"a": 1, "b": 2}) == at.hash_content({"b": 2, "a": 1})
+    assert at.hash_content([1, 2]) != at.hash_content([2, 1])
+
+
+def test_simulation_cache():
+    shutil.rmtree(tmpdir / "simulation_cache", ignore_errors=True)
+    cache = at.SimulationCache(tmpdir / "simulation_cache")
+
+    P = at.demo("sir", do_run=False)
+    r1 = P.run_sim(result_name="first", cache=cache)
+    assert len(os.listdir(cache.path)) == 1
+
+    # A copy of the project has the same inputs, so the stored result is returned
+    P2 = sc.dcp(P)
+    r2 = P2.run_sim(result_name="second", cache=cache.path)
+    assert r2.name == "second"
+    assert r2.model.created == r1.model.created
+    assert np.array_equal(r2.get_variable("inf", "adults")[0].vals, r1.get_variable("inf", "adults")[0].vals)
+
+    # A renamed parset has the same values, so the stored result is returned with metadata for the new parset
+    r5 = P.run_sim(parset=P.parsets[0].copy("other"), cache=cache)
+    assert r5.model.created == r1.model.created
+    assert r5.parset_name == "other"
+    assert r5.name == "parset_other"
+    assert r5.uid != r1.uid
+    assert len(os.listdir(cache.path)) == 1
+
+    # Changing the inputs runs the model again
+    parset = sc.dcp(P.parsets[0])
+    parset.pars["contacts"].y_factor["adults"] = 2
+    r3 = P.run_sim(parset=parset, cache=cache)
+    assert r3.model.created != r1.model.created
+    P.update_settings(sim_end=2030)
+    r4 = P.run_sim(cache=cache)
+    assert r4.t[-1] == 2030
+    assert len(os.listdir(cache.path)) == 3
+
+    # The least recently used results are removed when the cache is full
+    entries = sorted(cache.path.glob("*.res"))
+    for i, entry in enumerate(entries):
+        os.utime(entry, (i, i))
+    assert cache.get(entries[0].stem) is not None  # Retrieving a result marks it as recently used
+    cache.max_size = cache.size - 1
+    cache._evict()
+    assert sorted(cache.path.glob("*.res")) == [entries[0], entries[2]]
+
+    cache.clear()
+    assert cache.size == 0
+
+
+if __name__ == "__main__":
+    test_hash_content()
+    test_simulation_cache()
@@ -0,0 +1,70 @@
+# Check that streaming Ensembles match Ensembles that store all of the samples
+
+import numpy as np
+import atomica as at
+import matplotlib.pyplot as plt
+import pytest
+
+
+def _mapping_function(results):
+    return at.PlotData(results, outputs=["sus", "inf"])
+
+
+def test_streaming_statistics():
+    rng = np.random.default_rng(0)
+    x = rng.lognormal(size=(2000, 5))
+
+    # Quantiles are exact until the digest needs to be compressed
+    statistics = at.StreamingStatistics()
+    for vals in x[:20]:
+        statistics.add(vals)
+    assert np.allclose(statistics.quantile(0.25), np.quantile(x[:20], 0.25, axis=0))
+
+    # Accumulate statistics in two parts and merge them
+    other = at.StreamingStatistics()
+    for vals in x[20:]:
+        other.add(vals)
+    statistics.merge(other)
+
+    assert statistics.n == 2000
+    assert np.allclose(statistics.mean, np.mean(x, axis=0))
+    assert np.allclose(statistics.std, np.std(x, axis=0))
+    assert np.array_equal(statistics.max, np.max(x, axis=0))
+    for q in [0.01, 0.25, 0.5, 0.75, 0.99]:
+        assert np.all(np.abs(np.mean(x <= statistics.quantile(q), axis=0) - q) < 0.005)
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_streaming_ensemble(parallel):
+    P = at.demo("sir", do_run=False)
+    ensemble = at.Ensemble(_mapping_function)
+    ensemble.run_sims(P, "default", n_samples=10, seed=1)
+    streaming = at.Ensemble(_mapping_function, streaming=True)
+    streaming.run_sims(P, "default", n_samples=10, seed=1, parallel=parallel, num_workers=2)
+
+    assert streaming.n_samples == 10
+    assert not streaming.samples
+    assert streaming.outputs == ensemble.outputs
+    assert np.allclose(streaming.summary_statistics(years=[2020]).values, ensemble.summary_statistics(years=[2020]).values)
+
+    streaming.plot_series(style="ci")
+    streaming.plot_bars(years=2020)
+    with pytest.raises(Exception):
+        streaming.plot_distribution()
+    plt.close("all")
+
+    # Merging Ensembles run separately is equivalent to running all samples together
+    other = at.Ensemble(_mapping_function, streaming=True)
+    other.run_sims(P, "default", n_samples=5, seed=2)
+    streaming.merge(other)
+    other_samples = at.Ensemble(_mapping_function)
+    other_samples.run_sims(P, "default", n_samples=5, seed=2)
+    ensemble.merge(other_samples)
+    assert streaming.n_samples == ensemble.n_samples == 15
+    assert np.allclose(streaming.summary_statistics().values, ensemble.summary_statistics().values)
+
+
+if __name__ == "__main__":
+    test_streaming_statistics()
+    test_streaming_ensemble(False)
+    test_streaming_ensemble(True)